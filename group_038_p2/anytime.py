@@ -0,0 +1,172 @@
+"""
+Anytime query evaluation under a latency budget.
+
+vector_space_search and linear_boolean_search always run to completion. The searches here
+take a Budget (a time limit or deadline, a CancellationToken, or both) and check it as they
+go. When it runs out they stop and return the best results found so far, flagged as partial.
+
+anytime_vector_space_search works term at a time in decreasing idf order. The rare,
+discriminating query terms (which also have the shortest postings) are scored first, and the
+very common terms that make a query slow come last. Cosine scores cover the postings processed
+so far; complete results equal vector_space_search's. anytime_boolean_search scans the
+collection like linear_boolean_search, and partial results cover the documents scanned so far.
+
+Building the collection's index is not interruptible: on a cold index cache
+anytime_vector_space_search checks the budget once before building it and then spends however
+long the build takes, so the first query of a large collection can overrun its budget (batch
+and loadgen build the indexes before measuring). anytime_boolean_search needs no index.
+
+Results are SearchResults: lists of (score, Document) like the other searches, with `partial`
+and `reason` attached. The query cache does not store partial results.
+"""
+
+import math
+import signal
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from itertools import islice
+
+from index import get_index
+from my_module import analyze_query, linear_boolean_search
+
+# Postings (for ranked search) or documents (for Boolean search) processed between budget checks
+POSTINGS_CHECK_INTERVAL = 1024
+DOCUMENTS_CHECK_INTERVAL = 64
+
+
+class CancellationToken:
+    """Cancelled from another thread or a signal handler; a running search stops at its next check."""
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+
+class Budget:
+    def __init__(self, seconds=None, deadline=None, token=None):
+        """
+        A limit of `seconds` from now and/or an absolute time.monotonic() `deadline` (the
+        earlier one applies), plus an optional CancellationToken. Budget() never runs out.
+        """
+        if seconds is not None:
+            limit = time.monotonic() + seconds
+            deadline = limit if deadline is None else min(deadline, limit)
+        self.deadline = deadline
+        self.token = token
+
+    def exhausted(self):
+        """None while the search may continue, otherwise the reason: "cancelled" or "deadline"."""
+        if self.token is not None and self.token.cancelled:
+            return "cancelled"
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            return "deadline"
+        return None
+
+
+class SearchResults(list):
+    """(score, Document) results; `processed` of `total` postings or documents were evaluated."""
+
+    def __init__(self, results=(), processed=0, total=0, reason=None):
+        super().__init__(results)
+        self.processed = processed
+        self.total = total
+        self.partial = processed < total
+        self.reason = reason if self.partial else None
+
+    @classmethod
+    def unstarted(cls, results, reason):
+        """Results of a search that stopped before it could evaluate anything."""
+        unstarted = cls(results)
+        unstarted.partial = True
+        unstarted.reason = reason
+        return unstarted
+
+    def derive(self, results):
+        """Other results (e.g. the ranked top k of these) with the same completeness flags."""
+        derived = SearchResults(results, self.processed, self.total)
+        derived.partial, derived.reason = self.partial, self.reason
+        return derived
+
+
+def anytime_vector_space_search(query, collection, stopword_filtered=False, stemmed=False, budget=None):
+    """
+    vector_space_search that stops when `budget` runs out; (score, Document) in collection order.
+    A budget that is already exhausted returns all-zero partial results without building the
+    index; building it is not covered by the budget otherwise.
+    """
+    budget = budget or Budget()
+    reason = budget.exhausted()
+    if reason:
+        return SearchResults.unstarted([(0.0, doc) for doc in collection], reason)
+    index = get_index(collection, stopword_filtered, stemmed)
+    query_counts = Counter(analyze_query(query, stemmed))
+    idfs = {term: index.idf(term) for term in query_counts}
+    query_norm = math.sqrt(sum((query_counts[term] * idfs[term]) ** 2 for term in query_counts))
+
+    dots = [0.0] * index.num_docs
+    squares = [0.0] * index.num_docs
+    total = sum(len(index.postings.get(term, ())) for term in query_counts)
+    processed = 0
+    for term in sorted(query_counts, key=lambda t: idfs[t], reverse=True):
+        if reason:
+            break
+        idf = idfs[term]
+        query_weight = query_counts[term] * idf
+        postings = index.postings.get(term, ())
+        for start in range(0, len(postings), POSTINGS_CHECK_INTERVAL):
+            chunk = postings[start:start + POSTINGS_CHECK_INTERVAL]
+            for pos, tf in chunk:
+                weight = tf * idf
+                dots[pos] += weight * query_weight
+                squares[pos] += weight * weight
+            processed += len(chunk)
+            reason = budget.exhausted()
+            if reason:
+                break
+
+    scores = []
+    for dot, square, doc in zip(dots, squares, index.collection):
+        denom = math.sqrt(square) * query_norm
+        scores.append((dot / denom if denom > 0 else 0.0, doc))
+    return SearchResults(scores, processed, total, reason)
+
+
+def anytime_boolean_search(term, collection, stopword_filtered=False, stemmed=False, budget=None):
+    """linear_boolean_search that stops when `budget` runs out; covers the documents scanned so far."""
+    budget = budget or Budget()
+    results = []
+    processed = 0
+    reason = budget.exhausted()
+    documents = iter(collection)
+    while not reason:
+        chunk = list(islice(documents, DOCUMENTS_CHECK_INTERVAL))
+        if not chunk:
+            break
+        results.extend(linear_boolean_search(term, chunk, stopword_filtered, stemmed))
+        processed += len(chunk)
+        reason = budget.exhausted()
+    return SearchResults(results, processed, len(collection), reason)
+
+
+@contextmanager
+def cancel_on_interrupt(token):
+    """
+    While active, Ctrl-C (SIGINT) cancels `token` instead of raising KeyboardInterrupt. Signal
+    handlers can only be set from the main thread; elsewhere this does nothing.
+    """
+    if threading.current_thread() is not threading.main_thread():
+        yield token
+        return
+    previous = signal.signal(signal.SIGINT, lambda signum, frame: token.cancel())
+    try:
+        yield token
+    finally:
+        signal.signal(signal.SIGINT, previous)
@@ -0,0 +1,191 @@
+"""
+Non-interactive batch mode: load -> filter -> search a file of queries, stream the results as
+TSV or JSON lines and print a throughput summary to stderr.
+
+    python main.py --file book.txt --start-line 120 --end-line 9000 --stopwords englishST.txt \
+        --stem --mode bm25 --queries queries.txt --format jsonl --output results.jsonl
+"""
+
+import argparse
+import json
+import math
+import sys
+import time
+
+from anytime import Budget, anytime_boolean_search, anytime_vector_space_search
+from cli import add_collection_arguments, load_analyzed_collection
+from impact_index import impact_search
+from my_module import vector_space_search
+from test_wrapper import bm25_search, lsi_search
+
+SEARCH_MODES = ("boolean", "vsm", "bm25", "lsi", "impact")
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(p / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def latency_summary(latencies, percentiles=(50, 95, 99)):
+    """Summarize latencies given in seconds: count, mean and the requested percentiles, in ms."""
+    ordered = sorted(latencies)
+    summary = {"count": len(ordered), "mean_ms": sum(ordered) / len(ordered) * 1000 if ordered else 0.0}
+    for p in percentiles:
+        summary[f"p{p:g}".replace(".", "")] = percentile(ordered, p) * 1000
+    return summary
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Run a batch of queries against a collection.")
+    add_collection_arguments(parser)
+    parser.add_argument("--queries", required=True, help="file with one query per line ('-' for stdin)")
+    parser.add_argument("--mode", choices=SEARCH_MODES, default="vsm")
+    parser.add_argument("--stem", action="store_true", help="search stemmed terms")
+    parser.add_argument("--no-filtered", action="store_true",
+                        help="search unfiltered terms even if a stopword option is given")
+    parser.add_argument("--k1", type=float, default=1.2)
+    parser.add_argument("--b", type=float, default=0.75)
+    parser.add_argument("--delta", type=float, default=0.0, help="BM25+ lower bound (0 for plain BM25)")
+    parser.add_argument("--lsi-rank", type=int, default=100, help="dimensions of the LSI space")
+    parser.add_argument("--lsi-model", help="load the LSI model from this file, or build and save it there")
+    parser.add_argument("--expand", action="store_true",
+                        help="vsm: add related terms from the co-occurrence model (see cooccurrence.py)")
+    parser.add_argument("--expansion-model",
+                        help="vsm: expand queries with this saved co-occurrence model instead of building one")
+    parser.add_argument("--index", help="search this saved (e.g. pruned, see pruning.py) index in vsm/bm25 mode")
+    parser.add_argument("--impact-bits", type=int, default=8, help="bits per quantized impact (impact mode)")
+    parser.add_argument("--top-k", type=int, default=10, help="results per query (0 for all)")
+    parser.add_argument("--shards", type=int, default=0, help="search with N worker processes")
+    parser.add_argument("--signature-bits", type=int, default=0,
+                        help="answer boolean queries from Bloom signatures of N bits per document")
+    parser.add_argument("--budget-ms", type=float, default=0,
+                        help="per-query latency budget for boolean and vsm; slower queries return partial results")
+    parser.add_argument("--format", choices=("tsv", "jsonl"), default="tsv")
+    parser.add_argument("--output", help="result file (default: stdout)")
+    return parser
+
+
+def read_queries(path):
+    stream = sys.stdin if path == "-" else open(path, "r", encoding="utf-8")
+    try:
+        return [line.strip() for line in stream if line.strip()]
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+def make_search(args, documents, stopword_filtered):
+    """Return a function query -> ranked [(score, Document)] for the chosen mode."""
+    top_k = args.top_k or None
+    if args.shards and args.mode not in ("lsi", "impact"):
+        from sharding import ShardedSearcher
+        searcher = ShardedSearcher(documents, args.shards, stopword_filtered, args.stem)
+        return searcher, lambda query: searcher.search(query, args.mode, top_k, args.k1, args.b, args.delta)
+
+    budget = lambda: Budget(args.budget_ms / 1000) if args.budget_ms else None
+    boolean_search = lambda query: anytime_boolean_search(query, documents, stopword_filtered, args.stem, budget())
+    index = None
+    if args.index and args.mode in ("vsm", "bm25"):
+        from pruning import load_index, search_index
+        index = load_index(args.index, documents)
+    expansion = None
+    if args.mode == "vsm" and (args.expand or args.expansion_model):
+        # Loaded or built here, outside the measured query latencies
+        from cooccurrence import CooccurrenceModel, get_cooccurrence_model
+        if args.expansion_model:
+            expansion = CooccurrenceModel.load(args.expansion_model)
+            expansion.check_variant(stopword_filtered, args.stem)
+        else:
+            expansion = get_cooccurrence_model(documents, stopword_filtered, args.stem)
+    if args.mode == "boolean" and args.signature_bits:
+        from signature import SignatureFile
+        boolean_search = SignatureFile(documents, args.signature_bits, stopword_filtered=stopword_filtered,
+                                       stemmed=args.stem).search
+
+    def search(query):
+        if args.mode == "boolean":
+            results = boolean_search(query)
+            matches = [(score, doc) for score, doc in results if score == 1][:top_k]
+            return results.derive(matches) if hasattr(results, "derive") else matches
+        if index is not None:
+            results = search_index(index, query, args.mode, args.k1, args.b, args.delta)
+        elif expansion is not None:
+            results = vector_space_search(query, documents, stopword_filtered, args.stem, expansion=expansion)
+        elif args.mode == "vsm":
+            results = anytime_vector_space_search(query, documents, stopword_filtered, args.stem, budget())
+        elif args.mode == "lsi":
+            results = lsi_search(query, documents, stopword_filtered, args.stem, args.lsi_rank, args.lsi_model)
+        elif args.mode == "impact":
+            results = impact_search(query, documents, stopword_filtered, args.stem, args.impact_bits)
+        else:
+            results = bm25_search(query, documents, stopword_filtered, args.stem, args.k1, args.b, args.delta)
+        ranked = sorted(results, key=lambda r: r[0], reverse=True)
+        matches = [(score, doc) for score, doc in ranked if score > 0][:top_k]
+        return results.derive(matches) if hasattr(results, "derive") else matches
+    return None, search
+
+
+def write_results(out, fmt, query_number, query, results, elapsed):
+    if fmt == "jsonl":
+        out.write(json.dumps({
+            "query_number": query_number,
+            "query": query,
+            "elapsed_ms": elapsed * 1000,
+            "partial": getattr(results, "partial", False),
+            "results": [{"rank": rank, "document_id": doc.document_id, "score": score, "title": doc.title}
+                        for rank, (score, doc) in enumerate(results, 1)],
+        }) + "\n")
+    else:
+        for rank, (score, doc) in enumerate(results, 1):
+            out.write(f"{query_number}\t{query}\t{rank}\t{doc.document_id}\t{score:.6f}\t{doc.title}\n")
+
+
+def run_batch(args, out=sys.stdout, log=sys.stderr):
+    started = time.perf_counter()
+    documents, filtered = load_analyzed_collection(args)
+    prepared = time.perf_counter()
+    stopword_filtered = filtered and not args.no_filtered
+
+    queries = read_queries(args.queries)
+    searcher, search = make_search(args, documents, stopword_filtered)
+    latencies = []
+    partial = 0
+    try:
+        search_started = time.perf_counter()
+        for number, query in enumerate(queries, 1):
+            query_started = time.perf_counter()
+            results = search(query)
+            elapsed = time.perf_counter() - query_started
+            latencies.append(elapsed)
+            partial += getattr(results, "partial", False)
+            write_results(out, args.format, number, query, results, elapsed)
+        search_time = time.perf_counter() - search_started
+    finally:
+        if searcher is not None:
+            searcher.close()
+    out.flush()
+
+    ingest_time = prepared - started
+    summary = latency_summary(latencies)
+    log.write(f"Ingested {len(documents)} documents in {ingest_time:.3f}s (load and stopwords): "
+              f"{len(documents) / ingest_time if ingest_time > 0 else 0:.1f} documents/s\n")
+    log.write(f"Ran {len(queries)} {args.mode} queries in {search_time:.3f}s: "
+              f"{len(queries) / search_time if search_time > 0 else 0:.1f} queries/s\n")
+    log.write(f"Latency ms: mean {summary['mean_ms']:.3f}, p50 {summary['p50']:.3f}, "
+              f"p95 {summary['p95']:.3f}, p99 {summary['p99']:.3f}\n")
+    if partial:
+        log.write(f"{partial} queries ran out of their {args.budget_ms:g} ms budget and returned partial results\n")
+    return summary
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as out:
+            run_batch(args, out)
+    else:
+        run_batch(args)
+    return 0
@@ -0,0 +1,141 @@
+"""
+Command-line options shared by the non-interactive entry points: where to load the
+collection from and how to filter stopwords.
+"""
+
+import os
+import re
+import sys
+
+from my_module import PATTERN_TIME_BUDGET, download_text, parse_collection
+from test_wrapper import (
+    load_documents_from_url,
+    load_documents_from_file,
+    remove_stopwords_by_list,
+    remove_stopwords_by_frequency,
+)
+
+
+def add_collection_arguments(parser):
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--url", help="URL of the .txt file to download")
+    source.add_argument("--file", help="local .txt file (memory-mapped)")
+    source.add_argument("--manifest", help="JSON manifest of several sources")
+    parser.add_argument("--start-line", type=int, default=0, help="first line to read (default: 0)")
+    parser.add_argument("--end-line", type=int, default=sys.maxsize,
+                        help="line to stop at, exclusive (default: end of file)")
+    parser.add_argument("--pattern", help="regex with title and body groups (default: built-in story splitter)")
+    parser.add_argument("--author", default="")
+    parser.add_argument("--origin", default="")
+    parser.add_argument("--dedup", choices=("drop", "merge", "tag"),
+                        help="detect near-duplicate stories (MinHash LSH) and drop, merge or tag them")
+    parser.add_argument("--dedup-threshold", type=float, default=0.8,
+                        help="estimated Jaccard similarity of word shingles for near-duplicates")
+    parser.add_argument("--corpus-cache", metavar="DIR",
+                        help="reuse analyzed collections saved in DIR (keyed by source, lines, pattern and filtering)")
+    parser.add_argument("--doc-store", metavar="PATH",
+                        help="move titles and texts into a compressed store file and load them lazily")
+    stopwords = parser.add_mutually_exclusive_group()
+    stopwords.add_argument("--stopwords", help="stopword list file, one word per line")
+    stopwords.add_argument("--frequency-cutoffs", nargs=2, type=float, metavar=("COMMON", "RARE"),
+                           help="frequency-based stopword removal thresholds")
+
+
+def pattern_from_args(args):
+    return re.compile(args.pattern, re.DOTALL) if args.pattern else None
+
+
+def load_collection_from_args(args, text=None):
+    """Load the collection described by the parsed arguments. `text` is the content of --url if already downloaded."""
+    if args.manifest:
+        from ingest import load_manifest, load_collection_from_manifest
+        documents = load_collection_from_manifest(load_manifest(args.manifest))
+    else:
+        pattern = pattern_from_args(args)
+        timeout = PATTERN_TIME_BUDGET if pattern else None
+        if args.file:
+            documents = load_documents_from_file(os.path.expanduser(args.file), args.author, args.origin,
+                                                 args.start_line, args.end_line, pattern, timeout)
+        elif text is not None:
+            documents = parse_collection(text, pattern, args.start_line, args.end_line, args.author, args.origin,
+                                         pattern_timeout=timeout)
+        else:
+            documents = load_documents_from_url(args.url, args.author, args.origin, args.start_line,
+                                                args.end_line, pattern, timeout)
+    if args.dedup:
+        from dedup import deduplicate
+        documents = deduplicate(documents, args.dedup, args.dedup_threshold)
+    if args.doc_store:
+        apply_doc_store(args, documents)
+    return documents
+
+
+def apply_doc_store(args, documents):
+    """Write the documents' titles and texts to the --doc-store file and read them from there."""
+    from doc_store import write_store, DocumentStore, detach_documents
+    path = os.path.expanduser(args.doc_store)
+    write_store(path, documents)
+    detach_documents(documents, DocumentStore(path))
+
+
+def apply_stopwords_from_args(args, documents):
+    """Apply the stopword option, if any. Returns True if documents were filtered."""
+    if args.stopwords:
+        with open(os.path.expanduser(args.stopwords), "r") as f:
+            stopwords = set(line.strip().lower() for line in f)
+        for doc in documents:
+            remove_stopwords_by_list(doc, stopwords)
+        return True
+    if args.frequency_cutoffs:
+        common, rare = args.frequency_cutoffs
+        for doc in documents:
+            remove_stopwords_by_frequency(doc, documents, common_frequency=common, rare_frequency=rare)
+        return True
+    return False
+
+
+def _analysis_key(args):
+    # Everything besides source, lines and pattern that changes the analyzed documents
+    from corpus_cache import file_hash
+    if args.stopwords:
+        key = f"list:{file_hash(os.path.expanduser(args.stopwords))}"
+    elif args.frequency_cutoffs:
+        key = "frequency:{}:{}".format(*args.frequency_cutoffs)
+    else:
+        key = "none"
+    if args.dedup:
+        key += f"|dedup:{args.dedup}:{args.dedup_threshold}"
+    return key
+
+
+def load_analyzed_collection(args):
+    """
+    Load the collection and apply the stopword option. Returns (documents, stopword filtered).
+    With --corpus-cache the analyzed collection of a --file or --url source is reused if the same
+    source content was analyzed with the same settings before.
+    """
+    if not args.corpus_cache or args.manifest:
+        documents = load_collection_from_args(args)
+        return documents, apply_stopwords_from_args(args, documents)
+
+    from corpus_cache import cached_analysis, corpus_fingerprint, file_hash, text_hash
+    text = None
+    if args.file:
+        source_hash = file_hash(os.path.expanduser(args.file))
+    else:
+        text = download_text(args.url)
+        source_hash = text_hash(text)
+    fingerprint = corpus_fingerprint(source_hash, args.start_line, args.end_line, pattern_from_args(args),
+                                     _analysis_key(args))
+    stopword_filtered = bool(args.stopwords or args.frequency_cutoffs)
+
+    def analyze():
+        documents = load_collection_from_args(args, text)
+        apply_stopwords_from_args(args, documents)
+        return documents
+
+    documents, hit = cached_analysis(os.path.expanduser(args.corpus_cache), fingerprint, analyze, stopword_filtered)
+    if hit and args.doc_store:
+        # A fresh analysis has applied it in load_collection_from_args already
+        apply_doc_store(args, documents)
+    return documents, stopword_filtered
@@ -0,0 +1,215 @@
+"""
+Term association model for query expansion.
+
+Built offline from the analyzed collection: two terms co-occur when they appear within
+`window` positions of each other in a document's term list (of the chosen analyzer variant).
+Pairs seen at least `min_count` times are scored with normalized PMI,
+    npmi(a, b) = log(p(a, b) / (p(a) p(b))) / -log p(a, b),
+which lies in [-1, 1] and, unlike plain PMI, does not favour very rare pairs. Only the
+`top_n` best positively associated neighbours of every term are kept, in flat numpy arrays,
+so expanding a query is a few dictionary lookups. Pair occurrences are counted a chunk of
+documents at a time, so building needs memory for the distinct pairs rather than for every
+occurrence.
+
+vector_space_search(..., expansion=model) adds each query term's neighbours to the query
+vector with weight `weight * npmi * query tf`. A saved model is searched with
+`python batch.py --expansion-model model.npz` or from the interactive menu.
+
+    python cooccurrence.py --file book.txt --output model.npz --window 5 --top-n 10
+"""
+
+import argparse
+import sys
+import threading
+from collections import Counter, OrderedDict
+
+import numpy as np
+
+from index import get_doc_terms, get_index
+
+DEFAULT_WINDOW = 5
+DEFAULT_TOP_N = 10
+DEFAULT_MIN_COUNT = 2
+DEFAULT_EXPANSION_TERMS = 5
+DEFAULT_EXPANSION_WEIGHT = 0.3
+MAX_CACHED_MODELS = 4
+# Pair occurrences collected before they are merged into the distinct pair counts
+PAIR_CHUNK = 1 << 20
+
+
+def _count_pairs(documents, window, vocabulary_size):
+    """Distinct pair keys low * V + high of terms within `window` positions, and their counts."""
+    pair_keys, pair_counts = np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    pending, pending_size = [], 0
+
+    def merge():
+        keys, inverse = np.unique(np.concatenate([pair_keys, *pending]), return_inverse=True)
+        weights = np.concatenate([pair_counts, np.ones(pending_size, dtype=np.int64)])
+        return keys, np.bincount(inverse, weights=weights, minlength=len(keys)).astype(np.int64)
+
+    for ids in documents:
+        for offset in range(1, window + 1):
+            if offset >= len(ids):
+                break
+            a, b = ids[:-offset], ids[offset:]
+            distinct = a != b
+            a, b = a[distinct], b[distinct]
+            pending.append(np.minimum(a, b) * vocabulary_size + np.maximum(a, b))
+            pending_size += len(a)
+        if pending_size >= PAIR_CHUNK:
+            pair_keys, pair_counts = merge()
+            pending, pending_size = [], 0
+    if pending_size:
+        pair_keys, pair_counts = merge()
+    return pair_keys, pair_counts
+
+
+class CooccurrenceModel:
+    def __init__(self, terms, offsets, neighbours, weights, stopword_filtered=False, stemmed=False):
+        self.terms = list(terms)
+        self.term_ids = {term: i for i, term in enumerate(self.terms)}
+        # Neighbours of term i are neighbours[offsets[i]:offsets[i + 1]], best first
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.neighbours = np.asarray(neighbours, dtype=np.uint32)
+        self.weights = np.asarray(weights, dtype=np.float32)
+        self.stopword_filtered = stopword_filtered
+        self.stemmed = stemmed
+
+    def check_variant(self, stopword_filtered, stemmed):
+        """Raise ValueError unless the model was built from this analyzer variant."""
+        if self.stopword_filtered != stopword_filtered:
+            raise ValueError("the expansion model was built for a different stopword filtering setting")
+        if self.stemmed != stemmed:
+            raise ValueError("the expansion model was built for a different stemming setting")
+
+    @classmethod
+    def build(cls, collection, stopword_filtered=False, stemmed=False, window=DEFAULT_WINDOW, top_n=DEFAULT_TOP_N,
+              min_count=DEFAULT_MIN_COUNT):
+        term_ids = {}
+        documents = []
+        for doc in collection:
+            terms = get_doc_terms(doc, stopword_filtered, stemmed)
+            documents.append(np.fromiter((term_ids.setdefault(term, len(term_ids)) for term in terms),
+                                         dtype=np.int64, count=len(terms)))
+        vocabulary_size = len(term_ids)
+
+        pair_keys, pair_counts = _count_pairs(documents, window, vocabulary_size)
+        base = max(vocabulary_size, 1)
+        low, high = pair_keys // base, pair_keys % base
+
+        # Probabilities over pair occurrences: a term's marginal is its share of pair ends
+        total_pairs = max(int(pair_counts.sum()), 1)
+        marginals = (np.bincount(low, weights=pair_counts, minlength=vocabulary_size)
+                     + np.bincount(high, weights=pair_counts, minlength=vocabulary_size)) / (2 * total_pairs)
+        frequent = pair_counts >= min_count
+        low, high, p_pair = low[frequent], high[frequent], pair_counts[frequent] / total_pairs
+        with np.errstate(divide="ignore", invalid="ignore"):
+            pmi = np.log(p_pair / (marginals[low] * marginals[high]))
+            npmi = np.where(p_pair < 1, pmi / -np.log(p_pair), 1.0)
+        positive = npmi > 0
+
+        # Both directions, then the top_n neighbours of every term by npmi
+        sources = np.concatenate([low[positive], high[positive]])
+        targets = np.concatenate([high[positive], low[positive]])
+        scores = np.concatenate([npmi[positive], npmi[positive]])
+        order = np.lexsort((targets, -scores, sources))
+        sources, targets, scores = sources[order], targets[order], scores[order]
+        starts = np.searchsorted(sources, np.arange(vocabulary_size))
+        rank = np.arange(len(sources)) - starts[sources] if len(sources) else np.zeros(0, dtype=np.int64)
+        kept = rank < top_n
+        sources, targets, scores = sources[kept], targets[kept], scores[kept]
+        offsets = np.searchsorted(sources, np.arange(vocabulary_size + 1))
+        return cls(term_ids, offsets, targets, scores, stopword_filtered, stemmed)
+
+    def related(self, term, n=None):
+        """[(neighbour, npmi)] of `term`, best first (empty for unknown terms)."""
+        term_id = self.term_ids.get(term)
+        if term_id is None:
+            return []
+        start, end = self.offsets[term_id], self.offsets[term_id + 1]
+        if n is not None:
+            end = min(end, start + n)
+        return [(self.terms[i], weight) for i, weight in
+                zip(self.neighbours[start:end].tolist(), self.weights[start:end].tolist())]
+
+    def expand(self, query_counts, max_terms=DEFAULT_EXPANSION_TERMS, weight=DEFAULT_EXPANSION_WEIGHT):
+        """
+        Query term weights (a Counter of term -> query tf) plus up to `max_terms` neighbours per
+        query term, weighted weight * npmi * tf. Original terms keep their weights.
+        """
+        expanded = Counter(query_counts)
+        for term, tf in query_counts.items():
+            for neighbour, association in self.related(term, max_terms):
+                if neighbour not in query_counts:
+                    expanded[neighbour] += weight * association * tf
+        return expanded
+
+    @property
+    def memory_bytes(self):
+        return self.offsets.nbytes + self.neighbours.nbytes + self.weights.nbytes
+
+    def save(self, path):
+        # Through a file object, so numpy does not append ".npz" to the path
+        with open(path, "wb") as f:
+            np.savez_compressed(f, terms=np.array(self.terms, dtype=str), offsets=self.offsets,
+                                neighbours=self.neighbours, weights=self.weights,
+                                variant=np.array([self.stopword_filtered, self.stemmed]))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            stopword_filtered, stemmed = data["variant"].tolist()
+            return cls(data["terms"].tolist(), data["offsets"], data["neighbours"], data["weights"],
+                       stopword_filtered, stemmed)
+
+
+_model_cache = OrderedDict()
+_model_cache_lock = threading.Lock()
+
+
+def get_cooccurrence_model(collection, stopword_filtered=False, stemmed=False, window=DEFAULT_WINDOW,
+                           top_n=DEFAULT_TOP_N):
+    """The association model of this collection and variant, rebuilt only when its index is."""
+    index = get_index(collection, stopword_filtered, stemmed)
+    key = (id(collection), stopword_filtered, stemmed, window, top_n)
+    with _model_cache_lock:
+        entry = _model_cache.get(key)
+        if entry is not None and entry[0] is index:
+            _model_cache.move_to_end(key)
+            return entry[1]
+        model = CooccurrenceModel.build(collection, stopword_filtered, stemmed, window, top_n)
+        _model_cache[key] = (index, model)
+        while len(_model_cache) > MAX_CACHED_MODELS:
+            _model_cache.popitem(last=False)
+    return model
+
+
+def clear_model_cache():
+    with _model_cache_lock:
+        _model_cache.clear()
+
+
+def main(argv=None):
+    from cli import add_collection_arguments, load_analyzed_collection
+
+    parser = argparse.ArgumentParser(description="Build a term co-occurrence model for query expansion.")
+    add_collection_arguments(parser)
+    parser.add_argument("--output", required=True, help=".npz file to write")
+    parser.add_argument("--window", type=int, default=DEFAULT_WINDOW)
+    parser.add_argument("--top-n", type=int, default=DEFAULT_TOP_N, help="neighbours kept per term")
+    parser.add_argument("--min-count", type=int, default=DEFAULT_MIN_COUNT, help="minimum co-occurrences of a pair")
+    parser.add_argument("--stem", action="store_true")
+    parser.add_argument("--show", nargs="*", default=[], help="print the neighbours of these terms")
+    args = parser.parse_args(argv)
+
+    documents, filtered = load_analyzed_collection(args)
+    model = CooccurrenceModel.build(documents, filtered, args.stem, args.window, args.top_n, args.min_count)
+    model.save(args.output)
+    print(f"{len(model.terms)} terms, {len(model.neighbours)} associations, {model.memory_bytes / 1024:.1f} KiB")
+    for term in args.show:
+        print(f"{term}: " + ", ".join(f"{n} ({w:.3f})" for n, w in model.related(term)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
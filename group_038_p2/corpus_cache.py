@@ -0,0 +1,174 @@
+"""
+Columnar on-disk cache of analyzed collections.
+
+An analyzed collection (documents after extraction, tokenizing, stopword filtering and
+stemming) is saved under a fingerprint of everything that produced it: the source content
+hash, the line window, the extraction pattern and the analysis settings. The next load with
+the same inputs reads a few arrays back instead of re-parsing:
+
+    <fingerprint>.npz    vocabulary (one string per distinct term), then for every analyzer
+                         variant the concatenated term ids of all documents ("<variant>_ids",
+                         uint32) and per-document start offsets ("<variant>_offsets", N + 1),
+                         plus term_offsets, document ids, titles, authors and origins
+    <fingerprint>.docs   titles and raw texts in a block-compressed DocumentStore; raw text is
+                         read lazily when a document is displayed
+
+Term lists of the loaded documents share one string object per vocabulary term. Only the
+unfiltered term lists are built at load time, from one bulk lookup of the vocabulary; the
+filtered and stemmed variants stay in the id columns until a document's variant is first used.
+Document ids must be integers.
+"""
+
+import hashlib
+import mmap
+import numbers
+import os
+from array import array
+from functools import partial
+
+import numpy as np
+
+from doc_store import write_store, DocumentStore
+from document import Document
+
+FORMAT_VERSION = 1
+VARIANTS = ("terms", "filtered_terms", "stemmed_terms", "filtered_stemmed_terms")
+
+
+def file_hash(path):
+    """SHA-256 of a file's content."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                digest.update(mm)
+    return digest.hexdigest()
+
+
+def text_hash(text):
+    """SHA-256 of a str (as UTF-8) or bytes text; the same as file_hash of a file holding it."""
+    return hashlib.sha256(text.encode("utf-8") if isinstance(text, str) else text).hexdigest()
+
+
+def corpus_fingerprint(source_hash, start_line, end_line, pattern=None, analysis="none"):
+    """
+    Key of an analyzed collection. `pattern` is a compiled regex or None for the story splitter;
+    `analysis` describes stopword filtering and any other processing, e.g. "list:<hash>".
+    """
+    pattern_key = "splitter" if pattern is None else f"{pattern.pattern}|{pattern.flags}"
+    key = "\0".join([str(FORMAT_VERSION), source_hash, str(start_line), str(end_line), pattern_key, analysis])
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+
+
+def _paths(cache_dir, fingerprint):
+    base = os.path.join(cache_dir, fingerprint)
+    return base + ".npz", base + ".docs"
+
+
+def _document_ids(documents):
+    ids = [doc.document_id for doc in documents]
+    for doc_id in ids:
+        if (not isinstance(doc_id, numbers.Integral) or isinstance(doc_id, bool)
+                or not -2 ** 63 <= doc_id < 2 ** 63):
+            raise ValueError(f"only 64-bit integer document ids can be cached, not {doc_id!r}")
+    return np.array(ids, dtype=np.int64)
+
+
+class TermColumns:
+    """The term id columns of a cached collection; materializes one document's list of one variant."""
+
+    def __init__(self, vocabulary, columns):
+        self.vocabulary = vocabulary
+        self.ids = {variant: columns[f"{variant}_ids"] for variant in VARIANTS if f"{variant}_ids" in columns}
+        self.offsets = {variant: columns[f"{variant}_offsets"] for variant in self.ids}
+
+    def terms(self, variant, row):
+        offsets = self.offsets[variant]
+        return self.vocabulary[self.ids[variant][offsets[row]:offsets[row + 1]]].tolist()
+
+    def loaders(self, row):
+        return {variant: partial(self.terms, variant, row) for variant in self.ids if variant != "terms"}
+
+
+def save_corpus(cache_dir, fingerprint, documents, stopword_filtered=False):
+    """
+    Save an analyzed collection. All analyzer variants are stored, so the stemmed term lists
+    are computed here if they were not yet. Raises ValueError for non-integer document ids.
+    """
+    document_ids = _document_ids(documents)
+    os.makedirs(cache_dir, exist_ok=True)
+    arrays_path, store_path = _paths(cache_dir, fingerprint)
+    vocabulary = {}
+    arrays = {}
+    variants = VARIANTS if stopword_filtered else ("terms", "stemmed_terms")
+    for variant in variants:
+        offsets = [0]
+        ids = []
+        for doc in documents:
+            terms = doc.terms if variant == "terms" else getattr(doc, variant)
+            if callable(terms):
+                terms = terms()
+            ids.extend(vocabulary.setdefault(term, len(vocabulary)) for term in terms)
+            offsets.append(len(ids))
+        arrays[f"{variant}_ids"] = np.array(ids, dtype=np.uint32)
+        arrays[f"{variant}_offsets"] = np.array(offsets, dtype=np.int64)
+    if documents and all(doc.term_offsets is not None for doc in documents):
+        arrays["term_offsets"] = np.concatenate([np.frombuffer(doc.term_offsets, dtype=np.uint32)
+                                                 for doc in documents])
+    arrays["vocabulary"] = np.array(list(vocabulary), dtype=str)
+    arrays["document_ids"] = document_ids
+    for field in ("title", "author", "origin"):
+        arrays[f"{field}s"] = np.array([getattr(doc, field) or "" for doc in documents], dtype=str)
+
+    # Written under temporary names and renamed, so a cache entry is either complete or absent
+    write_store(store_path + ".tmp", documents)
+    with open(arrays_path + ".tmp", "wb") as f:
+        np.savez(f, **arrays)
+    os.replace(store_path + ".tmp", store_path)
+    os.replace(arrays_path + ".tmp", arrays_path)
+
+
+def load_corpus(cache_dir, fingerprint):
+    """Return the cached documents for `fingerprint`, or None if the cache has no such entry."""
+    arrays_path, store_path = _paths(cache_dir, fingerprint)
+    if not (os.path.exists(arrays_path) and os.path.exists(store_path)):
+        return None
+    with np.load(arrays_path, allow_pickle=False) as data:
+        columns = {name: data[name] for name in data.files}
+    # The store's file is closed once no document refers to the store any more
+    store = DocumentStore(store_path)
+    vocabulary = np.array(columns["vocabulary"].tolist(), dtype=object)
+    term_columns = TermColumns(vocabulary, columns)
+
+    all_terms = vocabulary[columns["terms_ids"]].tolist()
+    offsets = columns["terms_offsets"].tolist()
+    term_offsets = columns.get("term_offsets")
+
+    documents = []
+    metadata = zip(columns["document_ids"].tolist(), columns["titles"].tolist(), columns["authors"].tolist(),
+                   columns["origins"].tolist())
+    for i, (doc_id, title, author, origin) in enumerate(metadata):
+        doc = Document(doc_id, "", "", all_terms[offsets[i]:offsets[i + 1]], author, origin)
+        doc.attach_store(store)
+        doc.title = title
+        doc.attach_term_columns(term_columns.loaders(i))
+        if term_offsets is not None:
+            doc.term_offsets = array("I", term_offsets[offsets[i]:offsets[i + 1]].tobytes())
+        documents.append(doc)
+    return documents
+
+
+def cached_analysis(cache_dir, fingerprint, analyze, stopword_filtered=False):
+    """
+    Return (documents, hit): the cached collection if present, otherwise `analyze()`'s result,
+    which is saved for the next time (unless its document ids cannot be cached).
+    """
+    documents = load_corpus(cache_dir, fingerprint)
+    if documents is not None:
+        return documents, True
+    documents = analyze()
+    try:
+        save_corpus(cache_dir, fingerprint, documents, stopword_filtered)
+    except ValueError:
+        pass
+    return documents, False
@@ -0,0 +1,139 @@
+"""
+Near-duplicate story detection with MinHash and LSH banding.
+
+Each story is reduced to the set of its word shingles (runs of `shingle_size` terms). The
+MinHash signature of that set has `num_perm` values; two signatures agree in each value with
+probability equal to the Jaccard similarity of the shingle sets. The signatures are cut into
+`bands` bands of `rows` values, and stories sharing any identical band land in the same bucket,
+so only those candidate pairs are compared instead of all pairs. Candidates whose estimated
+similarity reaches the threshold are grouped into clusters; the first story of a cluster (in
+collection order) represents it.
+
+Policies, applied before the documents reach the collection:
+    drop    keep only the representative of each cluster
+    merge   like drop, but the representative lists the dropped ids in `duplicates` and
+            combines their origins
+    tag     keep everything; duplicates get `duplicate_of` = representative id and the
+            representative lists them in `duplicates`
+"""
+
+import hashlib
+
+import numpy as np
+
+DEFAULT_NUM_PERM = 128
+DEFAULT_SHINGLE_SIZE = 5
+DEFAULT_THRESHOLD = 0.8
+POLICIES = ("drop", "merge", "tag")
+# Mersenne prime above every 32-bit shingle hash, for the (a * x + b) mod p permutations
+_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+
+def shingle_hashes(terms, shingle_size=DEFAULT_SHINGLE_SIZE):
+    """32-bit hashes of the distinct word shingles of `terms` (the whole text if it is shorter)."""
+    terms = [t.lower() for t in terms]
+    if len(terms) < shingle_size:
+        shingles = {" ".join(terms)} if terms else set()
+    else:
+        shingles = {" ".join(terms[i:i + shingle_size]) for i in range(len(terms) - shingle_size + 1)}
+    return np.fromiter((int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "little")
+                        for s in shingles), dtype=np.uint64, count=len(shingles))
+
+
+def band_threshold(bands, rows):
+    """Similarity at which a pair shares at least one band with probability of about one half."""
+    return (1 / bands) ** (1 / rows)
+
+
+def choose_bands(num_perm, threshold):
+    """(bands, rows) with bands * rows == num_perm whose band threshold is closest to `threshold`."""
+    options = [(b, num_perm // b) for b in range(1, num_perm + 1) if num_perm % b == 0]
+    return min(options, key=lambda option: abs(band_threshold(*option) - threshold))
+
+
+class MinHasher:
+    def __init__(self, num_perm=DEFAULT_NUM_PERM, shingle_size=DEFAULT_SHINGLE_SIZE, seed=1):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        # a, b < 2^29 keep a * x + b below 2^64 for 32-bit x
+        self._a = rng.integers(1, 1 << 29, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, 1 << 29, size=num_perm, dtype=np.uint64)
+
+    def signature(self, terms):
+        hashes = shingle_hashes(terms, self.shingle_size)
+        if not len(hashes):
+            return np.full(self.num_perm, _MAX_HASH, dtype=np.uint64)
+        permuted = (np.outer(hashes, self._a) + self._b) % _PRIME
+        return (permuted & _MAX_HASH).min(axis=0)
+
+
+def find_duplicate_clusters(documents, threshold=DEFAULT_THRESHOLD, num_perm=DEFAULT_NUM_PERM,
+                            shingle_size=DEFAULT_SHINGLE_SIZE, bands=None):
+    """
+    Return the clusters of near-duplicate documents as lists of positions in `documents`, each
+    sorted, with at least two members. Documents are compared on their (unfiltered) terms.
+    """
+    hasher = MinHasher(num_perm, shingle_size)
+    signatures = np.array([hasher.signature(doc.terms) for doc in documents]).reshape(len(documents), num_perm)
+    if bands is None:
+        bands, rows = choose_bands(num_perm, threshold)
+    else:
+        rows = num_perm // bands
+
+    parent = list(range(len(documents)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    checked = set()
+    for band in range(bands):
+        buckets = {}
+        for position, key in enumerate(signatures[:, band * rows:(band + 1) * rows]):
+            buckets.setdefault(key.tobytes(), []).append(position)
+        for bucket in buckets.values():
+            # Every pair of the bucket (positions are ascending), each verified once over all bands
+            for i, first in enumerate(bucket[:-1]):
+                others = [other for other in bucket[i + 1:]
+                          if (first, other) not in checked and find(first) != find(other)]
+                if not others:
+                    continue
+                checked.update((first, other) for other in others)
+                similarities = np.count_nonzero(signatures[others] == signatures[first], axis=1) / num_perm
+                for other, similarity in zip(others, similarities.tolist()):
+                    if similarity >= threshold:
+                        a, b = find(first), find(other)
+                        if a != b:
+                            parent[max(a, b)] = min(a, b)
+
+    clusters = {}
+    for position in range(len(documents)):
+        clusters.setdefault(find(position), []).append(position)
+    return [members for members in clusters.values() if len(members) > 1]
+
+
+def deduplicate(documents, policy="drop", threshold=DEFAULT_THRESHOLD, num_perm=DEFAULT_NUM_PERM,
+                shingle_size=DEFAULT_SHINGLE_SIZE):
+    """Apply a dedup policy and return the documents that go into the collection, in order."""
+    if policy not in POLICIES:
+        raise ValueError(f"unknown dedup policy {policy!r}, expected one of {', '.join(POLICIES)}")
+    documents = list(documents)
+    removed = set()
+    for members in find_duplicate_clusters(documents, threshold, num_perm, shingle_size):
+        representative = documents[members[0]]
+        duplicates = [documents[i] for i in members[1:]]
+        if policy != "drop":
+            representative.duplicates = tuple(doc.document_id for doc in duplicates)
+        if policy == "tag":
+            for doc in duplicates:
+                doc.duplicate_of = representative.document_id
+            continue
+        removed.update(members[1:])
+        if policy == "merge":
+            origins = [representative.origin] + [doc.origin for doc in duplicates]
+            representative.origin = "; ".join(dict.fromkeys(o for o in origins if o))
+    return [doc for i, doc in enumerate(documents) if i not in removed]
@@ -0,0 +1,144 @@
+"""
+Block-compressed on-disk store for document titles, bodies and metadata.
+
+Ranking only needs the terms, so after loading, the stored fields can be moved into a store
+file and dropped from memory: Document.title/raw_text are then fetched lazily from the store
+when displayed. Records are grouped into blocks of about BLOCK_SIZE bytes of JSON and each
+block is compressed with zlib or lzma. A small footer maps document ids to blocks, and the
+most recently used decompressed blocks are kept in an LRU cache.
+
+File layout: MAGIC, compressed blocks, JSON footer, 8-byte little-endian footer offset.
+
+The command line tools write and attach a store with --doc-store PATH. A store's file stays
+open while documents refer to it and is closed when the store is garbage collected.
+"""
+
+import json
+import lzma
+import struct
+import threading
+import weakref
+import zlib
+from collections import OrderedDict
+
+MAGIC = b"IRDOCS1\n"
+BLOCK_SIZE = 64 * 1024
+DEFAULT_CACHED_BLOCKS = 8
+STORED_FIELDS = ("document_id", "title", "raw_text", "author", "origin")
+CODECS = {
+    "zlib": (lambda data: zlib.compress(data, 6), zlib.decompress),
+    "lzma": (lzma.compress, lzma.decompress),
+}
+
+
+def write_store(path, documents, codec="zlib", block_size=BLOCK_SIZE):
+    """Write the stored fields of `documents` to a block-compressed store file."""
+    compress = CODECS[codec][0]
+    blocks = []
+    ids = []
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        pending = []
+        pending_size = 0
+
+        def flush():
+            data = compress(json.dumps(pending, ensure_ascii=False).encode("utf-8"))
+            blocks.append((f.tell(), len(data), len(pending)))
+            f.write(data)
+
+        for doc in documents:
+            record = [getattr(doc, field) for field in STORED_FIELDS]
+            ids.append(doc.document_id)
+            pending.append(record)
+            pending_size += len(record[1]) + len(record[2]) + 64
+            if pending_size >= block_size:
+                flush()
+                pending, pending_size = [], 0
+        if pending:
+            flush()
+        footer_offset = f.tell()
+        f.write(json.dumps({"codec": codec, "fields": STORED_FIELDS, "blocks": blocks, "ids": ids}).encode("utf-8"))
+        f.write(struct.pack("<Q", footer_offset))
+
+
+class DocumentStore:
+    """Read access to a store file. Only the id -> block map is held in memory."""
+
+    def __init__(self, path, cache_blocks=DEFAULT_CACHED_BLOCKS):
+        self.path = path
+        self.cache_blocks = cache_blocks
+        self._file = open(path, "rb")
+        # Closes the file when the store is garbage collected (e.g. with the last document using it)
+        self._closer = weakref.finalize(self, self._file.close)
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()
+        self.block_reads = 0
+        self.cache_hits = 0
+        if self._file.read(len(MAGIC)) != MAGIC:
+            self._file.close()
+            raise ValueError(f"{path} is not a document store")
+        self._file.seek(-8, 2)
+        footer_end = self._file.tell()
+        (footer_offset,) = struct.unpack("<Q", self._file.read(8))
+        self._file.seek(footer_offset)
+        footer = json.loads(self._file.read(footer_end - footer_offset))
+        self._decompress = CODECS[footer["codec"]][1]
+        self._fields = footer["fields"]
+        self._blocks = footer["blocks"]
+        # document id -> (block number, position inside the block)
+        self._locations = {}
+        ids = iter(footer["ids"])
+        for block_number, (offset, length, count) in enumerate(self._blocks):
+            for slot in range(count):
+                self._locations[next(ids)] = (block_number, slot)
+
+    def __len__(self):
+        return len(self._locations)
+
+    def __contains__(self, document_id):
+        return document_id in self._locations
+
+    def _block(self, block_number):
+        # Callers hold self._lock
+        block = self._cache.get(block_number)
+        if block is not None:
+            self.cache_hits += 1
+            self._cache.move_to_end(block_number)
+            return block
+        offset, length, count = self._blocks[block_number]
+        self._file.seek(offset)
+        block = json.loads(self._decompress(self._file.read(length)))
+        self.block_reads += 1
+        self._cache[block_number] = block
+        while len(self._cache) > self.cache_blocks:
+            self._cache.popitem(last=False)
+        return block
+
+    def get(self, document_id):
+        """Return the stored fields of a document as a dict."""
+        block_number, slot = self._locations[document_id]
+        with self._lock:
+            record = self._block(block_number)[slot]
+        return dict(zip(self._fields, record))
+
+    def get_field(self, document_id, field):
+        return self.get(document_id)[field]
+
+    def close(self):
+        self._closer()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def detach_documents(documents, store):
+    """
+    Drop title and raw_text of every document from memory; from now on they are read from
+    `store` on access. Documents whose id is not in the store are left unchanged.
+    """
+    for doc in documents:
+        if doc.document_id in store:
+            doc.attach_store(store)
@@ -2,34 +2,133 @@
 # # The implementation of this class may be altered, but the original public attributes/methods are accessible.
 # # E. g. filtered_terms() may be changed to use to online filtering.
 
+import itertools
+
 from porter_stemmer import PorterStemmer
 
 MAX_PREVIEW_SIZE = 10
+_terms_assignments = itertools.count(1)
 
 class Document(object):
+    # Changes with every assignment of a term list to any document (including new documents), so
+    # caches computed from a whole collection's terms can check in O(1) that they are still valid
+    terms_generation = 0
+
     def __init__(self, document_id=None, title="", raw_text="", terms=None, author="", origin=""):
         if terms is None:
             terms = []
         self.document_id = document_id
+        self._store = None
+        # Term variants still held in a corpus cache's columns (see corpus_cache.py): {variant: loader}.
+        # Replaced, never modified in place, because shallow copies (snapshot.py) share it.
+        self._term_columns = None
         self.title = title
         self.raw_text = raw_text
+        self._stemmed_terms = None
+        self._filtered_stemmed_terms = None
+        self._stopword_filter = None
         self.terms = terms
         # self._filtered_terms = []
         self.filtered_terms = []
-        self._stemmed_terms = None
-        self._filtered_stemmed_terms = None
         self.author = author
         self.origin = origin
+        # Start offset of each term in raw_text (array of ints), set by the loaders for snippets
+        self.term_offsets = None
+        # Near-duplicate detection at ingest (dedup.py): id of the representative story, and on
+        # the representative the ids of its duplicates
+        self.duplicate_of = None
+        self.duplicates = ()
 
     def __str__(self):
         shortened_content = (self.raw_text[:MAX_PREVIEW_SIZE] +
                              "...") if len(self.raw_text) > MAX_PREVIEW_SIZE else self.raw_text
         return 'D' + str(self.document_id).zfill(3) + ': ' + self.title + '("' + shortened_content + '")'
 
-    # def filtered_terms(self):
-    #     return self._filtered_terms
+    # Title and raw text are kept in memory unless the document was attached to a
+    # block-compressed DocumentStore (see doc_store.py); then they are read on access.
+    @property
+    def title(self):
+        if self._title is None and self._store is not None:
+            return self._store.get_field(self.document_id, "title")
+        return self._title
+
+    @title.setter
+    def title(self, value):
+        self._title = value
+
+    @property
+    def raw_text(self):
+        if self._raw_text is None and self._store is not None:
+            return self._store.get_field(self.document_id, "raw_text")
+        return self._raw_text
+
+    @raw_text.setter
+    def raw_text(self, value):
+        self._raw_text = value
+
+    def attach_store(self, store):
+        self._store = store
+        self._title = None
+        self._raw_text = None
+
+    # Assigning new terms drops the stemmed copies derived from the old ones.
+    @property
+    def terms(self):
+        return self._terms
+
+    @terms.setter
+    def terms(self, value):
+        self._terms = value
+        Document.terms_generation = next(_terms_assignments)
+        self._drop_term_columns("stemmed_terms")
+        self._stemmed_terms = None
+        if self._stopword_filter is not None:
+            self._filtered_terms = None
+            self._filtered_stemmed_terms = None
+
+    # Online filtering: with a stopword filter attached (see stopword_filter.py) the filtered
+    # terms are computed on first access. Assigning a list replaces the filter.
+    @property
+    def filtered_terms(self):
+        if self._filtered_terms is None and self._stopword_filter is not None:
+            self._filtered_terms = self._stopword_filter.apply(self.terms)
+        elif self._filtered_terms is None and self._term_columns and "filtered_terms" in self._term_columns:
+            self._filtered_terms = self._term_columns["filtered_terms"]()
+        return self._filtered_terms
+
+    @filtered_terms.setter
+    def filtered_terms(self, value):
+        self._filtered_terms = value
+        self._filtered_stemmed_terms = None
+        self._stopword_filter = None
+        self._drop_filtered_columns()
+
+    def set_stopword_filter(self, stopword_filter):
+        self._stopword_filter = stopword_filter
+        self._filtered_terms = None
+        self._filtered_stemmed_terms = None
+        self._drop_filtered_columns()
+
+    def _drop_filtered_columns(self):
+        self._drop_term_columns("filtered_terms", "filtered_stemmed_terms")
+
+    def _drop_term_columns(self, *variants):
+        if self._term_columns:
+            self._term_columns = {variant: loader for variant, loader in self._term_columns.items()
+                                  if variant not in variants}
+
+    def attach_term_columns(self, loaders):
+        """Read the given term variants ({variant: function returning the list}) on first access."""
+        self._term_columns = dict(loaders)
+        if "filtered_terms" in loaders:
+            self._stopword_filter = None
+            self._filtered_terms = None
+        self._stemmed_terms = None
+        self._filtered_stemmed_terms = None
 
     def stemmed_terms(self):
+        if self._stemmed_terms is None and self._term_columns and "stemmed_terms" in self._term_columns:
+            self._stemmed_terms = self._term_columns["stemmed_terms"]()
         if self._stemmed_terms is None:
             stemmer = PorterStemmer()
             self._stemmed_terms = stemmer.stem_terms(self.terms)
@@ -42,11 +141,10 @@ class Document(object):
     #     return self._filtered_stemmed_terms
     
     def filtered_stemmed_terms(self):
+        if (self._filtered_stemmed_terms is None and self._term_columns
+                and "filtered_stemmed_terms" in self._term_columns):
+            self._filtered_stemmed_terms = self._term_columns["filtered_stemmed_terms"]()
         if self._filtered_stemmed_terms is None:
             stemmer = PorterStemmer()
             self._filtered_stemmed_terms = stemmer.stem_terms(self.filtered_terms)
         return self._filtered_stemmed_terms
-
-
-
-
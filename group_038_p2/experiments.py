@@ -0,0 +1,297 @@
+"""
+Experiment grid: run every combination of stopword handling, stemming and search mode over a
+query set with relevance judgments and compare effectiveness, latency and memory.
+
+Analysis artifacts are built once in the parent process and shared: one filtered copy of
+the collection per stopword setting (the copies share raw text and term lists), the stemmed
+term lists, and the index or LSI model of every variant the grid needs. Configurations run
+in worker processes forked from the parent, and every configuration is handed its artifact
+directly, so large grids do not depend on what the index and model caches still hold and
+nothing is rebuilt or pickled. Without fork support they run one after another in-process.
+
+    python experiments.py --file book.txt --grid grid.json --queries queries.tsv --qrels qrels.txt
+
+grid.json lists the values to combine, e.g.
+    {"stopwords": ["none", "list:englishST.txt", "frequency:0.05:0.0005"],
+     "stemmed": [false, true], "mode": ["boolean", "vsm", "bm25"]}
+queries.tsv has "query id<TAB>query" lines; qrels has "query id  document id" lines (TREC
+"qid 0 docid relevance" lines are accepted too, relevance > 0 counts as relevant).
+"""
+
+import argparse
+import concurrent.futures
+import copy
+import csv
+import itertools
+import json
+import multiprocessing
+import os
+import sys
+import time
+import tracemalloc
+from typing import NamedTuple
+
+from batch import latency_summary
+from index import get_index
+from lsi import LsiModel
+from memory_usage import index_size
+from my_module import precision_recall, precision_at_k, average_precision, vector_space_search, bm25_search
+from test_wrapper import (
+    linear_boolean_search,
+    lsi_search,
+    remove_stopwords_by_list,
+    remove_stopwords_by_frequency,
+)
+
+MODES = ("boolean", "vsm", "bm25", "lsi")
+
+
+class Configuration(NamedTuple):
+    stopwords: str      # "none", "list:<path>" or "frequency:<common>:<rare>"
+    stemmed: bool
+    mode: str
+
+
+def expand_grid(grid):
+    """All configurations of a grid dict with "stopwords", "stemmed" and "mode" lists."""
+    stopwords = grid.get("stopwords", ["none"])
+    stemmed = grid.get("stemmed", [False])
+    modes = grid.get("mode", ["vsm"])
+    for mode in modes:
+        if mode not in MODES:
+            raise ValueError(f"unknown mode {mode!r}, expected one of {', '.join(MODES)}")
+    return [Configuration(s or "none", bool(st), m) for s, st, m in itertools.product(stopwords, stemmed, modes)]
+
+
+def read_queries(path):
+    """[(query id, query)] from "query id<TAB>query" lines."""
+    queries = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                qid, query = line.rstrip("\n").split("\t", 1)
+                queries.append((qid.strip(), query.strip()))
+    return queries
+
+
+def read_qrels(path):
+    """{query id: set of relevant document ids}."""
+    qrels = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 4:
+                qid, _, doc_id, relevance = parts
+            elif len(parts) == 3:
+                qid, doc_id, relevance = parts
+            elif len(parts) == 2:
+                (qid, doc_id), relevance = parts, "1"
+            else:
+                continue
+            if float(relevance) > 0:
+                qrels.setdefault(qid, set()).add(int(doc_id))
+    return qrels
+
+
+def apply_stopwords(documents, spec):
+    """Return a filtered copy of the collection for a stopword spec ("none" returns it as is)."""
+    if spec == "none":
+        return tuple(documents)
+    kind, _, argument = spec.partition(":")
+    copies = [copy.copy(doc) for doc in documents]
+    if kind == "list":
+        with open(os.path.expanduser(argument), "r") as f:
+            stopwords = set(line.strip().lower() for line in f)
+        for doc in copies:
+            remove_stopwords_by_list(doc, stopwords)
+    elif kind == "frequency":
+        common, rare = (float(value) for value in argument.split(":"))
+        for doc in copies:
+            remove_stopwords_by_frequency(doc, documents, common_frequency=common, rare_frequency=rare)
+    else:
+        raise ValueError(f"unknown stopword setting {spec!r}")
+    return tuple(copies)
+
+
+def artifact_key(config):
+    """Configurations with the same key search the same index (vsm, bm25) or LSI model."""
+    return (config.stopwords, config.stemmed, "lsi" if config.mode == "lsi" else "index")
+
+
+def prepare_artifacts(documents, configurations):
+    """
+    Build everything the configurations share. Returns ({stopword spec: filtered collection},
+    {artifact key: index or LsiModel}); stemmed term lists are computed on the documents.
+    """
+    documents = list(documents)
+    if any(config.stemmed for config in configurations):
+        # Stemmed before copying, so every filtered copy shares the unfiltered stemmed lists
+        for doc in documents:
+            doc.stemmed_terms()
+    variants = {spec: apply_stopwords(documents, spec)
+                for spec in dict.fromkeys(config.stopwords for config in configurations)}
+    artifacts = {}
+    for config in configurations:
+        collection = variants[config.stopwords]
+        stopword_filtered = config.stopwords != "none"
+        key = artifact_key(config)
+        if config.mode == "boolean":
+            if config.stemmed and stopword_filtered:
+                for doc in collection:
+                    doc.filtered_stemmed_terms()
+        elif key not in artifacts:
+            if config.mode == "lsi":
+                artifacts[key] = LsiModel.build(collection, stopword_filtered=stopword_filtered,
+                                                stemmed=config.stemmed)
+            else:
+                artifacts[key] = get_index(collection, stopword_filtered, config.stemmed)
+    return variants, artifacts
+
+
+def run_query(config, collection, query, artifact=None):
+    """
+    Ranked document ids for one query; Boolean queries are the AND of their terms. `artifact`
+    is the configuration's prepared index or LSI model (None: the cached one is used).
+    """
+    stopword_filtered = config.stopwords != "none"
+    if config.mode == "boolean":
+        matches = None
+        for term in query.split():
+            found = {id(doc) for score, doc in linear_boolean_search(term, collection, stopword_filtered,
+                                                                      config.stemmed) if score == 1}
+            matches = found if matches is None else matches & found
+        return [doc.document_id for doc in collection if matches and id(doc) in matches]
+    if config.mode == "vsm":
+        results = vector_space_search(query, collection, stopword_filtered, config.stemmed, index=artifact)
+    elif config.mode == "bm25":
+        results = bm25_search(query, collection, stopword_filtered, config.stemmed, index=artifact)
+    elif artifact is not None:
+        results = artifact.search(query)
+    else:
+        results = lsi_search(query, collection, stopword_filtered, config.stemmed)
+    ranked = sorted(results, key=lambda r: r[0], reverse=True)
+    return [doc.document_id for score, doc in ranked if score > 0]
+
+
+def evaluate_configuration(config, collection, queries, qrels, k=10, measure_memory=True, artifact=None):
+    """
+    Effectiveness, latency and memory of one configuration, as a flat dict. index_kib is the
+    size of what the mode searches: the index, or the LSI model.
+    """
+    latencies = []
+    precisions, recalls, precisions_at_k, average_precisions = [], [], [], []
+    for qid, query in queries:
+        started = time.perf_counter()
+        ranking = run_query(config, collection, query, artifact)
+        latencies.append(time.perf_counter() - started)
+        if qid not in qrels:
+            continue
+        relevant = qrels[qid]
+        precision, recall = precision_recall(set(ranking), relevant)
+        precisions.append(precision)
+        recalls.append(recall)
+        precisions_at_k.append(precision_at_k(ranking, relevant, k))
+        average_precisions.append(average_precision(ranking, relevant))
+
+    peak = 0
+    if measure_memory:
+        # A second pass under tracemalloc, so tracing does not distort the latencies
+        tracemalloc.start()
+        for qid, query in queries:
+            run_query(config, collection, query, artifact)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    mean = lambda values: sum(values) / len(values) if values else 0.0
+    latency = latency_summary(latencies)
+    stopword_filtered = config.stopwords != "none"
+    if config.mode == "boolean":
+        index_bytes = 0
+    elif config.mode == "lsi":
+        index_bytes = (artifact or LsiModel.build(collection, stopword_filtered=stopword_filtered,
+                                                  stemmed=config.stemmed)).memory_bytes
+    else:
+        index_bytes = index_size(artifact or get_index(collection, stopword_filtered, config.stemmed), set())
+    return {
+        "stopwords": config.stopwords,
+        "stemmed": config.stemmed,
+        "mode": config.mode,
+        "queries": len(precisions),
+        "precision": mean(precisions),
+        "recall": mean(recalls),
+        f"p@{k}": mean(precisions_at_k),
+        "map": mean(average_precisions),
+        "mean_ms": latency["mean_ms"],
+        "p95_ms": latency["p95"],
+        "index_kib": index_bytes / 1024,
+        "peak_query_kib": peak / 1024,
+    }
+
+
+# Set in the parent before the workers are forked, so they inherit the artifacts
+_shared = None
+
+
+def _run_shared(config):
+    variants, artifacts, queries, qrels, k, measure_memory = _shared
+    return evaluate_configuration(config, variants[config.stopwords], queries, qrels, k, measure_memory,
+                                  artifacts.get(artifact_key(config)))
+
+
+def run_grid(documents, configurations, queries, qrels, workers=None, k=10, measure_memory=True):
+    """Evaluate all configurations (in parallel where fork is available); results in grid order."""
+    global _shared
+    variants, artifacts = prepare_artifacts(documents, configurations)
+    _shared = (variants, artifacts, queries, qrels, k, measure_memory)
+    try:
+        workers = min(workers or os.cpu_count() or 1, len(configurations))
+        if workers > 1 and "fork" in multiprocessing.get_all_start_methods():
+            with concurrent.futures.ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("fork")) as pool:
+                return list(pool.map(_run_shared, configurations))
+        return [_run_shared(config) for config in configurations]
+    finally:
+        _shared = None
+
+
+def format_table(results):
+    if not results:
+        return ""
+    columns = list(results[0])
+    rows = [[f"{value:.4f}" if isinstance(value, float) else str(value) for value in result.values()]
+            for result in results]
+    widths = [max(len(column), *(len(row[i]) for row in rows)) for i, column in enumerate(columns)]
+    lines = ["  ".join(column.ljust(width) for column, width in zip(columns, widths))]
+    lines += ["  ".join(value.ljust(width) for value, width in zip(row, widths)) for row in rows]
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    from cli import add_collection_arguments, load_collection_from_args
+
+    parser = argparse.ArgumentParser(description="Evaluate a grid of search configurations.")
+    add_collection_arguments(parser)
+    parser.add_argument("--grid", required=True, help="JSON file with stopwords/stemmed/mode lists")
+    parser.add_argument("--queries", required=True, help="query id<TAB>query per line")
+    parser.add_argument("--qrels", required=True, help="relevance judgments")
+    parser.add_argument("--workers", type=int, default=0, help="worker processes (default: one per CPU)")
+    parser.add_argument("--top-k", type=int, default=10, help="k for precision at k")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass")
+    parser.add_argument("--csv", help="also write the table to this CSV file")
+    args = parser.parse_args(argv)
+
+    with open(args.grid, "r", encoding="utf-8") as f:
+        configurations = expand_grid(json.load(f))
+    documents = load_collection_from_args(args)
+    results = run_grid(documents, configurations, read_queries(args.queries), read_qrels(args.qrels),
+                       args.workers or None, args.top_k, not args.no_memory)
+    print(format_table(results))
+    if args.csv:
+        with open(args.csv, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=list(results[0]))
+            writer.writeheader()
+            writer.writerows(results)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
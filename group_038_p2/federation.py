@@ -0,0 +1,170 @@
+"""
+Federated search over several independently loaded, named collections.
+
+Every named collection has its own SnapshotStore, so it is indexed separately with its own
+statistics (df, idf, average document length). Loading one collection does not replace the
+others, and a query only pays for the collections it selects. A federated query runs on the
+selected collections in a thread pool; the searches are pure Python and hold the GIL, so this
+overlaps little more than index loading and gives no speedup over searching them in turn (see
+sharding.py for process-parallel search). Each collection's scores are normalized (min-max
+by default), because raw scores from differently sized collections are not comparable, and
+the hits are then merged into one ranking.
+
+Documents keep their per-collection document_id. Across collections they are addressed by
+qualified ids "<collection>:<document id>", which never collide.
+"""
+
+import concurrent.futures
+import math
+import threading
+from typing import NamedTuple
+
+from my_module import linear_boolean_search, vector_space_search, bm25_search
+from snapshot import SnapshotStore
+
+MODES = ("boolean", "vsm", "bm25")
+NORMALIZATIONS = ("minmax", "zscore", "none")
+SEPARATOR = ":"
+
+
+def qualified_id(name, doc):
+    return f"{name}{SEPARATOR}{doc.document_id}"
+
+
+def parse_qualified_id(qualified):
+    """(collection name, document id) of a qualified id."""
+    name, separator, doc_id = qualified.rpartition(SEPARATOR)
+    if not separator or not name:
+        raise ValueError(f"{qualified!r} is not a qualified document id (expected collection{SEPARATOR}id)")
+    return name, int(doc_id)
+
+
+class FederatedHit(NamedTuple):
+    score: float        # normalized, comparable across collections
+    collection: str
+    document: object
+    raw_score: float    # the score within its own collection
+
+    @property
+    def qualified_id(self):
+        return qualified_id(self.collection, self.document)
+
+
+class CollectionRegistry:
+    """Named collections, each with its own SnapshotStore."""
+
+    def __init__(self):
+        self._stores = {}
+        self._lock = threading.Lock()
+
+    def add(self, name, documents, stopword_filtered=False):
+        """Load `documents` as collection `name` (replacing only that collection); returns its store."""
+        if not name or SEPARATOR in name:
+            raise ValueError(f"collection names must be non-empty and must not contain {SEPARATOR!r}")
+        with self._lock:
+            store = self._stores.get(name)
+            if store is None:
+                store = self._stores[name] = SnapshotStore(documents, stopword_filtered)
+                return store
+        store.publish(documents, stopword_filtered)
+        return store
+
+    def remove(self, name):
+        with self._lock:
+            del self._stores[name]
+
+    def store(self, name):
+        with self._lock:
+            try:
+                return self._stores[name]
+            except KeyError:
+                raise KeyError(f"no collection named {name!r}") from None
+
+    def names(self):
+        with self._lock:
+            return list(self._stores)
+
+    def __contains__(self, name):
+        with self._lock:
+            return name in self._stores
+
+    def __len__(self):
+        with self._lock:
+            return len(self._stores)
+
+    def document(self, qualified):
+        """The document a qualified id refers to."""
+        name, doc_id = parse_qualified_id(qualified)
+        for doc in self.store(name).current().documents:
+            if doc.document_id == doc_id:
+                return doc
+        raise KeyError(f"no document {qualified!r}")
+
+
+def normalize_scores(scores, method="minmax"):
+    """
+    Map one collection's scores to a common scale: min-max to [0, 1] (the best hit gets 1, the
+    weakest 0, unless all are equal), z-scores, or unchanged.
+    """
+    if method == "none" or not scores:
+        return list(scores)
+    if method == "minmax":
+        low, high = min(scores), max(scores)
+        if high == low:
+            return [1.0] * len(scores)
+        return [(score - low) / (high - low) for score in scores]
+    if method == "zscore":
+        mean = sum(scores) / len(scores)
+        deviation = math.sqrt(sum((score - mean) ** 2 for score in scores) / len(scores))
+        return [(score - mean) / deviation if deviation > 0 else 0.0 for score in scores]
+    raise ValueError(f"unknown normalization {method!r}, expected one of {', '.join(NORMALIZATIONS)}")
+
+
+def search_collection(documents, query, mode="vsm", stopword_filtered=False, stemmed=False):
+    """Matching (score, Document) of one collection, best first. Boolean queries are the AND of their terms."""
+    if mode == "boolean":
+        matches = None
+        for term in query.split():
+            found = {id(doc) for score, doc in linear_boolean_search(term, documents, stopword_filtered, stemmed)
+                     if score == 1}
+            matches = found if matches is None else matches & found
+        return [(1.0, doc) for doc in documents if matches and id(doc) in matches]
+    if mode == "vsm":
+        results = vector_space_search(query, documents, stopword_filtered, stemmed)
+    elif mode == "bm25":
+        results = bm25_search(query, documents, stopword_filtered, stemmed)
+    else:
+        raise ValueError(f"unknown search mode {mode!r}, expected one of {', '.join(MODES)}")
+    return sorted(((score, doc) for score, doc in results if score > 0), key=lambda r: r[0], reverse=True)
+
+
+def federated_search(registry, query, names=None, mode="vsm", stopword_filtered=False, stemmed=False, top_k=10,
+                     normalization="minmax", max_workers=None):
+    """
+    Search the named collections (default: all) and merge their hits by normalized score;
+    returns up to `top_k` FederatedHits (all hits if top_k is None). Stopword-filtered terms are
+    used only in collections that have them. The collections are searched from a thread pool,
+    which under the GIL takes about as long as searching them one after the other.
+    """
+    names = registry.names() if names is None else list(names)
+    snapshots = {name: registry.store(name).current() for name in names}
+
+    def search(name):
+        snapshot = snapshots[name]
+        return search_collection(snapshot.documents, query, mode, stopword_filtered and snapshot.stopword_filtered,
+                                 stemmed)
+
+    if len(names) > 1:
+        with concurrent.futures.ThreadPoolExecutor(max_workers or len(names)) as pool:
+            per_collection = dict(zip(names, pool.map(search, names)))
+    else:
+        per_collection = {name: search(name) for name in names}
+
+    hits = []
+    for name, results in per_collection.items():
+        # Normalized over everything the collection matched, then cut to its top k
+        normalized = normalize_scores([score for score, doc in results], normalization)
+        hits.extend(FederatedHit(score, name, doc, raw_score)
+                    for score, (raw_score, doc) in list(zip(normalized, results))[:top_k])
+    hits.sort(key=lambda hit: (-hit.score, -hit.raw_score, hit.collection))
+    return hits[:top_k]
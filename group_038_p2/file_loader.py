@@ -0,0 +1,139 @@
+"""
+Loading collections from local text files through mmap.
+
+Only the requested line window is decoded: a sparse line-offset index (one checkpoint every
+LINE_INDEX_STRIDE lines) turns start_line/end_line into a byte range of the mapped file. The
+index is built incrementally, only as far as the requested lines, and cached per file
+(keyed by path, size and modification time) so later loads of the same book reuse it.
+
+Lines are delimited as by str.splitlines(), which parse_collection uses for downloaded texts:
+besides "\n", "\r\n" and "\r" that includes form feeds, the other ASCII separators and
+U+0085, U+2028 and U+2029, so a line window selects the same text from a file and a URL.
+The byte-level scan assumes UTF-8 (or ASCII); other encodings are decoded whole.
+"""
+
+import codecs
+import mmap
+import os
+import re
+from array import array
+from collections import OrderedDict
+
+from document import Document
+from my_module import extract_documents
+
+LINE_INDEX_STRIDE = 256
+MAX_CACHED_LINE_INDEXES = 16
+# The line boundaries of str.splitlines() in UTF-8
+_LINE_BREAK = re.compile(rb"\r\n|[\n\r\x0b\x0c\x1c-\x1e]|\xc2\x85|\xe2\x80[\xa8\xa9]")
+
+
+class LineIndex:
+    """Byte offsets of every LINE_INDEX_STRIDE-th line start of one file."""
+
+    def __init__(self, size, stride=LINE_INDEX_STRIDE):
+        self.size = size
+        self.stride = stride
+        self.checkpoints = array("Q", [0])
+        # Position and line number up to which the file has been scanned
+        self._scanned_line = 0
+        self._scanned_offset = 0
+        self.complete = size == 0
+        self.line_count = 0 if size == 0 else None
+
+    def _scan_until(self, mm, line):
+        # Extend the checkpoints so that `line` (or the end of the file) is covered
+        if self.complete:
+            return
+        pos = self._scanned_offset
+        current = self._scanned_line
+        target = (line // self.stride) * self.stride
+        while current < target:
+            line_break = _LINE_BREAK.search(mm, pos)
+            if line_break is None or line_break.end() >= self.size:
+                self.complete = True
+                self.line_count = current + 1
+                break
+            pos = line_break.end()
+            current += 1
+            if current % self.stride == 0:
+                self.checkpoints.append(pos)
+        self._scanned_line = current
+        self._scanned_offset = pos
+
+    def offset_of(self, mm, line):
+        """Byte offset where `line` starts, or the file size if the file has fewer lines."""
+        if line <= 0:
+            return 0
+        self._scan_until(mm, line)
+        checkpoint = min(line // self.stride, len(self.checkpoints) - 1)
+        pos = self.checkpoints[checkpoint]
+        for _ in range(line - checkpoint * self.stride):
+            line_break = _LINE_BREAK.search(mm, pos)
+            if line_break is None or line_break.end() >= self.size:
+                return self.size
+            pos = line_break.end()
+        return pos
+
+    def count_lines(self, mm):
+        while not self.complete:
+            self._scan_until(mm, self._scanned_line + self.stride * 1024)
+        return self.line_count
+
+
+_line_indexes = OrderedDict()
+
+
+def get_line_index(path, stat_result):
+    key = (os.path.realpath(path), stat_result.st_size, stat_result.st_mtime_ns)
+    index = _line_indexes.get(key)
+    if index is None:
+        index = LineIndex(stat_result.st_size)
+        _line_indexes[key] = index
+        while len(_line_indexes) > MAX_CACHED_LINE_INDEXES:
+            _line_indexes.popitem(last=False)
+    _line_indexes.move_to_end(key)
+    return index
+
+
+def read_line_range(path: str, start_line: int, end_line: int, encoding: str = "utf-8") -> str:
+    """
+    Return lines start_line..end_line (exclusive, slice semantics incl. negative indices) of the
+    file joined with "\n", decoding only that byte range. Lines are split as by str.splitlines().
+    """
+    if codecs.lookup(encoding).name not in ("utf-8", "ascii"):
+        with open(path, "r", encoding=encoding, newline="") as f:
+            return "\n".join(f.read().splitlines()[start_line:end_line])
+    with open(path, "rb") as f:
+        stat_result = os.fstat(f.fileno())
+        if stat_result.st_size == 0:
+            return ""
+        index = get_line_index(path, stat_result)
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if start_line < 0 or end_line < 0:
+                start_line, end_line, _ = slice(start_line, end_line).indices(index.count_lines(mm))
+            if end_line <= start_line:
+                return ""
+            start = index.offset_of(mm, start_line)
+            end = index.offset_of(mm, end_line)
+            with memoryview(mm) as view:
+                data = str(view[start:end], encoding)
+    return "\n".join(data.splitlines())
+
+
+def load_collection_from_file(
+    path: str,
+    search_pattern,
+    start_line: int,
+    end_line: int,
+    author: str,
+    origin: str,
+    first_id: int = 0,
+    pattern_timeout: float = None
+) -> list[Document]:
+    """
+    Local-file counterpart of load_collection_from_url: memory-maps the file and runs story
+    extraction over lines start_line..end_line only.
+    """
+    selected_text = read_line_range(path, int(start_line), int(end_line))
+    return extract_documents(selected_text, search_pattern, author, origin, first_id, pattern_timeout)
@@ -0,0 +1,253 @@
+"""
+Impact-ordered index with precomputed, quantized posting scores.
+
+Every posting stores its term's contribution to the document score (its impact), computed
+once at build time for a weighting scheme:
+    vsm     tf * idf^2 / |d|, the tf-idf dot product normalized by the full document vector
+            length (vector_space_search normalizes over the query terms only, so rankings
+            can differ slightly; see accuracy_report)
+    bm25    the BM25 term score, idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * len / avglen))
+Impacts are quantized linearly to `bits`-bit integers (1 .. 2^bits - 1, so no posting drops
+to zero). The postings of all terms are stored in two flat numpy arrays: document positions
+(uint32) and impacts (uint8 for up to 8 bits), each term's postings sorted by decreasing impact.
+
+A query is evaluated score-at-a-time: the runs of equal impact of all query terms are processed
+in decreasing order of query tf * impact, adding integers to one accumulator per document.
+Because the largest contributions come first, evaluation can stop early (after `max_postings`
+postings or when an anytime Budget runs out) with most of the ranking already settled.
+
+    python impact_index.py --file book.txt --queries queries.txt --bits 8 4 --scheme vsm
+"""
+
+import argparse
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict
+
+import numpy as np
+
+from anytime import Budget, SearchResults
+from index import get_index
+from my_module import analyze_query
+
+SCHEMES = ("vsm", "bm25")
+DEFAULT_BITS = 8
+MAX_CACHED_INDEXES = 4
+
+
+class ImpactIndex:
+    def __init__(self, collection, stopword_filtered=False, stemmed=False, bits=DEFAULT_BITS, scheme="vsm",
+                 k1=1.2, b=0.75):
+        """`bits=None` keeps exact float32 impacts, to measure what quantization costs."""
+        if scheme not in SCHEMES:
+            raise ValueError(f"unknown weighting scheme {scheme!r}, expected one of {', '.join(SCHEMES)}")
+        if bits is not None and not 1 <= bits <= 16:
+            raise ValueError("bits must be between 1 and 16")
+        index = get_index(collection, stopword_filtered, stemmed)
+        self.index = index
+        self.collection = index.collection
+        self.num_docs = index.num_docs
+        self.stopword_filtered = stopword_filtered
+        self.stemmed = stemmed
+        self.bits = bits
+        self.scheme = scheme
+
+        terms = list(index.postings)
+        lengths = np.array([len(index.postings[term]) for term in terms], dtype=np.int64)
+        positions = np.fromiter((pos for term in terms for pos, tf in index.postings[term]),
+                                dtype=np.uint32, count=int(lengths.sum()))
+        tfs = np.fromiter((tf for term in terms for pos, tf in index.postings[term]),
+                          dtype=np.float64, count=len(positions))
+        term_ids = np.repeat(np.arange(len(terms)), lengths)
+        if scheme == "vsm":
+            idf = np.array([index.idf(term) for term in terms])[term_ids]
+            weights = tfs * idf
+            norms = np.sqrt(np.bincount(positions, weights=weights * weights, minlength=self.num_docs))
+            impacts = weights * idf / norms[positions]
+        else:
+            idf = np.array([index.bm25_idf(term) for term in terms])[term_ids]
+            length_norms = np.asarray(index.length_norms(k1, b), dtype=np.float64)
+            impacts = idf * tfs * (k1 + 1) / (tfs + length_norms[positions])
+
+        if bits is None:
+            self.scale = 1.0
+            impacts = impacts.astype(np.float32)
+        else:
+            levels = (1 << bits) - 1
+            self.scale = float(impacts.max()) / levels if len(impacts) and impacts.max() > 0 else 1.0
+            impacts = np.clip(np.rint(impacts / self.scale), 1, levels).astype(np.uint8 if bits <= 8 else np.uint16)
+
+        # Grouped by term (terms stay contiguous), then by decreasing impact
+        order = np.lexsort((positions, -impacts.astype(np.float64), term_ids))
+        self.doc_ids = positions[order]
+        self.impacts = impacts[order]
+        ends = np.cumsum(lengths).tolist()
+        self.spans = {term: (end - length, end) for term, end, length in zip(terms, ends, lengths.tolist())}
+
+    @property
+    def quantized(self):
+        return self.bits is not None
+
+    @property
+    def memory_bytes(self):
+        return self.doc_ids.nbytes + self.impacts.nbytes
+
+    def _segments(self, query_counts):
+        # (query tf * impact, query tf, start, end): runs of equal impact, or whole terms (ordered
+        # by their largest impact) if not quantized
+        segments = []
+        for term, qtf in query_counts.items():
+            span = self.spans.get(term)
+            if span is None:
+                continue
+            start, end = span
+            if not self.quantized:
+                segments.append((qtf * float(self.impacts[start]), qtf, start, end))
+                continue
+            runs = (np.flatnonzero(np.diff(self.impacts[start:end])) + 1 + start).tolist()
+            for run_start, run_end in zip([start] + runs, runs + [end]):
+                segments.append((qtf * int(self.impacts[run_start]), qtf, run_start, run_end))
+        segments.sort(key=lambda segment: segment[0], reverse=True)
+        return segments
+
+    def search(self, query, budget=None, max_postings=None):
+        """
+        (score, Document) for every document in collection order, like vector_space_search.
+        Results are partial if `max_postings` or the anytime `budget` cut evaluation short.
+        """
+        budget = budget or Budget()
+        segments = self._segments(Counter(analyze_query(query, self.stemmed)))
+        total = sum(end - start for _, _, start, end in segments)
+        limit = total if max_postings is None else min(total, max_postings)
+        accumulators = np.zeros(self.num_docs, dtype=np.int64 if self.quantized else np.float64)
+        processed = 0
+        reason = budget.exhausted()
+        for weight, qtf, start, end in segments:
+            if reason or processed >= limit:
+                break
+            end = min(end, start + limit - processed)
+            # Document positions are distinct within a term, so fancy-index addition is safe
+            if self.quantized:
+                accumulators[self.doc_ids[start:end]] += weight
+            else:
+                accumulators[self.doc_ids[start:end]] += qtf * self.impacts[start:end]
+            processed += end - start
+            reason = budget.exhausted()
+        scores = (accumulators * self.scale).tolist()
+        return SearchResults(zip(scores, self.collection), processed, total, reason or "max_postings")
+
+
+_impact_cache = OrderedDict()
+_impact_cache_lock = threading.Lock()
+
+
+def get_impact_index(collection, stopword_filtered=False, stemmed=False, bits=DEFAULT_BITS, scheme="vsm"):
+    """The impact index of this collection and settings, rebuilt only when its base index is."""
+    index = get_index(collection, stopword_filtered, stemmed)
+    key = (id(collection), stopword_filtered, stemmed, bits, scheme)
+    with _impact_cache_lock:
+        entry = _impact_cache.get(key)
+        if entry is not None and entry.index is index:
+            _impact_cache.move_to_end(key)
+            return entry
+        impact_index = ImpactIndex(collection, stopword_filtered, stemmed, bits, scheme)
+        _impact_cache[key] = impact_index
+        while len(_impact_cache) > MAX_CACHED_INDEXES:
+            _impact_cache.popitem(last=False)
+    return impact_index
+
+
+def impact_search(query, collection, stopword_filtered=False, stemmed=False, bits=DEFAULT_BITS, scheme="vsm"):
+    """Ranked search over the quantized impact index; (score, Document) in collection order."""
+    return get_impact_index(collection, stopword_filtered, stemmed, bits, scheme).search(query)
+
+
+def top_k(results, k):
+    """Positions (in collection order) of the k best positive scores; ties keep collection order."""
+    ranked = sorted(range(len(results)), key=lambda i: results[i][0], reverse=True)
+    return [i for i in ranked if results[i][0] > 0][:k]
+
+
+def _agreement(ranking, reference, k):
+    """
+    (overlap, top-1 agreement) of a top-k ranking with the scores of `reference` results. A hit
+    counts if its reference score reaches the reference's k-th best score, so ties are not errors.
+    """
+    expected = top_k(reference, k)
+    if not expected:
+        return float(not ranking), float(not ranking)
+    tolerance = 1e-9
+    kth_score = reference[expected[-1]][0] - tolerance
+    overlap = sum(reference[i][0] >= kth_score for i in ranking) / len(expected)
+    top1 = bool(ranking) and reference[ranking[0]][0] >= reference[expected[0]][0] - tolerance
+    return overlap, float(top1)
+
+
+def accuracy_report(collection, queries, stopword_filtered=False, stemmed=False, bits=DEFAULT_BITS, scheme="vsm",
+                    k=10):
+    """
+    Compare quantized rankings with the exact vector_space_search ranking and with the same
+    scheme's unquantized impacts (which isolates the quantization error). Overlaps are the
+    mean share of the quantized top k that belongs in the reference top k.
+    """
+    from my_module import vector_space_search
+
+    quantized = ImpactIndex(collection, stopword_filtered, stemmed, bits, scheme)
+    exact_impacts = ImpactIndex(collection, stopword_filtered, stemmed, None, scheme)
+    vsm_seconds = impact_seconds = 0.0
+    vs_vsm, vs_exact_impacts = [], []
+    for query in queries:
+        started = time.perf_counter()
+        reference = vector_space_search(query, collection, stopword_filtered, stemmed)
+        measured = time.perf_counter()
+        ranking = top_k(quantized.search(query), k)
+        impact_seconds += time.perf_counter() - measured
+        vsm_seconds += measured - started
+        vs_vsm.append(_agreement(ranking, reference, k))
+        vs_exact_impacts.append(_agreement(ranking, exact_impacts.search(query), k))
+
+    mean = lambda values: sum(values) / len(values) if values else 0.0
+    return {
+        "scheme": scheme,
+        "bits": bits,
+        "queries": len(queries),
+        "k": k,
+        "overlap_vs_vsm": mean([overlap for overlap, top1 in vs_vsm]),
+        "top1_vs_vsm": mean([top1 for overlap, top1 in vs_vsm]),
+        "overlap_vs_unquantized": mean([overlap for overlap, top1 in vs_exact_impacts]),
+        "top1_vs_unquantized": mean([top1 for overlap, top1 in vs_exact_impacts]),
+        "vsm_query_ms": vsm_seconds / max(len(queries), 1) * 1000,
+        "impact_query_ms": impact_seconds / max(len(queries), 1) * 1000,
+        "memory_bytes": quantized.memory_bytes,
+        "unquantized_memory_bytes": exact_impacts.memory_bytes,
+    }
+
+
+def main(argv=None):
+    from cli import add_collection_arguments, load_analyzed_collection
+
+    parser = argparse.ArgumentParser(description="Compare quantized impact rankings with vector_space_search.")
+    add_collection_arguments(parser)
+    parser.add_argument("--queries", required=True, help="file with one query per line")
+    parser.add_argument("--bits", type=int, nargs="+", default=[DEFAULT_BITS])
+    parser.add_argument("--scheme", choices=SCHEMES, default="vsm")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--stem", action="store_true")
+    args = parser.parse_args(argv)
+
+    documents, filtered = load_analyzed_collection(args)
+    with open(args.queries, "r", encoding="utf-8") as f:
+        queries = [line.strip() for line in f if line.strip()]
+    print(f"{'bits':>5}{'overlap@k vsm':>15}{'top1 vsm':>10}{'overlap@k exact':>17}{'top1 exact':>12}"
+          f"{'vsm ms':>9}{'impact ms':>11}{'KiB':>10}")
+    for bits in args.bits:
+        row = accuracy_report(documents, queries, filtered, args.stem, bits, args.scheme, args.top_k)
+        print(f"{bits:>5}{row['overlap_vs_vsm']:>15.4f}{row['top1_vs_vsm']:>10.4f}"
+              f"{row['overlap_vs_unquantized']:>17.4f}{row['top1_vs_unquantized']:>12.4f}"
+              f"{row['vsm_query_ms']:>9.3f}{row['impact_query_ms']:>11.3f}{row['memory_bytes'] / 1024:>10.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,249 @@
+"""
+Per-collection term statistics shared by the ranked search modes.
+
+Building the statistics (postings, document lengths, df) means walking every token of
+the collection, so it is done once per collection and analyzer variant and reused by
+every query until the underlying term lists change.
+
+Stemmed variants are not built from the stemmed token lists: only the vocabulary of the
+unstemmed index is stemmed, which groups the surface terms into stem classes, and the
+postings of each class are merged. Classes with a single surface term share its postings
+list with the unstemmed index. In the same way, when all documents share one online stopword
+filter (stopword_filter.py), the filtered index is derived from the unfiltered one by
+dropping the stopwords' postings, without materializing any filtered term list.
+"""
+
+import math
+import threading
+from collections import Counter, OrderedDict
+
+from porter_stemmer import PorterStemmer
+
+MAX_CACHED_INDEXES = 8
+MAX_STEMMED_TERMS = 1 << 18
+
+
+def get_doc_terms(doc, stopword_filtered=False, stemmed=False):
+    """Return the term list of `doc` for the given analyzer variant."""
+    if stemmed and stopword_filtered:
+        return doc.filtered_stemmed_terms()
+    elif stemmed:
+        return doc.stemmed_terms()
+    elif stopword_filtered:
+        # filtered_terms is a list attribute here, but older documents expose a method
+        ft = doc.filtered_terms
+        return ft() if callable(ft) else ft
+    else:
+        return doc.terms
+
+
+_stemmer = PorterStemmer()
+_stems = {}
+
+
+def stem_term(term):
+    """
+    Porter stem of `term`, memoized (up to MAX_STEMMED_TERMS terms, then the memo starts over),
+    so each vocabulary term is stemmed about once per process.
+    """
+    stem = _stems.get(term)
+    if stem is None:
+        if len(_stems) >= MAX_STEMMED_TERMS:
+            _stems.clear()
+        stem = _stems[term] = _stemmer.stem(term)
+    return stem
+
+
+def vsm_idf(num_docs, df):
+    """Smoothed tf-idf weight used by the vector space model."""
+    return math.log((num_docs + 1) / (df + 1)) + 1
+
+
+def bm25_idf(num_docs, df):
+    """Non-negative Robertson/Sparck Jones idf used by BM25."""
+    return math.log((num_docs - df + 0.5) / (df + 0.5) + 1)
+
+
+def bm25_length_norms(doc_lengths, avg_doc_length, k1, b):
+    """Per-document k1 * (1 - b + b * dl / avgdl)."""
+    avgdl = avg_doc_length or 1.0
+    return [k1 * (1 - b + b * dl / avgdl) for dl in doc_lengths]
+
+
+def _sources(doc, stopword_filtered):
+    # What a variant's terms are computed from; replacing any of these invalidates the index.
+    if not stopword_filtered:
+        return (doc, doc.terms)
+    stopword_filter = getattr(doc, "_stopword_filter", None)
+    if stopword_filter is not None:
+        return (doc, doc.terms, stopword_filter)
+    ft = doc.filtered_terms
+    return (doc, ft() if callable(ft) else ft)
+
+
+def _shared_filter(collection):
+    # The online stopword filter attached to every document, if they all have the same one
+    stopword_filter = getattr(collection[0], "_stopword_filter", None) if collection else None
+    if stopword_filter is None or any(getattr(doc, "_stopword_filter", None) is not stopword_filter
+                                      for doc in collection):
+        return None
+    return stopword_filter
+
+
+def _merge_postings(postings, classes):
+    # classes: new term -> base terms. Postings of single-term classes are shared, not copied
+    merged_postings = {}
+    for new_term, base_terms in classes.items():
+        if len(base_terms) == 1:
+            merged_postings[new_term] = postings[base_terms[0]]
+        else:
+            merged = Counter()
+            for term in base_terms:
+                for pos, tf in postings[term]:
+                    merged[pos] += tf
+            merged_postings[new_term] = sorted(merged.items())
+    return merged_postings
+
+
+class CollectionIndex:
+    """
+    Inverted index plus length statistics for one analyzer variant of a collection.
+    Documents are addressed by their position in the collection. A stemmed index is derived
+    from `base`, the unstemmed index of the same collection (built here if not given); a
+    filtered index given `base` (the unfiltered index) and `stopword_filter` is derived from it.
+    """
+
+    def __init__(self, collection, stopword_filtered=False, stemmed=False, base=None, stopword_filter=None):
+        self.collection = list(collection)
+        self.stopword_filtered = stopword_filtered
+        self.stemmed = stemmed
+        # stem -> surface terms, for stemmed indexes only
+        self.stem_classes = None
+        if stemmed:
+            if base is None:
+                base = CollectionIndex(self.collection, stopword_filtered)
+            self._derive_stemmed(base)
+        elif base is not None:
+            self._derive_filtered(base, stopword_filter)
+        else:
+            self.doc_lengths = []
+            self.postings = {}
+            for pos, doc in enumerate(self.collection):
+                terms = get_doc_terms(doc, stopword_filtered)
+                self.doc_lengths.append(len(terms))
+                for term, tf in Counter(terms).items():
+                    self.postings.setdefault(term, []).append((pos, tf))
+        self._init_statistics()
+
+    @classmethod
+    def from_postings(cls, collection, postings, doc_lengths, df=None, stopword_filtered=False, stemmed=False):
+        """
+        An index over given postings, e.g. pruned or loaded from a file. `df` defaults to the
+        postings' lengths; pruned indexes pass the original df so idf weights are unchanged.
+        """
+        index = cls.__new__(cls)
+        index.collection = list(collection)
+        index.stopword_filtered = stopword_filtered
+        index.stemmed = stemmed
+        index.stem_classes = None
+        index.postings = postings
+        index.doc_lengths = doc_lengths
+        index._init_statistics(df)
+        return index
+
+    def _init_statistics(self, df=None):
+        self.df = Counter({term: len(plist) for term, plist in self.postings.items()}) if df is None else df
+        self.num_docs = len(self.collection)
+        self.avg_doc_length = sum(self.doc_lengths) / self.num_docs if self.num_docs else 0.0
+        self._idf = {}
+        self._bm25_idf = {}
+        self._length_norms = {}
+
+    def _derive_stemmed(self, base):
+        self.stem_classes = {}
+        for term in base.postings:
+            self.stem_classes.setdefault(stem_term(term), []).append(term)
+        self.postings = _merge_postings(base.postings, self.stem_classes)
+        # Stemming maps tokens one to one, so document lengths are unchanged
+        self.doc_lengths = base.doc_lengths
+
+    def _derive_filtered(self, base, stopword_filter):
+        # Kept terms are grouped by their normalized form; stopword occurrences leave the lengths
+        classes = {}
+        self.doc_lengths = list(base.doc_lengths)
+        for term, postings in base.postings.items():
+            kept = stopword_filter.keep(term)
+            if kept is None:
+                for pos, tf in postings:
+                    self.doc_lengths[pos] -= tf
+            else:
+                classes.setdefault(kept, []).append(term)
+        self.postings = _merge_postings(base.postings, classes)
+
+    def surface_forms(self, stem):
+        """The unstemmed terms of the collection whose stem is `stem` (stemmed indexes only)."""
+        return self.stem_classes.get(stem, [])
+
+    def idf(self, term):
+        if term not in self._idf:
+            self._idf[term] = vsm_idf(self.num_docs, self.df[term])
+        return self._idf[term]
+
+    def bm25_idf(self, term):
+        if term not in self._bm25_idf:
+            self._bm25_idf[term] = bm25_idf(self.num_docs, self.df[term])
+        return self._bm25_idf[term]
+
+    def length_norms(self, k1, b):
+        """BM25 length normalization per document, memoized per (k1, b)."""
+        key = (k1, b)
+        if key not in self._length_norms:
+            self._length_norms[key] = bm25_length_norms(self.doc_lengths, self.avg_doc_length, k1, b)
+        return self._length_norms[key]
+
+
+_index_cache = OrderedDict()
+_index_cache_lock = threading.Lock()
+
+
+def get_index(collection, stopword_filtered=False, stemmed=False):
+    """
+    Return the cached CollectionIndex for this collection and variant, building it if needed.
+    The cache entry is reused as long as every document still holds the same term list objects.
+    """
+    # The index a variant is derived from is fetched first: the unstemmed one for stemmed
+    # variants, the unfiltered one for collections with a shared online stopword filter
+    stopword_filter = None
+    if stemmed:
+        base = get_index(collection, stopword_filtered)
+    else:
+        stopword_filter = _shared_filter(collection) if stopword_filtered else None
+        base = get_index(collection) if stopword_filter is not None else None
+    key = (id(collection), stopword_filtered, stemmed)
+    sources = [_sources(doc, stopword_filtered) for doc in collection]
+    with _index_cache_lock:
+        entry = _index_cache.get(key)
+        if entry is not None:
+            cached_sources, index = entry
+            if len(cached_sources) == len(sources) and all(
+                    len(a) == len(b) and all(x is y for x, y in zip(a, b)) for a, b in zip(cached_sources, sources)):
+                _index_cache.move_to_end(key)
+                return index
+        index = CollectionIndex(collection, stopword_filtered, stemmed, base, stopword_filter)
+        _index_cache[key] = (sources, index)
+        _index_cache.move_to_end(key)
+        while len(_index_cache) > MAX_CACHED_INDEXES:
+            _index_cache.popitem(last=False)
+    return index
+
+
+def cached_indexes(collection):
+    """Return the cached indexes built for this collection object, without building any."""
+    with _index_cache_lock:
+        return [index for (collection_id, sf, st), (sources, index) in _index_cache.items()
+                if collection_id == id(collection)]
+
+
+def clear_index_cache():
+    with _index_cache_lock:
+        _index_cache.clear()
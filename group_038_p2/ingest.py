@@ -0,0 +1,221 @@
+"""
+Bulk ingestion of many sources into one collection.
+
+A manifest lists (url, author, origin, start_line, end_line, pattern) entries. The texts are
+fetched concurrently with asyncio (bounded parallelism, keep-alive connections reused per
+host, retries with exponential backoff and a minimum interval between requests to the same
+host) and then parsed in manifest order into one collection with unique document IDs.
+"""
+
+import asyncio
+import http.client
+import json
+import re
+import threading
+from typing import NamedTuple
+from urllib.parse import urljoin, urlsplit
+
+from document import Document
+from my_module import parse_collection, PATTERN_TIME_BUDGET
+
+MAX_REDIRECTS = 5
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class ManifestEntry(NamedTuple):
+    url: str
+    author: str
+    origin: str
+    start_line: int
+    end_line: int
+    pattern: re.Pattern
+
+
+class DownloadError(Exception):
+    pass
+
+
+def load_manifest(path):
+    """
+    Read a manifest: either a JSON list of objects or one JSON object per line. Each object has
+    url, author, origin, start_line, end_line and optionally pattern (omitted: built-in story
+    splitter); an optional "flags" list names re flags (default ["DOTALL"], since story bodies span lines).
+    Invalid entries raise ValueError naming their line (or, in a JSON list, their position).
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        content = f.read()
+    stripped = content.strip()
+    if stripped.startswith("["):
+        records = enumerate(json.loads(stripped), 1)
+        where = "entry"
+    else:
+        records = []
+        for number, line in enumerate(content.splitlines(), 1):
+            if line.strip():
+                try:
+                    records.append((number, json.loads(line)))
+                except ValueError as e:
+                    raise ValueError(f"{path}: line {number}: {e}") from None
+        where = "line"
+    entries = []
+    for number, record in records:
+        try:
+            entries.append(manifest_entry(record))
+        except ValueError as e:
+            raise ValueError(f"{path}: {where} {number}: {e}") from None
+    return entries
+
+
+def manifest_entry(record):
+    """The ManifestEntry of one manifest object; ValueError if it is incomplete or its pattern is invalid."""
+    if not isinstance(record, dict):
+        raise ValueError("expected a JSON object")
+    missing = [key for key in ("url", "start_line", "end_line") if key not in record]
+    if missing:
+        raise ValueError(f"missing {', '.join(missing)}")
+    flags = 0
+    for name in record.get("flags", ["DOTALL"]):
+        flag = re.RegexFlag.__members__.get(str(name).upper())
+        if flag is None:
+            raise ValueError(f"unknown regex flag {name!r}")
+        flags |= flag
+    try:
+        start_line, end_line = int(record["start_line"]), int(record["end_line"])
+        pattern = re.compile(record["pattern"], flags) if record.get("pattern") else None
+    except re.error as e:
+        raise ValueError(f"invalid pattern {record['pattern']!r}: {e}") from None
+    except TypeError as e:
+        raise ValueError(str(e)) from None
+    return ManifestEntry(
+        url=record["url"],
+        author=record.get("author", ""),
+        origin=record.get("origin", ""),
+        start_line=start_line,
+        end_line=end_line,
+        pattern=pattern,
+    )
+
+
+class ConnectionPool:
+    """Idle keep-alive connections per (scheme, host, port), shared by the fetch threads."""
+
+    def __init__(self, timeout=30):
+        self.timeout = timeout
+        self._idle = {}
+        self._lock = threading.Lock()
+        self.connections_opened = 0
+
+    def _acquire(self, key):
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                return idle.pop()
+            self.connections_opened += 1
+        scheme, host, port = key
+        cls = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        return cls(host, port, timeout=self.timeout)
+
+    def _release(self, key, conn):
+        with self._lock:
+            self._idle.setdefault(key, []).append(conn)
+
+    def get(self, url):
+        """Blocking GET following redirects; returns (status, body bytes)."""
+        for _ in range(MAX_REDIRECTS + 1):
+            parts = urlsplit(url)
+            key = (parts.scheme, parts.hostname, parts.port)
+            path = parts.path or "/"
+            if parts.query:
+                path += "?" + parts.query
+            conn = self._acquire(key)
+            try:
+                conn.request("GET", path, headers={"Connection": "keep-alive"})
+                response = conn.getresponse()
+                body = response.read()
+            except Exception:
+                conn.close()
+                raise
+            if response.will_close:
+                conn.close()
+            else:
+                self._release(key, conn)
+            location = response.getheader("Location")
+            if response.status in (301, 302, 303, 307, 308) and location:
+                url = urljoin(url, location)
+                continue
+            return response.status, body
+        raise DownloadError(f"Too many redirects for {url}")
+
+    def close(self):
+        with self._lock:
+            for conns in self._idle.values():
+                for conn in conns:
+                    conn.close()
+            self._idle.clear()
+
+
+class HostRateLimiter:
+    """Spaces out request starts to the same host by at least `min_interval` seconds."""
+
+    def __init__(self, min_interval=0.0):
+        self.min_interval = min_interval
+        self._next_slot = {}
+
+    async def wait(self, host):
+        if self.min_interval <= 0:
+            return
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        slot = max(now, self._next_slot.get(host, now))
+        self._next_slot[host] = slot + self.min_interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+async def fetch_all(urls, max_concurrency=8, per_host_interval=0.0, retries=3, backoff=0.5, timeout=30):
+    """Fetch every distinct URL concurrently and return {url: decoded text}."""
+    pool = ConnectionPool(timeout=timeout)
+    limiter = HostRateLimiter(per_host_interval)
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def fetch(url):
+        async with semaphore:
+            for attempt in range(retries + 1):
+                await limiter.wait(urlsplit(url).hostname)
+                try:
+                    status, body = await asyncio.to_thread(pool.get, url)
+                except (OSError, http.client.HTTPException) as e:
+                    error = DownloadError(f"{url}: {e}")
+                else:
+                    if status == 200:
+                        try:
+                            return url, body.decode("utf-8")
+                        except UnicodeDecodeError as e:
+                            raise DownloadError(f"{url}: the text is not UTF-8 ({e})") from None
+                    error = DownloadError(f"{url}: HTTP {status}")
+                    if status not in RETRYABLE_STATUS:
+                        raise error
+                if attempt < retries:
+                    await asyncio.sleep(backoff * 2 ** attempt)
+            raise error
+
+    try:
+        pairs = await asyncio.gather(*(fetch(url) for url in dict.fromkeys(urls)))
+    finally:
+        pool.close()
+    return dict(pairs)
+
+
+def load_collection_from_manifest(entries, pattern_timeout=PATTERN_TIME_BUDGET, **fetch_options) -> list[Document]:
+    """
+    Fetch all manifest entries and parse them into one collection. Document IDs are assigned in
+    manifest order and are unique across the whole collection. Manifest patterns run under
+    `pattern_timeout` (None disables the budget).
+    """
+    texts = asyncio.run(fetch_all([entry.url for entry in entries], **fetch_options))
+    documents = []
+    for entry in entries:
+        documents.extend(parse_collection(texts[entry.url], entry.pattern, entry.start_line, entry.end_line,
+                                          entry.author, entry.origin, first_id=len(documents),
+                                          pattern_timeout=pattern_timeout))
+    return documents
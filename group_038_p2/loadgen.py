@@ -0,0 +1,297 @@
+"""
+Load generator: replay a query log against the search functions from many threads (and
+processes) and report throughput and latency percentiles per query class.
+
+A query log has one JSON object per line:
+    {"mode": "bm25", "query": "fox hunts", "stopword_filtered": false, "stemmed": true}
+mode is boolean, vsm, bm25 or lsi. Optional fields: "class" (the report groups by it;
+default: the mode), "k1", "b" and "delta" for bm25, "expansion" for vsm (true for the model
+built from the collection, or the path of a saved co-occurrence model, loaded once per replay)
+and "time" (when a recorded query was issued; not used for replay). Logs are recorded from the interactive
+menu (main.py, "Record queries to a log") with QueryRecorder, or generated by synthetic_log.
+
+With a target rate the load is open-loop: query i is due at i / rate seconds after the start,
+whether or not earlier queries have finished, and its latency is measured from that due
+time. A saturated system therefore shows up as growing latency instead of a silently lower
+request rate. Without a rate every thread issues its next query as soon as the previous one
+returns (closed loop). With several processes (fork only) the schedule is dealt round-robin
+to them and each runs its own threads, which takes the GIL out of the measurement.
+
+    python loadgen.py --file book.txt --log queries.jsonl --rate 200 --threads 8 --processes 4
+    python loadgen.py --file book.txt --synthetic 1000 --write-log synthetic.jsonl
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sys
+import threading
+import time
+
+from batch import latency_summary
+from index import get_index
+from test_wrapper import linear_boolean_search, vector_space_search, bm25_search, lsi_search
+
+MODES = ("boolean", "vsm", "bm25", "lsi")
+PERCENTILES = (50, 95, 99, 99.9)
+
+
+def query_class(entry):
+    return entry.get("class") or entry["mode"]
+
+
+def read_log(path):
+    """The entries of a query log file, skipping blank lines."""
+    entries = []
+    with open(os.path.expanduser(path), "r", encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if entry.get("mode") not in MODES or not isinstance(entry.get("query"), str):
+                raise ValueError(f"{path}:{number}: expected a query and a mode out of {', '.join(MODES)}")
+            entries.append(entry)
+    return entries
+
+
+def write_log(path, entries):
+    with open(os.path.expanduser(path), "w", encoding="utf-8") as f:
+        for entry in entries:
+            f.write(json.dumps(entry) + "\n")
+
+
+class QueryRecorder:
+    """Appends the queries it is given to a query log file; safe to share between threads."""
+
+    def __init__(self, path):
+        self.path = os.path.expanduser(path)
+        self.count = 0
+        self._lock = threading.Lock()
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def record(self, query, mode, stopword_filtered=False, stemmed=False, **options):
+        entry = {"time": time.time(), "mode": mode, "query": query, "stopword_filtered": stopword_filtered,
+                 "stemmed": stemmed, **options}
+        with self._lock:
+            self._file.write(json.dumps(entry) + "\n")
+            self._file.flush()
+            self.count += 1
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+def synthetic_log(collection, count, modes=("vsm", "bm25", "boolean"), terms_per_query=(1, 3),
+                  stopword_filtered=False, stemmed=False, seed=None):
+    """
+    `count` queries over the collection's vocabulary. Terms are drawn in proportion to their
+    document frequency, so common terms (with long posting lists) are queried most, as in real
+    logs; Boolean queries get a single term.
+    """
+    rng = random.Random(seed)
+    df = get_index(collection, stopword_filtered).df
+    terms = sorted(df)
+    if not terms:
+        raise ValueError("the collection has no terms to build queries from")
+    weights = [df[term] for term in terms]
+    entries = []
+    for _ in range(count):
+        mode = rng.choice(modes)
+        length = 1 if mode == "boolean" else rng.randint(*terms_per_query)
+        query = " ".join(rng.choices(terms, weights, k=length))
+        entries.append({"mode": mode, "query": query, "stopword_filtered": stopword_filtered, "stemmed": stemmed})
+    return entries
+
+
+_expansion_models = {}
+_expansion_models_lock = threading.Lock()
+
+
+def expansion_model(expansion):
+    """The vector_space_search `expansion` argument for a log entry's value; model paths are loaded once."""
+    if not isinstance(expansion, str):
+        return expansion
+    from cooccurrence import CooccurrenceModel
+    with _expansion_models_lock:
+        model = _expansion_models.get(expansion)
+        if model is None:
+            model = _expansion_models[expansion] = CooccurrenceModel.load(os.path.expanduser(expansion))
+    return model
+
+
+def run_query(entry, collection):
+    """Run one log entry with the test_wrapper search functions."""
+    mode, query = entry["mode"], entry["query"]
+    stopword_filtered, stemmed = entry.get("stopword_filtered", False), entry.get("stemmed", False)
+    if mode == "boolean":
+        return linear_boolean_search(query, collection, stopword_filtered, stemmed)
+    if mode == "vsm":
+        return vector_space_search(query, collection, stopword_filtered, stemmed,
+                                   expansion=expansion_model(entry.get("expansion")))
+    if mode == "bm25":
+        return bm25_search(query, collection, stopword_filtered, stemmed, entry.get("k1", 1.2), entry.get("b", 0.75),
+                           entry.get("delta", 0.0))
+    if mode == "lsi":
+        return lsi_search(query, collection, stopword_filtered, stemmed)
+    raise ValueError(f"unknown search mode {mode!r}, expected one of {', '.join(MODES)}")
+
+
+def warm_up(entries, collection):
+    """Build the indexes (and models) every query variant of the log needs, outside the measurement."""
+    seen = set()
+    for entry in entries:
+        key = (entry["mode"], entry.get("stopword_filtered", False), entry.get("stemmed", False),
+               entry.get("expansion") or False)
+        if key not in seen:
+            seen.add(key)
+            run_query(entry, collection)
+
+
+def _run_share(entries, collection, indices, rate, threads):
+    """
+    Run the scheduled queries `indices` (into the cycled log) from `threads` threads.
+    Returns ([(class, latency in seconds, ok)], wall-clock time of the last completion).
+    """
+    next_index = iter(indices).__next__
+    lock = threading.Lock()
+    samples = []
+    origin = time.perf_counter()
+
+    def worker():
+        while True:
+            with lock:
+                try:
+                    i = next_index()
+                except StopIteration:
+                    return
+            entry = entries[i % len(entries)]
+            if rate:
+                due = origin + i / rate
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            else:
+                due = time.perf_counter()
+            try:
+                run_query(entry, collection)
+                ok = True
+            except Exception:
+                ok = False
+            samples.append((query_class(entry), time.perf_counter() - due, ok))
+
+    pool = [threading.Thread(target=worker, daemon=True) for _ in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return samples, time.time()
+
+
+def _process_main(entries, collection, share, processes, count, rate, threads, barrier, results):
+    barrier.wait()
+    results.put(_run_share(entries, collection, range(share, count, processes), rate, threads))
+
+
+def replay(entries, collection, count=None, rate=None, threads=4, processes=1, warmup=True):
+    """
+    Replay `count` queries (default: the log once; the log is cycled for more) at `rate`
+    queries per second (None: closed loop) and return the report (see summarize).
+    """
+    if not entries:
+        raise ValueError("the query log is empty")
+    count = len(entries) if count is None else count
+    if warmup:
+        # Before forking, so worker processes inherit the built indexes
+        warm_up(entries, collection)
+    if processes <= 1:
+        started = time.time()
+        samples, finished = _run_share(entries, collection, range(count), rate, threads)
+        return summarize(samples, max(finished - started, 1e-9), rate)
+
+    if "fork" not in multiprocessing.get_all_start_methods():
+        raise ValueError("several processes need the fork start method, which this platform lacks")
+    context = multiprocessing.get_context("fork")
+    barrier = context.Barrier(processes + 1)
+    results = context.Queue()
+    workers = [context.Process(target=_process_main, daemon=True,
+                               args=(entries, collection, share, processes, count, rate, threads, barrier, results))
+               for share in range(processes)]
+    for worker in workers:
+        worker.start()
+    barrier.wait()
+    started = time.time()
+    samples, finished = [], started
+    for _ in workers:
+        share_samples, share_finished = results.get()
+        samples.extend(share_samples)
+        finished = max(finished, share_finished)
+    for worker in workers:
+        worker.join()
+    return summarize(samples, max(finished - started, 1e-9), rate)
+
+
+def summarize(samples, seconds, rate=None):
+    """
+    One row per query class plus an "all" row: queries, errors, throughput (completed queries
+    per second of the run) and the latency percentiles of the successful queries in ms.
+    """
+    by_class = {}
+    for cls, latency, ok in samples:
+        by_class.setdefault(cls, []).append((latency, ok))
+    rows = []
+    for cls, measured in [*sorted(by_class.items()), ("all", [(latency, ok) for _, latency, ok in samples])]:
+        latencies = [latency for latency, ok in measured if ok]
+        summary = latency_summary(latencies, PERCENTILES)
+        rows.append({"class": cls, "queries": len(measured), "errors": len(measured) - len(latencies),
+                     "qps": len(measured) / seconds, **{key: summary[key] for key in summary if key != "count"}})
+    return {"seconds": seconds, "target_qps": rate, "rows": rows}
+
+
+def main(argv=None):
+    from cli import add_collection_arguments, load_analyzed_collection
+    from experiments import format_table
+
+    parser = argparse.ArgumentParser(description="Replay a query log under concurrent load and report latencies.")
+    add_collection_arguments(parser)
+    log = parser.add_mutually_exclusive_group(required=True)
+    log.add_argument("--log", help="query log to replay (JSON lines)")
+    log.add_argument("--synthetic", type=int, metavar="N", help="generate N queries from the collection's vocabulary")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=["vsm", "bm25", "boolean"],
+                        help="search modes of synthetic queries")
+    parser.add_argument("--stem", action="store_true", help="stem synthetic queries")
+    parser.add_argument("--seed", type=int, help="seed of the synthetic log")
+    parser.add_argument("--write-log", help="also write the synthetic log to this file")
+    parser.add_argument("--count", type=int, help="queries to run (default: the log once; the log is cycled)")
+    parser.add_argument("--rate", type=float, help="target queries per second (default: closed loop)")
+    parser.add_argument("--threads", type=int, default=4, help="threads per process")
+    parser.add_argument("--processes", type=int, default=1, help="worker processes")
+    parser.add_argument("--format", choices=("table", "json"), default="table")
+    args = parser.parse_args(argv)
+
+    documents, filtered = load_analyzed_collection(args)
+    if args.log:
+        entries = read_log(args.log)
+        for entry in entries:
+            # Queries recorded on a filtered collection fall back to unfiltered terms here
+            entry["stopword_filtered"] = entry.get("stopword_filtered", False) and filtered
+    else:
+        entries = synthetic_log(documents, args.synthetic, args.modes, stopword_filtered=filtered,
+                                stemmed=args.stem, seed=args.seed)
+        if args.write_log:
+            write_log(args.write_log, entries)
+    report = replay(entries, documents, args.count, args.rate, args.threads, args.processes)
+    if args.format == "json":
+        print(json.dumps(report, indent=2))
+    else:
+        target = f", target {args.rate:g} queries/s" if args.rate else ", closed loop"
+        print(f"{report['rows'][-1]['queries']} queries in {report['seconds']:.2f}s with "
+              f"{args.processes} x {args.threads} threads{target}")
+        print(format_table(report["rows"]))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,263 @@
+"""
+Latent semantic indexing: ranked search in a rank-k SVD space of the tf-idf matrix.
+
+The matrix A (documents x terms) uses the vector_space_search weights, tf * vsm_idf. It is
+kept sparse, as coordinate arrays built from the postings, and its truncated SVD A ~ U S V^T
+is computed with a randomized range finder (Halko, Martinsson and Tropp): A is multiplied
+with k + OVERSAMPLING random vectors, refined by POWER_ITERATIONS rounds of A A^T, and the
+SVD is taken of the small projected matrix. Memory and time grow with the number of postings
+times k, never with documents^2 or terms^2. Term vectors V (terms x k) project
+any term-weight vector into the latent space; documents are the rows of U S. A query is
+projected the same way and scored against all documents with one matrix-vector product of
+the normalized document matrix (cosine similarity).
+
+Models are cached per collection and can be saved to / loaded from an .npz file (lsi_search
+and batch.py --lsi-model); a saved model is reused only if its fingerprint, a hash of the
+postings it was computed from, matches the collection and it was built with the requested
+rank, OVERSAMPLING and POWER_ITERATIONS. LsiModel.fold_in adds documents to a model in memory
+by projecting them with the existing V and idf, without recomputing the SVD. A folded model
+no longer describes an indexed collection, so get_lsi_model never returns or loads one; a
+collection that grew gets a new model.
+"""
+
+import hashlib
+import sys
+import threading
+from collections import Counter, OrderedDict
+
+import numpy as np
+
+from index import get_index, get_doc_terms
+from my_module import analyze_query
+
+DEFAULT_RANK = 100
+MAX_CACHED_MODELS = 4
+OVERSAMPLING = 10
+POWER_ITERATIONS = 2
+# Postings multiplied per step of a sparse product, bounding its temporary arrays
+PRODUCT_CHUNK = 1 << 22
+
+
+def _postings_arrays(index):
+    """Sorted terms and the (document position, tf, term id) of all postings, grouped by term."""
+    terms = sorted(index.postings)
+    lengths = np.fromiter((len(index.postings[term]) for term in terms), dtype=np.intp, count=len(terms))
+    total = int(lengths.sum())
+    positions = np.fromiter((pos for term in terms for pos, tf in index.postings[term]), dtype=np.intp, count=total)
+    tfs = np.fromiter((tf for term in terms for pos, tf in index.postings[term]), dtype=np.float64, count=total)
+    return terms, positions, tfs, np.repeat(np.arange(len(terms)), lengths)
+
+
+def collection_fingerprint(index, arrays=None):
+    """Hash of the documents and postings an index (and a model built from it) describes."""
+    terms, positions, tfs, term_ids = arrays or _postings_arrays(index)
+    digest = hashlib.sha1()
+    digest.update(",".join(str(doc.document_id) for doc in index.collection).encode("utf-8"))
+    digest.update(f"|{index.stopword_filtered}|{index.stemmed}|".encode("utf-8"))
+    digest.update("\0".join(terms).encode("utf-8"))
+    for array in (positions, tfs, term_ids):
+        digest.update(np.ascontiguousarray(array).tobytes())
+    return digest.hexdigest()
+
+
+def _sparse_product(keys, others, values, matrix, rows):
+    """
+    M X for the sparse M given as entries (keys[i], others[i], values[i]) sorted by key, with
+    `rows` rows; X is dense with one row per `others` value.
+    """
+    result = np.zeros((rows, matrix.shape[1]))
+    step = max(1, PRODUCT_CHUNK // max(matrix.shape[1], 1))
+    for start in range(0, len(keys), step):
+        chunk_keys = keys[start:start + step]
+        products = values[start:start + step, None] * matrix[others[start:start + step]]
+        # Sum each run of equal keys; a run split between chunks is added twice into its row
+        starts = np.flatnonzero(np.r_[True, chunk_keys[1:] != chunk_keys[:-1]])
+        result[chunk_keys[starts]] += np.add.reduceat(products, starts, axis=0)
+    return result
+
+
+def randomized_svd(doc_ids, term_ids, weights, num_docs, num_terms, rank, seed=0):
+    """
+    Rank-`rank` SVD (U, s, V) of the sparse documents x terms matrix with entries
+    (doc_ids[i], term_ids[i], weights[i]), which must be sorted by term id.
+    """
+    by_doc = np.argsort(doc_ids, kind="stable")
+    doc_order = (doc_ids[by_doc], term_ids[by_doc], weights[by_doc])
+
+    def times(x):
+        return _sparse_product(*doc_order, x, num_docs)
+
+    def transposed_times(x):
+        return _sparse_product(term_ids, doc_ids, weights, x, num_terms)
+
+    samples = min(rank + OVERSAMPLING, num_docs, num_terms)
+    rng = np.random.default_rng(seed)
+    basis, _ = np.linalg.qr(times(rng.standard_normal((num_terms, samples))))
+    for _ in range(POWER_ITERATIONS):
+        term_basis, _ = np.linalg.qr(transposed_times(basis))
+        basis, _ = np.linalg.qr(times(term_basis))
+    # B = Q^T A is samples x terms; its SVD gives A's through U = Q U_B
+    u_small, singular_values, vt = np.linalg.svd(transposed_times(basis).T, full_matrices=False)
+    return basis @ u_small[:, :rank], singular_values[:rank], vt[:rank].T
+
+
+class LsiModel:
+    def __init__(self, documents, terms, idf, term_vectors, doc_vectors, stopword_filtered=False,
+                 stemmed=False, fingerprint=None, settings=None):
+        self.documents = list(documents)
+        self.stopword_filtered = stopword_filtered
+        self.stemmed = stemmed
+        self.fingerprint = fingerprint
+        # (requested rank, oversampling, power iterations) the SVD was computed with
+        self.settings = settings
+        self.terms = list(terms)
+        self.term_ids = {term: i for i, term in enumerate(self.terms)}
+        self.idf = np.asarray(idf, dtype=np.float64)
+        self.term_vectors = np.asarray(term_vectors, dtype=np.float64)
+        self._set_doc_vectors(np.asarray(doc_vectors, dtype=np.float64))
+
+    @property
+    def rank(self):
+        return self.term_vectors.shape[1]
+
+    @property
+    def memory_bytes(self):
+        """Bytes of the model's arrays and vocabulary (not of the documents it points to)."""
+        arrays = (self.idf, self.term_vectors, self.doc_vectors, self._normalized)
+        vocabulary = sys.getsizeof(self.terms) + sys.getsizeof(self.term_ids) + sum(map(sys.getsizeof, self.terms))
+        return sum(array.nbytes for array in arrays) + vocabulary + sys.getsizeof(self.documents)
+
+    def _set_doc_vectors(self, doc_vectors):
+        self.doc_vectors = doc_vectors
+        norms = np.linalg.norm(doc_vectors, axis=1, keepdims=True)
+        self._normalized = np.divide(doc_vectors, norms, out=np.zeros_like(doc_vectors), where=norms > 0)
+
+    @classmethod
+    def build(cls, collection, rank=DEFAULT_RANK, stopword_filtered=False, stemmed=False):
+        index = get_index(collection, stopword_filtered, stemmed)
+        arrays = _postings_arrays(index)
+        terms, positions, tfs, term_ids = arrays
+        idf = np.array([index.idf(term) for term in terms])
+        settings = (rank, OVERSAMPLING, POWER_ITERATIONS)
+        if not len(positions):
+            return cls(index.collection, terms, idf, np.zeros((len(terms), 0)), np.zeros((index.num_docs, 0)),
+                       stopword_filtered, stemmed, collection_fingerprint(index, arrays), settings)
+        u, singular_values, v = randomized_svd(positions, term_ids, tfs * idf[term_ids], index.num_docs, len(terms),
+                                               rank)
+        kept = singular_values > 1e-10 * max(singular_values.max(initial=0.0), 1.0)
+        return cls(index.collection, terms, idf, v[:, kept], u[:, kept] * singular_values[kept], stopword_filtered,
+                   stemmed, collection_fingerprint(index, arrays), settings)
+
+    def project(self, terms):
+        """Latent vector of a bag of terms weighted like vector_space_search; unknown terms are ignored."""
+        vector = np.zeros(self.rank)
+        for term, tf in Counter(terms).items():
+            term_id = self.term_ids.get(term)
+            if term_id is not None:
+                vector += tf * self.idf[term_id] * self.term_vectors[term_id]
+        return vector
+
+    def scores(self, vector):
+        norm = np.linalg.norm(vector)
+        if norm == 0:
+            return np.zeros(len(self.documents))
+        return self._normalized @ (vector / norm)
+
+    def search(self, query):
+        """(score, Document) for every document in model order, like vector_space_search."""
+        scores = self.scores(self.project(analyze_query(query, self.stemmed)))
+        return list(zip(scores.tolist(), self.documents))
+
+    def related(self, doc, n=10):
+        """The `n` documents closest to `doc` in the latent space, as (score, Document)."""
+        position = next(i for i, d in enumerate(self.documents) if d is doc)
+        scores = self.scores(self.doc_vectors[position])
+        order = [i for i in np.argsort(-scores, kind="stable").tolist() if i != position][:n]
+        return [(float(scores[i]), self.documents[i]) for i in order]
+
+    def fold_in(self, documents):
+        """Add documents by projecting them with the existing term vectors (no new SVD)."""
+        documents = list(documents)
+        vectors = [self.project(get_doc_terms(doc, self.stopword_filtered, self.stemmed)) for doc in documents]
+        if vectors:
+            self._set_doc_vectors(np.vstack([self.doc_vectors, vectors]))
+            self.documents.extend(documents)
+        # The model no longer describes a single indexed collection
+        self.fingerprint = None
+
+    def save(self, path):
+        # Through a file object, so numpy does not append ".npz" to the path
+        with open(path, "wb") as f:
+            np.savez_compressed(f, terms=np.array(self.terms, dtype=str), idf=self.idf,
+                                term_vectors=self.term_vectors, doc_vectors=self.doc_vectors,
+                                document_ids=np.array([doc.document_id for doc in self.documents]),
+                                variant=np.array([self.stopword_filtered, self.stemmed]),
+                                fingerprint=np.array(self.fingerprint or ""),
+                                settings=np.array(self.settings or (), dtype=np.int64))
+
+    @classmethod
+    def load(cls, path, collection):
+        """Load a saved model; its documents are looked up in `collection` by document_id."""
+        with np.load(path, allow_pickle=False) as data:
+            by_id = {doc.document_id: doc for doc in collection}
+            try:
+                documents = [by_id[doc_id] for doc_id in data["document_ids"].tolist()]
+            except KeyError as e:
+                raise ValueError(f"document {e} of the saved model is not in the collection") from None
+            stopword_filtered, stemmed = data["variant"].tolist()
+            settings = tuple(data["settings"].tolist()) if "settings" in data else ()
+            return cls(documents, data["terms"].tolist(), data["idf"], data["term_vectors"], data["doc_vectors"],
+                       stopword_filtered, stemmed, str(data["fingerprint"]) or None, settings or None)
+
+
+_model_cache = OrderedDict()
+_model_cache_lock = threading.Lock()
+
+
+def get_lsi_model(collection, rank=DEFAULT_RANK, stopword_filtered=False, stemmed=False, path=None):
+    """
+    Return the LSI model of this collection and variant, computing the SVD only once. The model
+    is cached in memory as long as the collection's index is, and with `path` it is also loaded
+    from / saved to that file. A saved model is used only if its fingerprint matches the
+    collection and its settings match `rank` and the current SVD parameters; otherwise it is
+    rebuilt and the file overwritten.
+    """
+    index = get_index(collection, stopword_filtered, stemmed)
+    key = (id(collection), rank, stopword_filtered, stemmed)
+    with _model_cache_lock:
+        entry = _model_cache.get(key)
+        if entry is not None and entry[0] is index:
+            _model_cache.move_to_end(key)
+            return entry[1]
+        model = None
+        if path is not None:
+            try:
+                model = LsiModel.load(path, collection)
+            except (OSError, ValueError):
+                model = None
+            settings = (rank, OVERSAMPLING, POWER_ITERATIONS)
+            if model is not None and (model.settings != settings
+                                      or model.fingerprint != collection_fingerprint(index)):
+                model = None
+        if model is None:
+            model = LsiModel.build(collection, rank, stopword_filtered, stemmed)
+            if path is not None:
+                model.save(path)
+        _model_cache[key] = (index, model)
+        _model_cache.move_to_end(key)
+        while len(_model_cache) > MAX_CACHED_MODELS:
+            _model_cache.popitem(last=False)
+    return model
+
+
+def lsi_search(query, collection, stopword_filtered=False, stemmed=False, rank=DEFAULT_RANK, path=None):
+    """
+    LSI ranked search; returns (score, Document) for every document in collection order. With
+    `path` the model is loaded from / saved to that file (see get_lsi_model).
+    """
+    return get_lsi_model(collection, rank, stopword_filtered, stemmed, path).search(query)
+
+
+def clear_model_cache():
+    with _model_cache_lock:
+        _model_cache.clear()
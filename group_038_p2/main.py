@@ -1,16 +1,35 @@
 # Information Retrieval - Practical Task 2
 # Console Based user interface
 
+import os
 import re
+import sys
 from test_wrapper import (
     load_documents_from_url,
-    linear_boolean_search,
+    load_documents_from_file,
     remove_stopwords_by_list,
     remove_stopwords_by_frequency,
-    vector_space_search
+    vector_space_search,
+    bm25_search,
+    lsi_search
 )
+from anytime import Budget, CancellationToken, anytime_boolean_search, anytime_vector_space_search, cancel_on_interrupt
+from federation import CollectionRegistry, federated_search, NORMALIZATIONS
+from loadgen import QueryRecorder
+from query_cache import QueryCache
+from my_module import PatternTimeoutError, PATTERN_TIME_BUDGET, analyze_query
+from snapshot import SnapshotStore
+from snippets import make_snippet
 
-documents = []
+# Searches read an immutable snapshot; loading and stopword filtering publish a new one.
+# Its generation increases with every publish, so cached results of older generations are dropped.
+store = SnapshotStore()
+query_cache = QueryCache()
+# Every loaded collection is kept under its name; `store` is the active one the menu works on
+collections = CollectionRegistry()
+active_collection = None
+# While set, searches are appended to a query log that loadgen.py can replay
+query_recorder = None
 
 def print_menu():
     print("\n=== Information Retrieval System Practical Task 2 ===")
@@ -19,31 +38,133 @@ def print_menu():
     print("3. Remove stop words (from list)")
     print("4. Remove stop words (by frequency)")
     print("5. Search (Boolean or VSM, all options)")
-    print("6. Exit")
+    print("6. Show query cache statistics")
+    print("7. Bulk download from manifest file")
+    print("8. Memory report")
+    print("9. Federated search across collections")
+    print("10. List / switch collections")
+    print("11. Start / stop recording queries to a log")
+    print("12. Exit")
+
+def read_pattern():
+    """Prompt for the story regex until it compiles; None (blank) selects the built-in splitter."""
+    while True:
+        pattern_str = input("Regex pattern: ").strip()
+        if not pattern_str:
+            return None
+        try:
+            return re.compile(pattern_str, re.DOTALL)
+        except re.error as e:
+            print(f"Invalid regular expression: {e}. Try again, or leave blank for the built-in splitter.")
 
 def handle_download():
-    url = input("Enter the URL of the .txt file: ").strip()
+    url = input("Enter the URL or local path of the .txt file: ").strip()
     author = input("Enter author name: ").strip()
     origin = input("Enter source/origin title: ").strip()
     start_line = int(input("Start reading from line: "))
     end_line = int(input("End reading at line: "))
 
-    print("Enter the regular expression for extracting stories.")
+    print("Enter the regular expression for extracting stories, or leave blank for the built-in story splitter.")
     print("Example (title-body capture): r'Title: (.*?)\\n(.*?)(?=Title:|\\Z)'")
-    # pattern_str = input("Regex pattern: ").strip()
-    pattern_str = r'([^\n]+)\n\n(.*?)(?=\n{5}(?=[^\n]+\n\n))'
-    search_pattern = re.compile(pattern_str, re.DOTALL)
+    # pattern_str = r'([^\n]+)\n\n(.*?)(?=\n{5}(?=[^\n]+\n\n))'
+    search_pattern = read_pattern()
+
+    try:
+        timeout = PATTERN_TIME_BUDGET if search_pattern else None
+        path = os.path.expanduser(url)
+        if os.path.isfile(path):
+            # Local files are memory-mapped and only the selected lines are read
+            docs = load_documents_from_file(path, author, origin, start_line, end_line, search_pattern, timeout)
+        else:
+            docs = load_documents_from_url(url, author, origin, start_line, end_line, search_pattern, timeout)
+    except PatternTimeoutError as e:
+        print(f"Loading aborted: {e}")
+        return
+    docs = read_dedup_policy(docs)
+    name = publish_collection(docs)
+    print(f"\n Loaded {len(docs)} documents into collection '{name}'.\n")
+
+def publish_collection(docs):
+    """Load docs as a named collection (asking for the name) and make it the active one."""
+    name = input("Collection name (blank for 'default'): ").strip() or "default"
+    try:
+        collections.add(name, docs)
+    except ValueError as e:
+        print(f"{e}; using 'default'.")
+        name = "default"
+        collections.add(name, docs)
+    activate_collection(name)
+    return name
 
-    global documents
-    documents = load_documents_from_url(url, author, origin, start_line, end_line, search_pattern)
-    print(f"\n Loaded {len(documents)} documents.\n")
+def activate_collection(name):
+    global store, active_collection
+    store = collections.store(name)
+    if name != active_collection:
+        # Generations are per collection, so cached results of another collection must go
+        query_cache.clear()
+        active_collection = name
+
+def read_dedup_policy(docs):
+    from dedup import deduplicate, POLICIES
+    policy = input("Near-duplicate stories - (d)rop, (m)erge, (t)ag or blank to keep all: ").strip().lower()
+    policy = next((p for p in POLICIES if policy and p.startswith(policy)), None)
+    if policy is None:
+        return docs
+    deduplicated = deduplicate(docs, policy)
+    tagged = sum(1 for doc in deduplicated if doc.duplicate_of is not None)
+    print(f"Near-duplicates: {len(docs) - len(deduplicated)} removed, {tagged} tagged.")
+    return deduplicated
+
+def handle_manifest_download():
+    from ingest import load_manifest, load_collection_from_manifest, DownloadError
+    path = input("Enter manifest file path (JSON): ").strip()
+    try:
+        entries = load_manifest(path)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Could not read manifest: {e}")
+        return
+    try:
+        docs = load_collection_from_manifest(entries)
+    except DownloadError as e:
+        print(f"Download failed: {e}")
+        return
+    except PatternTimeoutError as e:
+        print(f"Loading aborted: {e}")
+        return
+    docs = read_dedup_policy(docs)
+    name = publish_collection(docs)
+    print(f"\n Loaded {len(docs)} documents from {len(entries)} sources into collection '{name}'.\n")
 
 def ensure_public_filtered_terms(docs):
     for doc in docs:
         if not hasattr(doc, 'filtered_terms') and hasattr(doc, '_filtered_terms'):
             doc.filtered_terms = doc._filtered_terms
 
+def read_time_budget():
+    budget = input("Time budget in ms (blank for none; Ctrl-C stops the search early): ").strip()
+    try:
+        return float(budget) / 1000 if budget else None
+    except ValueError:
+        print("Invalid time budget, searching without one.")
+        return None
+
+def run_interruptible(search, seconds=None):
+    """Run search(budget) so that Ctrl-C or the time budget stops it with partial results."""
+    token = CancellationToken()
+    with cancel_on_interrupt(token):
+        results = search(Budget(seconds, token=token))
+    if getattr(results, "partial", False):
+        reason = "cancelled" if results.reason == "cancelled" else "out of time"
+        print(f"\n⚠️  Search {reason}: partial results ({results.processed} of {results.total} evaluated).")
+    return results
+
+def record_query(query, mode, stopword_filtered, stemmed, **options):
+    if query_recorder is not None:
+        query_recorder.record(query, mode, stopword_filtered, stemmed, **options)
+
 def handle_search():
+    snapshot = store.current()
+    documents = snapshot.documents
     if not documents:
         print("No documents loaded. Please load a collection first.")
         return
@@ -51,34 +172,37 @@ def handle_search():
 
     term = input("Enter search term: ").strip()
     stop_filtered = input("Use stopword-filtered terms? (y/n): ").strip().lower() == "y"
-    results = linear_boolean_search(term, documents, stop_filtered)
+    record_query(term, "boolean", stop_filtered, False)
+    results = query_cache.lookup(term, "boolean", stop_filtered, False, snapshot.generation,
+                                 lambda: run_interruptible(lambda budget: anytime_boolean_search(
+                                     term, documents, stop_filtered, budget=budget)))
     matches = [doc for score, doc in results if score == 1]
     print(f"\n🔍 Found {len(matches)} matching documents:\n")
     for doc in matches:
         print(f"- [{doc.document_id}] {doc.title}")
+        print(f"    {make_snippet(doc, term)}")
 
 def handle_stopwords_list():
-    if not documents:
+    if not store.current().documents:
         print("Load documents first.")
         return
     path = input("Enter stopword list file path: ").strip()
     try:
         with open(path, 'r') as f:
             stopwords = set(line.strip().lower() for line in f)
-        for doc in documents:
-            remove_stopwords_by_list(doc, stopwords)
+        store.refilter(lambda doc, collection: remove_stopwords_by_list(doc, stopwords))
         print("Stopword filtering applied to all documents (list-based).")
     except FileNotFoundError:
         print("File not found.")
 
 def handle_stopwords_frequency():
-    if not documents:
+    if not store.current().documents:
         print("Load documents first.")
         return
     high = float(input("Enter high-frequency cutoff (e.g., 0.05): "))
     low = float(input("Enter low-frequency cutoff (e.g., 0.0005): "))
-    for doc in documents:
-        remove_stopwords_by_frequency(doc, documents, common_frequency=high, rare_frequency=low)
+    store.refilter(lambda doc, collection: remove_stopwords_by_frequency(
+        doc, collection, common_frequency=high, rare_frequency=low))
     print("Stopword filtering applied to all documents (frequency-based).")
 
 
@@ -90,7 +214,18 @@ def load_ground_truth(filepath):
         ids = set(int(line.strip()) for line in f if line.strip().isdigit())
     return ids
 
+def read_bm25_parameters():
+    k1 = input("BM25 k1 (blank for 1.2): ").strip()
+    b = input("BM25 b (blank for 0.75): ").strip()
+    try:
+        return (float(k1) if k1 else 1.2), (float(b) if b else 0.75)
+    except ValueError:
+        print("Invalid BM25 parameters, using k1=1.2, b=0.75.")
+        return 1.2, 0.75
+
 def handle_eval_search():
+    snapshot = store.current()
+    documents = snapshot.documents
     if not documents:
         print("No documents loaded. Please load a collection first.")
         return
@@ -98,17 +233,64 @@ def handle_eval_search():
     query = input("Enter search query (1+ terms): ").strip()
     stopword_filtered = input("Use stopword-filtered terms? (y/n): ").strip().lower() == "y"
     stemmed = input("Use stemming? (y/n): ").strip().lower() == "y"
-    search_method = input("Search method - (b)oolean or (v)sm: ").strip().lower()
-    if search_method == "v":
-        results = vector_space_search(query, documents, stopword_filtered=stopword_filtered, stemmed=stemmed)
-        matches = [doc for score, doc in results if score > 0]
-        matches = sorted(matches, key=lambda d: next(s for s, doc in results if doc == d), reverse=True)
+    search_method = input("Search method - (b)oolean, (v)sm, (o)kapi bm25, bm25(+) or (l)si: ").strip().lower()
+    time_budget = read_time_budget() if search_method not in ("o", "+", "l") else None
+    if search_method in ("v", "o", "+", "l"):
+        if search_method == "v" and input("Expand the query with related terms? (y/n): ").strip().lower() == "y":
+            from cooccurrence import CooccurrenceModel, get_cooccurrence_model
+            model_path = input("Co-occurrence model file to load (blank to build it from the collection): ").strip()
+            try:
+                if model_path:
+                    model_path = os.path.abspath(os.path.expanduser(model_path))
+                    model = CooccurrenceModel.load(model_path)
+                    model.check_variant(stopword_filtered, stemmed)
+                else:
+                    model = get_cooccurrence_model(documents, stopword_filtered, stemmed)
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Could not use the co-occurrence model: {e}")
+                return
+            for term in dict.fromkeys(analyze_query(query, stemmed)):
+                related = ", ".join(f"{n} ({w:.2f})" for n, w in model.related(term, 5))
+                print(f"  {term} -> {related or 'no related terms'}")
+            # The log names the model file, so a replay expands with the same model
+            record_query(query, "vsm", stopword_filtered, stemmed, expansion=model_path or True)
+            results = query_cache.lookup(
+                query, ("vsm", "expanded", model_path), stopword_filtered, stemmed, snapshot.generation,
+                lambda: vector_space_search(query, documents, stopword_filtered, stemmed, expansion=model))
+        elif search_method == "v":
+            record_query(query, "vsm", stopword_filtered, stemmed)
+            results = query_cache.lookup(
+                query, "vsm", stopword_filtered, stemmed, snapshot.generation,
+                lambda: run_interruptible(lambda budget: anytime_vector_space_search(
+                    query, documents, stopword_filtered, stemmed, budget), time_budget))
+        elif search_method == "l":
+            model_path = input("LSI model file to load or save (blank to keep it in memory only): ").strip() or None
+            record_query(query, "lsi", stopword_filtered, stemmed)
+            results = query_cache.lookup(
+                query, "lsi", stopword_filtered, stemmed, snapshot.generation,
+                lambda: lsi_search(query, documents, stopword_filtered=stopword_filtered, stemmed=stemmed,
+                                   path=model_path))
+        else:
+            k1, b = read_bm25_parameters()
+            delta = 1.0 if search_method == "+" else 0.0
+            record_query(query, "bm25", stopword_filtered, stemmed, k1=k1, b=b, delta=delta)
+            results = query_cache.lookup(
+                query, ("bm25", k1, b, delta), stopword_filtered, stemmed, snapshot.generation,
+                lambda: bm25_search(query, documents, stopword_filtered=stopword_filtered, stemmed=stemmed,
+                                    k1=k1, b=b, delta=delta))
+        ranked = sorted(results, key=lambda r: r[0], reverse=True)
+        matches = [doc for score, doc in ranked if score > 0]
     else:
-        results = linear_boolean_search(query, documents, stopword_filtered=stopword_filtered, stemmed=stemmed)
+        record_query(query, "boolean", stopword_filtered, stemmed)
+        results = query_cache.lookup(
+            query, "boolean", stopword_filtered, stemmed, snapshot.generation,
+            lambda: run_interruptible(lambda budget: anytime_boolean_search(
+                query, documents, stopword_filtered, stemmed, budget), time_budget))
         matches = [doc for score, doc in results if score == 1]
     print(f"\n🔍 Found {len(matches)} matching documents:\n")
     for doc in matches:
         print(f"- [{doc.document_id}] {doc.title}")
+        print(f"    {make_snippet(doc, query, stemmed)}")
     gt_path = input("Ground truth file (leave blank to skip eval): ").strip()
     if gt_path:
         try:
@@ -126,10 +308,101 @@ def handle_eval_search():
 
 
 
+def handle_cache_stats():
+    stats = query_cache.stats()
+    print(f"\nQuery cache: {stats['entries']}/{stats['max_entries']} entries, generation {stats['generation']}")
+    print(f"Hits: {stats['hits']}, misses: {stats['misses']}, hit rate: {stats['hit_rate']:.2%}")
+    print(f"Evictions: {stats['evictions']}, invalidated by reloads/re-filtering: {stats['invalidations']}")
+
+
+
+def handle_memory_report():
+    from memory_usage import memory_report, format_report, profile_stages, format_profile
+    snapshot = store.current()
+    documents = snapshot.documents
+    if not documents:
+        print("No documents loaded. Please load a collection first.")
+        return
+    print()
+    print(format_report(memory_report(documents)))
+    query = input("\nQuery to profile stemming and VSM search with tracemalloc (blank to skip): ").strip()
+    if query:
+        stopword_filtered = snapshot.stopword_filtered
+        stemmed = [doc.filtered_stemmed_terms if stopword_filtered else doc.stemmed_terms for doc in documents]
+        _, profiles = profile_stages([
+            ("stemming", lambda: [stem() for stem in stemmed]),
+            ("vector_space_search", lambda: vector_space_search(query, documents, stopword_filtered, True)),
+        ])
+        print(format_profile(profiles))
+
+
+
+def handle_federated_search():
+    names = collections.names()
+    if not names:
+        print("No collections loaded. Please load a collection first.")
+        return
+    print(f"Collections: {', '.join(names)}")
+    selected = [n.strip() for n in input("Collections to search (comma-separated, blank for all): ").split(",")
+                if n.strip()]
+    unknown = [n for n in selected if n not in collections]
+    if unknown:
+        print(f"Unknown collections: {', '.join(unknown)}")
+        return
+    query = input("Enter search query (1+ terms): ").strip()
+    stopword_filtered = input("Use stopword-filtered terms? (y/n): ").strip().lower() == "y"
+    stemmed = input("Use stemming? (y/n): ").strip().lower() == "y"
+    method = input("Search method - (b)oolean, (v)sm or (o)kapi bm25: ").strip().lower()
+    mode = {"b": "boolean", "o": "bm25"}.get(method, "vsm")
+    normalization = input(f"Score normalization ({', '.join(NORMALIZATIONS)}; blank for minmax): ").strip().lower()
+    if normalization not in NORMALIZATIONS:
+        normalization = "minmax"
+    hits = federated_search(collections, query, selected or None, mode, stopword_filtered, stemmed, top_k=20,
+                            normalization=normalization)
+    print(f"\n🔍 Top {len(hits)} results across {len(selected) or len(names)} collections:\n")
+    for hit in hits:
+        print(f"- [{hit.qualified_id}] {hit.document.title}  (score {hit.score:.4f}, raw {hit.raw_score:.4f})")
+        print(f"    {make_snippet(hit.document, query, stemmed)}")
+
+def handle_collections():
+    names = collections.names()
+    if not names:
+        print("No collections loaded.")
+        return
+    for name in names:
+        snapshot = collections.store(name).current()
+        marker = "*" if name == active_collection else " "
+        print(f"{marker} {name}: {len(snapshot)} documents{' (stopword filtered)' if snapshot.stopword_filtered else ''}")
+    name = input("Switch to collection (blank to keep the active one): ").strip()
+    if name:
+        if name in collections:
+            activate_collection(name)
+            print(f"Active collection: {name}")
+        else:
+            print(f"No collection named '{name}'.")
+
+def handle_query_recording():
+    global query_recorder
+    if query_recorder is not None:
+        query_recorder.close()
+        print(f"Stopped recording: {query_recorder.count} queries written to {query_recorder.path}")
+        query_recorder = None
+        return
+    path = input("Query log file to append to (e.g. queries.jsonl): ").strip()
+    if not path:
+        print("No file given, not recording.")
+        return
+    try:
+        query_recorder = QueryRecorder(path)
+    except OSError as e:
+        print(f"Cannot open {path}: {e}")
+        return
+    print(f"Recording searches to {query_recorder.path}; replay them with: python loadgen.py --log {path} ...")
+
 def main():
     while True:
         print_menu()
-        choice = input("Choose an option (1–6): ").strip()
+        choice = input("Choose an option (1–12): ").strip()
         if choice == "1":
             handle_download()
         elif choice == "2":
@@ -141,10 +414,28 @@ def main():
         elif choice == "5":
             handle_eval_search()
         elif choice == "6":
+            handle_cache_stats()
+        elif choice == "7":
+            handle_manifest_download()
+        elif choice == "8":
+            handle_memory_report()
+        elif choice == "9":
+            handle_federated_search()
+        elif choice == "10":
+            handle_collections()
+        elif choice == "11":
+            handle_query_recording()
+        elif choice == "12":
+            if query_recorder is not None:
+                query_recorder.close()
             print("Exiting...")
             break
         else:
             print("Invalid choice. Try again.")
 
 if __name__ == "__main__":
+    # With command-line arguments run non-interactively (see batch.py), otherwise show the menu
+    if len(sys.argv) > 1:
+        from batch import main as batch_main
+        sys.exit(batch_main(sys.argv[1:]))
     main()
@@ -0,0 +1,256 @@
+"""
+Memory accounting for a loaded collection and a tracemalloc profiling mode.
+
+memory_report() walks the documents and charges every object to the first structure that
+references it, so strings shared between terms and filtered_terms are counted once (under
+terms) and the totals add up to what the collection really holds. profile_pipeline() runs
+load -> stopword removal -> stemming -> vector_space_search under tracemalloc and records
+the allocations and the peak of each stage.
+
+    python memory_usage.py --file book.txt --stopwords englishST.txt --profile --query "fox river"
+"""
+
+import argparse
+import sys
+import time
+import tracemalloc
+from array import array
+from typing import NamedTuple
+
+from index import cached_indexes
+
+POINTER_SIZE = 8
+STRUCTURES = ("document_objects", "title", "raw_text", "terms", "filtered_terms", "stemmed_terms",
+              "filtered_stemmed_terms", "term_offsets")
+# Attributes holding the per-document structures; the underscore versions avoid loading
+# detached texts from a DocumentStore or computing stemmed terms just to measure them
+_STRUCTURE_ATTRIBUTES = {
+    "title": "_title",
+    "raw_text": "_raw_text",
+    "terms": "_terms",
+    "filtered_terms": "_filtered_terms",
+    "stemmed_terms": "_stemmed_terms",
+    "filtered_stemmed_terms": "_filtered_stemmed_terms",
+    "term_offsets": "term_offsets",
+}
+
+
+def deep_getsizeof(obj, seen):
+    """Size of `obj` and everything it references that is not in `seen` (a set of ids)."""
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, (str, bytes, int, float, bool, array)) or obj is None:
+        return size
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            size += deep_getsizeof(key, seen) + deep_getsizeof(value, seen)
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        for item in obj:
+            size += deep_getsizeof(item, seen)
+    elif hasattr(obj, "__dict__"):
+        size += deep_getsizeof(vars(obj), seen)
+    return size
+
+
+def _term_list_size(terms, seen, vocabulary):
+    # The list itself plus every string object not seen before; per-term bytes go to `vocabulary`
+    size = sys.getsizeof(terms)
+    for term in terms:
+        entry = vocabulary.setdefault(term, [0, 0])
+        entry[0] += POINTER_SIZE
+        entry[1] += 1
+        if id(term) not in seen:
+            seen.add(id(term))
+            term_size = sys.getsizeof(term)
+            entry[0] += term_size
+            size += term_size
+    return size
+
+
+def index_size(index, seen):
+    """Memory held by a CollectionIndex, not counting the documents it points to."""
+    size = sys.getsizeof(index) + sys.getsizeof(index.collection)
+    seen.update(id(doc) for doc in index.collection)
+    for name, value in vars(index).items():
+        if name != "collection":
+            size += deep_getsizeof(value, seen)
+    return size
+
+
+def memory_report(documents, top_terms=20, top_documents=5):
+    """
+    Break down the memory held by `documents`: bytes per structure, per document and per
+    vocabulary term, plus the cached indexes built for this collection object.
+    """
+    seen = set()
+    structures = dict.fromkeys(STRUCTURES, 0)
+    vocabulary = {}
+    per_document = []
+    for doc in documents:
+        doc_bytes = sys.getsizeof(doc) + sys.getsizeof(vars(doc))
+        seen.add(id(doc))
+        structures["document_objects"] += doc_bytes
+        for structure, attribute in _STRUCTURE_ATTRIBUTES.items():
+            value = getattr(doc, attribute, None)
+            if value is None or callable(value) or id(value) in seen:
+                continue
+            if isinstance(value, list):
+                seen.add(id(value))
+                size = _term_list_size(value, seen, vocabulary)
+            else:
+                size = deep_getsizeof(value, seen)
+            structures[structure] += size
+            doc_bytes += size
+        per_document.append((doc.document_id, doc_bytes))
+
+    indexes = [{"stopword_filtered": index.stopword_filtered, "stemmed": index.stemmed,
+                "terms": len(index.df), "bytes": index_size(index, seen)}
+               for index in cached_indexes(documents)]
+    total = sum(structures.values())
+    per_document.sort(key=lambda item: item[1], reverse=True)
+    return {
+        "documents": len(per_document),
+        "total_bytes": total,
+        "bytes_per_document": total / len(per_document) if per_document else 0.0,
+        "structures": structures,
+        "largest_documents": per_document[:top_documents],
+        "vocabulary_size": len(vocabulary),
+        "top_terms": sorted(((term, size, count) for term, (size, count) in vocabulary.items()),
+                            key=lambda item: item[1], reverse=True)[:top_terms],
+        "indexes": indexes,
+        "index_bytes": sum(index["bytes"] for index in indexes),
+    }
+
+
+def format_report(report):
+    lines = [f"{report['documents']} documents, {report['total_bytes'] / 1024:.1f} KiB "
+             f"({report['bytes_per_document']:.0f} bytes per document), "
+             f"{report['vocabulary_size']} distinct terms"]
+    total = report["total_bytes"] or 1
+    for structure, size in report["structures"].items():
+        lines.append(f"  {structure:<24}{size / 1024:>12.1f} KiB {size / total:>7.1%}")
+    for index in report["indexes"]:
+        lines.append(f"  index (filtered={index['stopword_filtered']}, stemmed={index['stemmed']}): "
+                     f"{index['bytes'] / 1024:.1f} KiB for {index['terms']} terms")
+    lines.append("Largest documents: " + ", ".join(f"{doc_id} ({size} B)"
+                                                   for doc_id, size in report["largest_documents"]))
+    lines.append("Terms using the most memory:")
+    for term, size, count in report["top_terms"]:
+        lines.append(f"  {term:<20}{size:>10} B  {count} occurrences")
+    return "\n".join(lines)
+
+
+class StageProfile(NamedTuple):
+    stage: str
+    seconds: float
+    allocated_bytes: int     # still allocated after the stage
+    peak_bytes: int          # peak above the memory in use when the stage started
+    top_sites: list          # [(file:line, bytes)] allocated by the stage and still alive
+
+
+def profile_stages(stages, top_sites=5):
+    """
+    Run `stages` - (name, function) pairs - in order under tracemalloc and return the value of
+    the last function plus a StageProfile per stage.
+    """
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    filters = [tracemalloc.Filter(False, tracemalloc.__file__)]
+    profiles = []
+    value = None
+    try:
+        for name, function in stages:
+            before = tracemalloc.take_snapshot().filter_traces(filters)
+            current_before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            started = time.perf_counter()
+            value = function()
+            seconds = time.perf_counter() - started
+            current, peak = tracemalloc.get_traced_memory()
+            after = tracemalloc.take_snapshot().filter_traces(filters)
+            sites = [(f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}", stat.size_diff)
+                     for stat in after.compare_to(before, "lineno")[:top_sites] if stat.size_diff > 0]
+            profiles.append(StageProfile(name, seconds, current - current_before, peak - current_before, sites))
+    finally:
+        if started_tracing:
+            tracemalloc.stop()
+    return value, profiles
+
+
+def profile_pipeline(load, filter_stopwords=None, query=None, stemmed=True):
+    """
+    Profile loading, stopword removal, stemming and a vector space search. `load()` returns the
+    documents and `filter_stopwords(documents)` filters them in place; either stage is skipped
+    when its function is None (or the query is empty).
+    """
+    from test_wrapper import vector_space_search
+
+    state = {}
+    stopword_filtered = filter_stopwords is not None
+
+    def load_stage():
+        state["documents"] = load()
+
+    def stem_stage():
+        for doc in state["documents"]:
+            if stopword_filtered:
+                doc.filtered_stemmed_terms()
+            else:
+                doc.stemmed_terms()
+
+    stages = [("load", load_stage)]
+    if stopword_filtered:
+        stages.append(("stopword removal", lambda: filter_stopwords(state["documents"])))
+    if stemmed:
+        stages.append(("stemming", stem_stage))
+    if query:
+        stages.append(("vector_space_search", lambda: vector_space_search(
+            query, state["documents"], stopword_filtered, stemmed)))
+    _, profiles = profile_stages(stages)
+    return state["documents"], profiles
+
+
+def format_profile(profiles):
+    lines = [f"{'stage':<22}{'seconds':>9}{'retained KiB':>14}{'peak KiB':>11}"]
+    for profile in profiles:
+        lines.append(f"{profile.stage:<22}{profile.seconds:>9.3f}{profile.allocated_bytes / 1024:>14.1f}"
+                     f"{profile.peak_bytes / 1024:>11.1f}")
+        for site, size in profile.top_sites:
+            lines.append(f"    {size / 1024:>9.1f} KiB  {site}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    from cli import add_collection_arguments, load_collection_from_args, apply_stopwords_from_args, \
+        load_analyzed_collection
+
+    parser = argparse.ArgumentParser(description="Report the memory used by a loaded collection.")
+    add_collection_arguments(parser)
+    parser.add_argument("--profile", action="store_true",
+                        help="trace allocations per stage (load, stopwords, stemming, search) with tracemalloc")
+    parser.add_argument("--query", help="query for the vector_space_search stage of --profile")
+    parser.add_argument("--no-stem", action="store_true", help="skip the stemming stage")
+    parser.add_argument("--top-terms", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    filter_stopwords = None
+    if args.stopwords or args.frequency_cutoffs:
+        def filter_stopwords(documents):
+            apply_stopwords_from_args(args, documents)
+
+    if args.profile:
+        documents, profiles = profile_pipeline(lambda: load_collection_from_args(args), filter_stopwords,
+                                               args.query, not args.no_stem)
+        print(format_profile(profiles))
+        print()
+    else:
+        documents, _ = load_analyzed_collection(args)
+    print(format_report(memory_report(documents, args.top_terms)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,7 +6,13 @@ from typing import Pattern
 import string
 from collections import defaultdict, Counter
 import math
+import multiprocessing
+import threading
+import atexit
+import signal
+from array import array
 from porter_stemmer import PorterStemmer
+from index import get_index, get_doc_terms, stem_term
 
 def remove_stop_words(terms: list[str], stopwords: set[str]) -> list[str]:
     """
@@ -30,103 +36,280 @@ def remove_stop_words_by_frequency(
     Filters out common and rare terms based on frequency thresholds.
     Returns a cleaned list of terms from `terms`.
     """
-    # Clean and count terms across collection
-    translator = str.maketrans('', '', string.punctuation)
-    cleaned_collection_terms = []
+    # The collection statistics are computed once and memoized with the filter
+    from stopword_filter import frequency_filter
+    return frequency_filter(collection, high_freq, low_freq).apply(terms)
+
+
+# A story ends at a run of at least this many blank lines (the old default regex used \n{5}).
+STORY_GAP_LINES = 4
+# Longer first lines are treated as prose rather than as a story title.
+MAX_TITLE_LENGTH = 100
+# Seconds a user-supplied extraction regex may run before the load is aborted.
+PATTERN_TIME_BUDGET = 10.0
+
+
+class PatternTimeoutError(Exception):
+    pass
+
+
+def _split_with_gaps(text: str, min_gap: int):
+    # Yields (chunk, number of blank lines that preceded it)
+    current = []
+    gap = 0
+    blank_run = 0
+    for line in text.split("\n"):
+        if not line.strip():
+            blank_run += 1
+            if current:
+                current.append("")
+            continue
+        if blank_run >= min_gap and current:
+            yield "\n".join(current).strip(), gap
+            current = []
+            gap = blank_run
+        blank_run = 0
+        current.append(line)
+    if current:
+        yield "\n".join(current).strip(), gap
+
+
+def split_stories(text: str, min_gap: int = STORY_GAP_LINES) -> list[str]:
+    """
+    Split the text into story chunks at runs of at least `min_gap` blank lines.
+    Single pass over the lines, so the cost is linear in the length of the text.
+    """
+    return [chunk for chunk, gap in _split_with_gaps(text, min_gap)]
 
-    for doc in collection:
-        cleaned = [term.lower().translate(translator) for term in doc.terms]
-        cleaned_collection_terms.extend(cleaned)
 
-    total_terms = len(cleaned_collection_terms)
-    term_freqs = Counter(cleaned_collection_terms)
+def extract_title_and_body(story: str, max_title_length: int = MAX_TITLE_LENGTH):
+    """
+    Return (title, body) if the chunk starts with a title line: a short line followed by a blank line.
+    Returns None for chunks that do not look like the start of a story.
+    """
+    title, sep, body = story.partition("\n")
+    title = title.strip()
+    if not title or len(title) > max_title_length or (body.strip() and not body.startswith("\n")):
+        return None
+    body = body.strip()
+    if not body:
+        return None
+    return title, body
 
-    # Build stopword set from high and low frequency thresholds
-    stopwords = set()
-    for term, count in term_freqs.items():
-        freq = count / total_terms
-        if freq >= high_freq or freq <= low_freq:
-            stopwords.add(term)
 
-    # Now clean the input terms from the current doc
-    return [
-        term.lower().translate(translator)
-        for term in terms
-        if term.lower().translate(translator) not in stopwords
-    ]
+def extract_stories(text: str) -> list[tuple[str, str]]:
+    """
+    Linear-time replacement for the (title, body) extraction regex. Chunks without a title line
+    are continuations of the previous story (e.g. a long pause inside a story) and are appended to it.
+    """
+    pairs = []
+    for chunk, gap in _split_with_gaps(text, STORY_GAP_LINES):
+        pair = extract_title_and_body(chunk)
+        if pair is not None:
+            pairs.append(pair)
+        elif pairs:
+            title, body = pairs[-1]
+            pairs[-1] = (title, body + "\n" * (gap + 1) + chunk)
+    return pairs
 
 
-# Previous Version
-# There might have some problem with the test cases
-def load_collection_from_url(
-    url: str,
+class _PatternExpired(Exception):
+    pass
+
+
+def _can_interrupt_in_process():
+    # SIGALRM handlers can only be set from the main thread, and an interval timer someone else
+    # started must not be cancelled
+    return (hasattr(signal, "setitimer") and threading.current_thread() is threading.main_thread()
+            and signal.getitimer(signal.ITIMER_REAL) == (0.0, 0.0))
+
+
+def _findall_in_process(search_pattern, text, timeout):
+    """re.findall interrupted by SIGALRM after `timeout` seconds (the regex engine checks for signals)."""
+    def expire(signum, frame):
+        raise _PatternExpired
+
+    previous = signal.signal(signal.SIGALRM, expire)
+    try:
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+        try:
+            return re.findall(search_pattern, text)
+        finally:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+    finally:
+        signal.signal(signal.SIGALRM, previous)
+
+
+def _pattern_timeout(search_pattern, timeout):
+    return PatternTimeoutError(
+        f"Pattern {search_pattern.pattern!r} did not finish within {timeout:g}s; "
+        "it probably backtracks catastrophically. Simplify it or use the built-in story splitter.")
+
+
+# One worker process runs the patterns of all loads; it is replaced only after a timeout
+_pattern_pool = None
+_pattern_pool_lock = threading.Lock()
+
+
+def _shutdown_pattern_pool():
+    global _pattern_pool
+    if _pattern_pool is not None:
+        _pattern_pool.terminate()
+        _pattern_pool = None
+
+
+atexit.register(_shutdown_pattern_pool)
+
+
+def findall_with_timeout(search_pattern: Pattern[str], text: str, timeout: float = PATTERN_TIME_BUDGET):
+    """
+    re.findall under a time budget of `timeout` seconds. Raises PatternTimeoutError when the
+    budget runs out.
+
+    In the main thread on platforms with SIGALRM the pattern runs in-process and an interval
+    timer interrupts it. Elsewhere it runs in a worker process that is killed on timeout; the
+    worker is started on first use and reused by later calls. That fallback pickles the whole
+    text to the worker and every match back, i.e. copies the text once per call.
+    """
+    global _pattern_pool
+    if _can_interrupt_in_process():
+        try:
+            return _findall_in_process(search_pattern, text, timeout)
+        except _PatternExpired:
+            raise _pattern_timeout(search_pattern, timeout) from None
+    with _pattern_pool_lock:
+        if _pattern_pool is None:
+            _pattern_pool = multiprocessing.Pool(1)
+        async_result = _pattern_pool.apply_async(re.findall, (search_pattern, text))
+        try:
+            return async_result.get(timeout)
+        except multiprocessing.TimeoutError:
+            _shutdown_pattern_pool()
+            raise _pattern_timeout(search_pattern, timeout) from None
+
+
+TOKEN_PATTERN = re.compile(r'\b\w+\b')
+
+
+def tokenize_with_offsets(text: str):
+    """
+    Lowercase word tokens of `text` plus a compact array of their start offsets in `text`
+    (used for snippets). Offsets are None in the rare case lowercasing changes the text length.
+    """
+    lowered = text.lower()
+    if len(lowered) != len(text):
+        return TOKEN_PATTERN.findall(lowered), None
+    terms = []
+    offsets = array('I')
+    for match in TOKEN_PATTERN.finditer(lowered):
+        terms.append(match.group())
+        offsets.append(match.start())
+    return terms, offsets
+
+
+def download_text(url: str) -> str:
+    """Download the text at `url` and decode it as UTF-8."""
+    with urllib.request.urlopen(url) as response:
+        return response.read().decode('utf-8')
+
+
+def parse_collection(
+    text: str,
     search_pattern: Pattern[str],
     start_line: int,
     end_line: int,
     author: str,
-    origin: str
+    origin: str,
+    first_id: int = 0,
+    pattern_timeout: float = None
 ) -> list[Document]:
     """
-    Download a text from the given URL, extract, and return them as Document objects.
+    Extract (title, body) pairs from lines start_line..end_line of `text` and return them as
+    Document objects numbered from `first_id`.
     """
-    # Download text from the URL
-    with urllib.request.urlopen(url) as response:
-        raw_text = response.read().decode('utf-8')
-
     # Extract lines within the specified range
-    lines = raw_text.splitlines()
+    lines = text.splitlines()
     selected_text = "\n".join(lines[int(start_line):int(end_line)])
+    return extract_documents(selected_text, search_pattern, author, origin, first_id, pattern_timeout)
+
 
+def extract_documents(
+    selected_text: str,
+    search_pattern: Pattern[str],
+    author: str,
+    origin: str,
+    first_id: int = 0,
+    pattern_timeout: float = None
+) -> list[Document]:
+    """
+    Turn every (title, body) pair found in `selected_text` into a Document. Without a
+    search_pattern the built-in story splitter is used; with a pattern_timeout the regex
+    runs under that time budget.
+    """
     # Use the regex pattern to extract (title, body) pairs
-    matches = re.findall(search_pattern, selected_text)
+    if search_pattern is None:
+        matches = extract_stories(selected_text)
+    elif pattern_timeout is not None:
+        matches = findall_with_timeout(search_pattern, selected_text, pattern_timeout)
+    else:
+        matches = re.findall(search_pattern, selected_text)
 
     documents = []
     for i, (title, body) in enumerate(matches):
         # Normalize whitespace and tokenize
         raw_text = body.replace("\n", " ").strip()
-        terms = re.findall(r'\b\w+\b', raw_text.lower())
+        terms, offsets = tokenize_with_offsets(raw_text)
 
         # Construct Document object
         doc = Document(
-            document_id=i,
+            document_id=first_id + i,
             title=title.strip(),
             raw_text=raw_text,
             terms=terms,
             author=author,
             origin=origin
         )
+        doc.term_offsets = offsets
         documents.append(doc)
 
     return documents
 
 
+# Previous Version
+# There might have some problem with the test cases
+def load_collection_from_url(
+    url: str,
+    search_pattern: Pattern[str],
+    start_line: int,
+    end_line: int,
+    author: str,
+    origin: str,
+    pattern_timeout: float = None
+) -> list[Document]:
+    """
+    Download a text from the given URL, extract, and return them as Document objects.
+    """
+    return parse_collection(download_text(url), search_pattern, start_line, end_line, author, origin,
+                            pattern_timeout=pattern_timeout)
+
+
 ## PR03 Implementation
 
 def linear_boolean_search(term, collection, stopword_filtered=False, stemmed=False):
-    stemmer = PorterStemmer()
     if stemmed:
-        query_term = stemmer.stem(term)
+        query_term = stem_term(term)
     else:
         query_term = term.lower()
 
     results = []
     for doc in collection:
-        if stemmed and stopword_filtered:
-            if hasattr(doc, "filtered_stemmed_terms") and isinstance(doc.filtered_stemmed_terms, list):
-                terms_to_search = doc.filtered_stemmed_terms
-            else:
-                terms_to_search = doc.filtered_stemmed_terms()
-        elif stemmed:
-            if hasattr(doc, "stemmed_terms") and isinstance(doc.stemmed_terms, list):
-                terms_to_search = doc.stemmed_terms
-            else:
-                terms_to_search = doc.stemmed_terms()
+        if stemmed:
+            # Stem the document's distinct terms through the shared memo instead of building
+            # its stemmed term list
+            terms_to_search = {stem_term(t) for t in set(get_doc_terms(doc, stopword_filtered))}
         elif stopword_filtered:
             # Fix: handle both list and method for filtered_terms (test sets .filtered_terms as list)
-            if hasattr(doc, "filtered_terms") and isinstance(doc.filtered_terms, list):
-                terms_to_search = doc.filtered_terms
-            else:
-                terms_to_search = doc.filtered_terms()
+            terms_to_search = get_doc_terms(doc, stopword_filtered, stemmed)
         else:
             terms_to_search = [t.lower() for t in doc.terms]
 
@@ -139,64 +322,84 @@ def linear_boolean_search(term, collection, stopword_filtered=False, stemmed=Fal
     return results
 
 
-def vector_space_search(query: str, collection: list, stopword_filtered: bool = False, stemmed: bool = False):
+def analyze_query(query: str, stemmed: bool = False) -> list[str]:
+    """Lowercase and split a free-text query, stemming the terms if requested."""
+    query_terms = query.lower().split()
+    if stemmed:
+        stemmer = PorterStemmer()
+        query_terms = [stemmer.stem(t) for t in query_terms]
+    return query_terms
+
+
+def vector_space_search(query: str, collection: list, stopword_filtered: bool = False, stemmed: bool = False,
+                        index=None, expansion=None):
     """
     Vector Space Model search with tf-idf weights and inverted index.
-    Returns ranked list of (score, Document).
+    Returns ranked list of (score, Document). `index` searches a given CollectionIndex (e.g. a
+    pruned one) instead of the collection's cached index. `expansion` (a CooccurrenceModel of
+    the same analyzer variant, or True for the collection's cached one) adds weighted related
+    terms to the query.
     """
-    stemmer = PorterStemmer()
-
-    # Select document terms according to options
-    def get_terms(doc):
-        if stemmed and stopword_filtered:
-            return doc.filtered_stemmed_terms()
-        elif stemmed:
-            return doc.stemmed_terms()
-        elif stopword_filtered:
-            return doc.filtered_terms()
-        else:
-            return doc.terms
-
     # Process query
-    query_terms = query.lower().split()
-    if stemmed:
-        query_terms = [stemmer.stem(t) for t in query_terms]
+    query_terms = analyze_query(query, stemmed)
     # You may want to filter stopwords for query as well, if required
 
-    # Build inverted index and document term counts
-    N = len(collection)
-    doc_term_counts = []
-    df = Counter()
-    for doc in collection:
-        terms = get_terms(doc)
-        counts = Counter(terms)
-        doc_term_counts.append(counts)
-        for term in set(terms):
-            df[term] += 1
-
-    # Compute tf-idf vectors for docs and query
+    # Document term counts and df are precomputed once per collection and variant
+    if index is None:
+        index = get_index(collection, stopword_filtered, stemmed)
+    query_counts = Counter(query_terms)
+    if expansion is not None and expansion is not False:
+        from cooccurrence import get_cooccurrence_model
+        if expansion is True:
+            expansion = get_cooccurrence_model(collection, stopword_filtered, stemmed)
+        else:
+            expansion.check_variant(stopword_filtered, stemmed)
+        query_counts = expansion.expand(query_counts)
+    idfs = {term: index.idf(term) for term in query_counts}
+    query_vec = [query_counts[term] * idfs[term] for term in query_counts]
+    query_norm = math.sqrt(sum(q*q for q in query_vec))
+
+    # Compute tf-idf vectors for docs and query; term frequencies come from the postings
+    query_tfs = [(term, dict(index.postings.get(term, ()))) for term in query_counts]
     scores = []
-    for doc, doc_counts in zip(collection, doc_term_counts):
-        doc_vec = []
-        query_vec = []
-        all_terms = set(query_terms)
-        for term in all_terms:
-            tf = doc_counts[term]
-            idf = math.log((N + 1) / (df[term] + 1)) + 1  # +1 smoothing
-            doc_tf_idf = tf * idf
-            doc_vec.append(doc_tf_idf)
-
-            qtf = query_terms.count(term)
-            query_tf_idf = qtf * idf
-            query_vec.append(query_tf_idf)
+    for pos, doc in enumerate(index.collection):
+        doc_vec = [tfs.get(pos, 0) * idfs[term] for term, tfs in query_tfs]
         # Cosine similarity
         num = sum(d*q for d, q in zip(doc_vec, query_vec))
-        denom = math.sqrt(sum(d*d for d in doc_vec)) * math.sqrt(sum(q*q for q in query_vec))
+        denom = math.sqrt(sum(d*d for d in doc_vec)) * query_norm
         score = num / denom if denom > 0 else 0.0
         scores.append((score, doc))
     return scores
 
 
+def bm25_search(query: str, collection: list, stopword_filtered: bool = False, stemmed: bool = False,
+                k1: float = 1.2, b: float = 0.75, delta: float = 0.0, index=None):
+    """
+    Okapi BM25 search; a positive `delta` gives BM25+ (lower-bounded tf normalization).
+    Returns (score, Document) for every document in collection order, like vector_space_search.
+    """
+    query_terms = analyze_query(query, stemmed)
+    if index is None:
+        index = get_index(collection, stopword_filtered, stemmed)
+    norms = index.length_norms(k1, b)
+    accumulators = [0.0] * index.num_docs
+    for term, qtf in Counter(query_terms).items():
+        idf = index.bm25_idf(term)
+        for pos, tf in index.postings.get(term, ()):
+            accumulators[pos] += qtf * idf * (tf * (k1 + 1) / (tf + norms[pos]) + delta)
+    return list(zip(accumulators, index.collection))
+
+
+def expand_query(query: str, collection: list, stopword_filtered: bool = False) -> dict:
+    """
+    Map every query term to the surface forms in the collection that share its stem,
+    e.g. "running" -> ["run", "running", "runs"]. Uses the stem classes of the stemmed index.
+    """
+    index = get_index(collection, stopword_filtered, stemmed=True)
+    return {term: index.surface_forms(stem)
+            for term, stem in zip(analyze_query(query), analyze_query(query, stemmed=True))}
+
+
 def precision_recall(retrieved: set, relevant: set) -> tuple:
     """
     Computes precision and recall given sets of retrieved and relevant document ids.
@@ -219,3 +422,23 @@ def precision_recall(retrieved: set, relevant: set) -> tuple:
         recall = len(retrieved & relevant) / len(relevant)
 
     return (precision, recall)
+
+
+def precision_at_k(ranking: list, relevant: set, k: int) -> float:
+    """Fraction of the first k ranked document ids that are relevant (missing ranks count as misses)."""
+    if k <= 0:
+        return 0.0
+    return sum(1 for doc_id in ranking[:k] if doc_id in relevant) / k
+
+
+def average_precision(ranking: list, relevant: set) -> float:
+    """Mean of the precision values at the rank of every relevant document; unretrieved ones count as 0."""
+    if not relevant:
+        return 0.0
+    hits = 0
+    total = 0.0
+    for rank, doc_id in enumerate(ranking, 1):
+        if doc_id in relevant:
+            hits += 1
+            total += hits / rank
+    return total / len(relevant)
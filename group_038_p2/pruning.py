@@ -0,0 +1,234 @@
+"""
+Static index pruning: drop low-impact postings ahead of time to get a smaller, faster index.
+
+The impact of a posting is its term's score contribution in the document: tf * idf for the
+vector space model, or the BM25 term score. Two pruning methods are offered:
+    term        term-centric (Carmel et al.): for every term, keep the postings whose impact is
+                at least `level` (epsilon, 0..1) times the term's k-th largest impact. Terms
+                with at most k postings keep them all, so every term still finds its best k
+                documents.
+    document    document-centric (Buettcher and Clarke): every document keeps the `level`
+                (0..1) share of its distinct terms with the highest impacts (at least one).
+Pruned indexes keep the original df and document lengths, so idf weights and BM25 length
+normalization do not change; only postings are removed.
+
+evaluate_pruning reports, for each operating point, the postings kept, the written index size,
+the mean query latency and the precision/recall change against the unpruned index on a query
+set with relevance judgments. The operator then picks a point and writes that index:
+
+    python pruning.py --file book.txt --queries queries.tsv --qrels qrels.txt \
+        --method term --levels 0.1 0.3 0.5 --write pruned.npz --operating-point 0.3
+
+Written indexes are loaded with load_index and searched with search_index (batch.py --index).
+"""
+
+import argparse
+import heapq
+import io
+import math
+import sys
+import time
+from collections import Counter
+
+import numpy as np
+
+from index import CollectionIndex, get_index
+from my_module import vector_space_search, bm25_search, precision_recall
+
+METHODS = ("term", "document")
+SCHEMES = ("vsm", "bm25")
+DEFAULT_K = 10
+
+
+def _impact_function(index, scheme, k1=1.2, b=0.75):
+    if scheme == "vsm":
+        return lambda term, pos, tf: tf * index.idf(term)
+    if scheme != "bm25":
+        raise ValueError(f"unknown weighting scheme {scheme!r}, expected one of {', '.join(SCHEMES)}")
+    norms = index.length_norms(k1, b)
+    return lambda term, pos, tf: index.bm25_idf(term) * tf * (k1 + 1) / (tf + norms[pos])
+
+
+def _pruned(index, postings):
+    return CollectionIndex.from_postings(index.collection, postings, index.doc_lengths, index.df,
+                                         index.stopword_filtered, index.stemmed)
+
+
+def term_centric_prune(index, epsilon, k=DEFAULT_K, scheme="bm25"):
+    """Keep each term's postings with impact >= epsilon * the term's k-th largest impact."""
+    impact = _impact_function(index, scheme)
+    postings = {}
+    for term, plist in index.postings.items():
+        if len(plist) <= k:
+            postings[term] = plist
+            continue
+        impacts = [impact(term, pos, tf) for pos, tf in plist]
+        threshold = epsilon * heapq.nlargest(k, impacts)[-1]
+        postings[term] = [posting for posting, value in zip(plist, impacts) if value >= threshold]
+    return _pruned(index, postings)
+
+
+def document_centric_prune(index, keep_fraction, scheme="bm25"):
+    """Keep the `keep_fraction` highest-impact terms of every document (at least one per document)."""
+    impact = _impact_function(index, scheme)
+    per_document = [[] for _ in range(index.num_docs)]
+    for term, plist in index.postings.items():
+        for pos, tf in plist:
+            per_document[pos].append((impact(term, pos, tf), term, tf))
+    postings = {}
+    for pos, entries in enumerate(per_document):
+        if not entries:
+            continue
+        keep = max(1, math.ceil(keep_fraction * len(entries)))
+        for value, term, tf in heapq.nlargest(keep, entries):
+            postings.setdefault(term, []).append((pos, tf))
+    return _pruned(index, postings)
+
+
+def prune(index, method, level, k=DEFAULT_K, scheme="bm25"):
+    """Prune with one method at one operating point (see the module docstring for `level`)."""
+    if method == "term":
+        return term_centric_prune(index, level, k, scheme)
+    if method == "document":
+        return document_centric_prune(index, level, scheme)
+    raise ValueError(f"unknown pruning method {method!r}, expected one of {', '.join(METHODS)}")
+
+
+def num_postings(index):
+    return sum(len(plist) for plist in index.postings.values())
+
+
+def save_index(index, path):
+    """Write an index's postings and statistics as .npz (to a path or a binary file object)."""
+    terms = list(index.postings)
+    lengths = [len(index.postings[term]) for term in terms]
+    df_terms = list(index.df)
+    arrays = {
+        "terms": np.array(terms, dtype=str),
+        "offsets": np.concatenate(([0], np.cumsum(lengths, dtype=np.int64))),
+        "positions": np.fromiter((pos for term in terms for pos, tf in index.postings[term]), dtype=np.uint32,
+                                 count=sum(lengths)),
+        "tfs": np.fromiter((tf for term in terms for pos, tf in index.postings[term]), dtype=np.uint32,
+                           count=sum(lengths)),
+        "df_terms": np.array(df_terms, dtype=str),
+        "df": np.array([index.df[term] for term in df_terms], dtype=np.int64),
+        "doc_lengths": np.array(index.doc_lengths, dtype=np.int64),
+        "document_ids": np.array([doc.document_id for doc in index.collection], dtype=np.int64),
+        "variant": np.array([index.stopword_filtered, index.stemmed]),
+    }
+    if isinstance(path, str):
+        # Through a file object, so numpy does not append ".npz" to the path
+        with open(path, "wb") as f:
+            np.savez_compressed(f, **arrays)
+    else:
+        np.savez_compressed(path, **arrays)
+
+
+def load_index(path, collection):
+    """Load a saved index over `collection`, which must hold the same documents in the same order."""
+    with np.load(path, allow_pickle=False) as data:
+        if data["document_ids"].tolist() != [doc.document_id for doc in collection]:
+            raise ValueError("the saved index was built for a different collection")
+        terms = data["terms"].tolist()
+        offsets = data["offsets"].tolist()
+        pairs = list(zip(data["positions"].tolist(), data["tfs"].tolist()))
+        postings = {term: pairs[offsets[i]:offsets[i + 1]] for i, term in enumerate(terms)}
+        df = Counter(dict(zip(data["df_terms"].tolist(), data["df"].tolist())))
+        stopword_filtered, stemmed = data["variant"].tolist()
+        return CollectionIndex.from_postings(collection, postings, data["doc_lengths"].tolist(), df,
+                                             stopword_filtered, stemmed)
+
+
+def written_size(index):
+    """Bytes of the compressed .npz file save_index writes for `index`."""
+    buffer = io.BytesIO()
+    save_index(index, buffer)
+    return buffer.tell()
+
+
+def search_index(index, query, mode="bm25", k1=1.2, b=0.75, delta=0.0):
+    """vsm or bm25 search over a given (e.g. pruned or loaded) index; (score, Document) in collection order."""
+    if mode == "vsm":
+        return vector_space_search(query, index.collection, index.stopword_filtered, index.stemmed, index=index)
+    return bm25_search(query, index.collection, index.stopword_filtered, index.stemmed, k1, b, delta, index=index)
+
+
+def _measure(index, queries, qrels, mode, top_k):
+    latencies, precisions, recalls = [], [], []
+    for qid, query in queries:
+        started = time.perf_counter()
+        results = search_index(index, query, mode)
+        latencies.append(time.perf_counter() - started)
+        if qid not in qrels:
+            continue
+        ranked = sorted(((score, doc) for score, doc in results if score > 0), key=lambda r: r[0], reverse=True)
+        retrieved = {doc.document_id for score, doc in ranked[:top_k]}
+        precision, recall = precision_recall(retrieved, qrels[qid])
+        precisions.append(precision)
+        recalls.append(recall)
+    mean = lambda values: sum(values) / len(values) if values else 0.0
+    return {
+        "postings": num_postings(index),
+        "index_kib": written_size(index) / 1024,
+        "mean_ms": mean(latencies) * 1000,
+        "precision": mean(precisions),
+        "recall": mean(recalls),
+    }
+
+
+def evaluate_pruning(collection, queries, qrels, method, levels, stopword_filtered=False, stemmed=False, k=DEFAULT_K,
+                     scheme="bm25", mode="bm25", top_k=10):
+    """
+    One row per operating point (the first is the unpruned index): postings, written size,
+    latency, and precision/recall of the top_k results with their change from the unpruned index.
+    `queries` are (query id, query) pairs and `qrels` maps query ids to relevant document ids.
+    """
+    index = get_index(collection, stopword_filtered, stemmed)
+    baseline = _measure(index, queries, qrels, mode, top_k)
+    rows = [{"method": "none", "level": None, **baseline, "precision_delta": 0.0, "recall_delta": 0.0,
+             "postings_kept": 1.0}]
+    for level in levels:
+        measured = _measure(prune(index, method, level, k, scheme), queries, qrels, mode, top_k)
+        rows.append({"method": method, "level": level, **measured,
+                     "precision_delta": measured["precision"] - baseline["precision"],
+                     "recall_delta": measured["recall"] - baseline["recall"],
+                     "postings_kept": measured["postings"] / baseline["postings"] if baseline["postings"] else 1.0})
+    return rows
+
+
+def main(argv=None):
+    from cli import add_collection_arguments, load_analyzed_collection
+    from experiments import read_queries, read_qrels, format_table
+
+    parser = argparse.ArgumentParser(description="Prune an index and report the size/effectiveness trade-off.")
+    add_collection_arguments(parser)
+    parser.add_argument("--queries", required=True, help="query id<TAB>query per line")
+    parser.add_argument("--qrels", required=True, help="relevance judgments")
+    parser.add_argument("--method", choices=METHODS, default="term")
+    parser.add_argument("--levels", type=float, nargs="+", default=[0.1, 0.3, 0.5],
+                        help="operating points: epsilon for term, share of terms kept for document")
+    parser.add_argument("--k", type=int, default=DEFAULT_K, help="k of the term-centric threshold")
+    parser.add_argument("--scheme", choices=SCHEMES, default="bm25", help="impact used for pruning")
+    parser.add_argument("--mode", choices=SCHEMES, default="bm25", help="search mode for the evaluation")
+    parser.add_argument("--top-k", type=int, default=10, help="results per query counted as retrieved")
+    parser.add_argument("--stem", action="store_true")
+    parser.add_argument("--write", help="write the index pruned at --operating-point to this .npz file")
+    parser.add_argument("--operating-point", type=float, help="level to write (default: the only --levels value)")
+    args = parser.parse_args(argv)
+
+    if args.write and args.operating_point is None and len(args.levels) != 1:
+        parser.error("--write needs --operating-point when several --levels are evaluated")
+    documents, filtered = load_analyzed_collection(args)
+    rows = evaluate_pruning(documents, read_queries(args.queries), read_qrels(args.qrels), args.method, args.levels,
+                            filtered, args.stem, args.k, args.scheme, args.mode, args.top_k)
+    print(format_table(rows))
+    if args.write:
+        level = args.levels[0] if args.operating_point is None else args.operating_point
+        pruned = prune(get_index(documents, filtered, args.stem), args.method, level, args.k, args.scheme)
+        save_index(pruned, args.write)
+        print(f"Wrote {args.write}: {args.method} pruning at {level:g}, {num_postings(pruned)} postings")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
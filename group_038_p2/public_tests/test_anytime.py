@@ -0,0 +1,112 @@
+import os
+import signal
+import time
+import unittest
+from unittest import mock
+from document import Document
+from index import clear_index_cache
+from anytime import (
+    Budget,
+    CancellationToken,
+    SearchResults,
+    anytime_boolean_search,
+    anytime_vector_space_search,
+    cancel_on_interrupt,
+)
+from query_cache import QueryCache
+from test_wrapper import linear_boolean_search, vector_space_search
+
+
+def make_docs(n=300):
+    texts = [f"the fox {'rare ' if i % 50 == 0 else ''}jumps over the dog number{i}" for i in range(n)]
+    return tuple(Document(i, f"D{i}", text, text.split()) for i, text in enumerate(texts))
+
+
+class CountdownToken(CancellationToken):
+    """Cancels itself after a number of budget checks."""
+
+    def __init__(self, checks):
+        super().__init__()
+        self.checks = checks
+
+    @property
+    def cancelled(self):
+        self.checks -= 1
+        return self.checks < 0
+
+
+class TestAnytimeSearch(unittest.TestCase):
+    def setUp(self):
+        clear_index_cache()
+        self.docs = make_docs()
+
+    def test_complete_results_match(self):
+        results = anytime_vector_space_search("the rare fox", self.docs)
+        self.assertFalse(results.partial)
+        self.assertIsNone(results.reason)
+        expected = vector_space_search("the rare fox", self.docs)
+        for (score, doc), (expected_score, expected_doc) in zip(results, expected):
+            self.assertIs(doc, expected_doc)
+            self.assertAlmostEqual(score, expected_score)
+        boolean = anytime_boolean_search("rare", self.docs, budget=Budget(60))
+        self.assertEqual(boolean, linear_boolean_search("rare", self.docs))
+        self.assertFalse(boolean.partial)
+
+    def test_expired_deadline(self):
+        results = anytime_vector_space_search("fox", self.docs, budget=Budget(deadline=time.monotonic() - 1))
+        self.assertTrue(results.partial)
+        self.assertEqual(results.reason, "deadline")
+        self.assertEqual(len(results), len(self.docs))
+        self.assertTrue(all(score == 0 for score, doc in results))
+        self.assertEqual(anytime_boolean_search("fox", self.docs, budget=Budget(0)), [])
+
+    def test_expired_budget_does_not_build_index(self):
+        import anytime
+        clear_index_cache()
+        with mock.patch.object(anytime, "get_index") as get_index:
+            results = anytime_vector_space_search("fox", self.docs, budget=Budget(0))
+        get_index.assert_not_called()
+        self.assertTrue(results.partial)
+        self.assertEqual(results.reason, "deadline")
+        self.assertEqual([doc for score, doc in results], list(self.docs))
+        top = results.derive(results[:1])
+        self.assertTrue(top.partial)
+        self.assertEqual(top.reason, "deadline")
+
+    def test_rare_terms_scored_first(self):
+        # One check after the first term: the rare term is done, the common ones are not
+        results = anytime_vector_space_search("the fox rare", self.docs, budget=Budget(token=CountdownToken(1)))
+        self.assertTrue(results.partial)
+        self.assertEqual(results.reason, "cancelled")
+        self.assertEqual(results.processed, 6)
+        top = sorted(results, key=lambda r: r[0], reverse=True)[:6]
+        self.assertEqual({doc.document_id for score, doc in top}, {0, 50, 100, 150, 200, 250})
+
+    def test_boolean_partial_covers_scanned_documents(self):
+        results = anytime_boolean_search("fox", self.docs, budget=Budget(token=CountdownToken(2)))
+        self.assertTrue(results.partial)
+        self.assertEqual(results.processed, len(results))
+        self.assertLess(len(results), len(self.docs))
+        self.assertTrue(all(score == 1 for score, doc in results))
+
+    def test_cancel_on_interrupt(self):
+        token = CancellationToken()
+        with cancel_on_interrupt(token):
+            os.kill(os.getpid(), signal.SIGINT)
+            time.sleep(0.01)
+        self.assertTrue(token.cancelled)
+        self.assertEqual(anytime_vector_space_search("fox", self.docs, budget=Budget(token=token)).reason,
+                         "cancelled")
+
+    def test_partial_results_not_cached(self):
+        cache = QueryCache()
+        partial = SearchResults([], processed=1, total=2, reason="deadline")
+        self.assertIs(cache.lookup("fox", "vsm", False, False, 0, lambda: partial), partial)
+        complete = SearchResults([], processed=2, total=2)
+        cache.lookup("fox", "vsm", False, False, 0, lambda: complete)
+        self.assertIs(cache.lookup("fox", "vsm", False, False, 0, lambda: partial), complete)
+        self.assertEqual(cache.hits, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
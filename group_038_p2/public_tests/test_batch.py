@@ -0,0 +1,64 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+from batch import build_parser, run_batch, latency_summary, percentile
+from cooccurrence import CooccurrenceModel
+from my_module import extract_documents
+
+BOOK = "".join(f"STORY {i}\n\nThe fox number {i} ran to the river.\n\n\n\n\n" for i in range(20))
+STOPWORDS = "the\nto\n"
+
+
+class TestBatchMode(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.paths = {}
+        for name, content in [("book.txt", BOOK), ("queries.txt", "number 3\n\nthe\nfox 12\n"),
+                              ("stop.txt", STOPWORDS)]:
+            path = os.path.join(self.tmp.name, name)
+            with open(path, "w") as f:
+                f.write(content)
+            self.paths[name] = path
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def run_cli(self, *extra):
+        args = build_parser().parse_args(["--file", self.paths["book.txt"], "--queries", self.paths["queries.txt"],
+                                          *extra])
+        out, log = io.StringIO(), io.StringIO()
+        summary = run_batch(args, out, log)
+        return out.getvalue(), log.getvalue(), summary
+
+    def test_tsv_output_and_summary(self):
+        out, log, summary = self.run_cli("--mode", "vsm", "--top-k", "1")
+        rows = [line.split("\t") for line in out.splitlines()]
+        self.assertEqual([(r[0], r[3]) for r in rows], [("1", "3"), ("2", "0"), ("3", "12")])
+        self.assertEqual(summary["count"], 3)
+        self.assertIn("documents/s", log)
+        self.assertIn("queries/s", log)
+        self.assertIn("p99", log)
+
+    def test_stopwords_and_jsonl(self):
+        out, log, summary = self.run_cli("--stopwords", self.paths["stop.txt"], "--mode", "boolean", "--format", "jsonl")
+        lines = [json.loads(line) for line in out.splitlines()]
+        self.assertEqual([line["query"] for line in lines], ["number 3", "the", "fox 12"])
+        # "the" was filtered from every document
+        self.assertEqual(lines[1]["results"], [])
+
+    def test_expansion_model(self):
+        model_path = os.path.join(self.tmp.name, "model.npz")
+        CooccurrenceModel.build(extract_documents(BOOK, None, "", "")).save(model_path)
+        out, log, summary = self.run_cli("--mode", "vsm", "--expansion-model", model_path)
+        self.assertEqual(out, self.run_cli("--mode", "vsm", "--expand")[0])
+        self.assertEqual(summary["count"], 3)
+        with self.assertRaises(ValueError):
+            self.run_cli("--mode", "vsm", "--stem", "--expansion-model", model_path)
+
+    def test_percentiles(self):
+        self.assertEqual(percentile(list(range(1, 101)), 95), 95)
+        summary = latency_summary([0.001 * i for i in range(1, 101)], percentiles=(50, 99.9))
+        self.assertAlmostEqual(summary["p50"], 50)
+        self.assertAlmostEqual(summary["p999"], 100)
@@ -0,0 +1,62 @@
+import math
+import unittest
+from document import Document
+from test_wrapper import bm25_search, vector_space_search, precision_recall
+from index import get_index
+
+
+def make_docs():
+    d1 = Document(0, "Doc1", "the fox and the fox", ["the", "fox", "and", "the", "fox"], "Author", "Origin")
+    d2 = Document(1, "Doc2", "a lazy dog sleeps all day long under the tree",
+                  ["a", "lazy", "dog", "sleeps", "all", "day", "long", "under", "the", "tree"], "Author", "Origin")
+    d3 = Document(2, "Doc3", "the dog and the fox", ["the", "dog", "and", "the", "fox"], "Author", "Origin")
+    return [d1, d2, d3]
+
+
+class TestBM25(unittest.TestCase):
+    def test_scores_match_formula(self):
+        docs = make_docs()
+        result = bm25_search("dog", docs, k1=1.2, b=0.75)
+        self.assertEqual([doc for score, doc in result], docs)
+        self.assertEqual(result[0][0], 0)
+
+        avgdl = 20 / 3
+        idf = math.log((3 - 2 + 0.5) / (2 + 0.5) + 1)
+        expected_d2 = idf * (1 * 2.2) / (1 + 1.2 * (1 - 0.75 + 0.75 * 10 / avgdl))
+        expected_d3 = idf * (1 * 2.2) / (1 + 1.2 * (1 - 0.75 + 0.75 * 5 / avgdl))
+        self.assertAlmostEqual(result[1][0], expected_d2)
+        self.assertAlmostEqual(result[2][0], expected_d3)
+        # the shorter document wins
+        self.assertGreater(result[2][0], result[1][0])
+
+    def test_bm25_plus_lower_bound(self):
+        docs = make_docs()
+        plain = bm25_search("dog", docs)
+        plus = bm25_search("dog", docs, delta=1.0)
+        idf = math.log((3 - 2 + 0.5) / (2 + 0.5) + 1)
+        self.assertAlmostEqual(plus[1][0] - plain[1][0], idf)
+        self.assertEqual(plus[0][0], 0)
+
+    def test_evaluates_with_precision_recall(self):
+        docs = make_docs()
+        retrieved = {doc.document_id for score, doc in bm25_search("fox", docs) if score > 0}
+        self.assertEqual(precision_recall(retrieved, {0, 2}), (1.0, 1.0))
+
+    def test_statistics_reused_until_terms_change(self):
+        docs = make_docs()
+        for doc in docs:
+            doc.filtered_terms = [t for t in doc.terms if t != "the"]
+        index = get_index(docs, stopword_filtered=True)
+        bm25_search("fox", docs, stopword_filtered=True)
+        vector_space_search("fox", docs, stopword_filtered=True)
+        self.assertIs(get_index(docs, stopword_filtered=True), index)
+
+        docs[0].filtered_terms = ["fox"]
+        rebuilt = get_index(docs, stopword_filtered=True)
+        self.assertIsNot(rebuilt, index)
+        self.assertEqual(rebuilt.doc_lengths[0], 1)
+
+    def test_stemmed_variant(self):
+        docs = make_docs()
+        result = bm25_search("dogs", docs, stemmed=True)
+        self.assertEqual([score > 0 for score, doc in result], [False, True, True])
@@ -0,0 +1,77 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+from document import Document
+import cooccurrence
+from cooccurrence import CooccurrenceModel, get_cooccurrence_model, clear_model_cache
+from my_module import vector_space_search
+
+TEXTS = [
+    "fox hunted hen in barn",
+    "fox hunted hen at night",
+    "wolf chased sheep in field",
+    "wolf chased sheep at dawn",
+    "fox hunted goose",
+    "hen laid egg",
+]
+
+
+def make_docs():
+    return tuple(Document(i, f"D{i}", text, text.split()) for i, text in enumerate(TEXTS))
+
+
+class TestCooccurrence(unittest.TestCase):
+    def setUp(self):
+        clear_model_cache()
+        self.docs = make_docs()
+
+    def test_neighbours(self):
+        model = CooccurrenceModel.build(self.docs, window=2, top_n=3, min_count=2)
+        self.assertEqual([term for term, weight in model.related("wolf")], ["chased", "sheep"])
+        weights = [weight for term, weight in model.related("fox")]
+        self.assertEqual(weights, sorted(weights, reverse=True))
+        self.assertTrue(all(0 < weight <= 1 for weight in weights))
+        self.assertNotIn("wolf", [term for term, weight in model.related("fox")])
+        self.assertEqual(model.related("unknown"), [])
+        self.assertLessEqual(len(model.related("fox")), 3)
+        # Pairs seen once are dropped
+        self.assertEqual(model.related("egg"), [])
+
+    def test_expanded_search(self):
+        model = CooccurrenceModel.build(self.docs, window=2, min_count=2)
+        plain = vector_space_search("wolf", self.docs)
+        expanded = vector_space_search("wolf", self.docs, expansion=model)
+        self.assertEqual({doc.document_id for score, doc in plain if score > 0}, {2, 3})
+        self.assertEqual({doc.document_id for score, doc in expanded if score > 0}, {2, 3})
+        # "hen" is associated with "fox" and "hunted", which reach document 4
+        self.assertEqual({doc.document_id for score, doc in vector_space_search("hen", self.docs) if score > 0},
+                         {0, 1, 5})
+        self.assertEqual({doc.document_id for score, doc in vector_space_search("hen", self.docs, expansion=True)
+                          if score > 0}, {0, 1, 4, 5})
+        self.assertEqual(model.expand({"wolf": 1})["wolf"], 1)
+        with self.assertRaises(ValueError):
+            vector_space_search("wolf", self.docs, stemmed=True, expansion=model)
+        with self.assertRaises(ValueError):
+            vector_space_search("wolf", self.docs, stopword_filtered=True, expansion=model)
+
+    def test_chunked_pair_counts(self):
+        model = CooccurrenceModel.build(self.docs, window=2, min_count=1)
+        with mock.patch.object(cooccurrence, "PAIR_CHUNK", 3):
+            chunked = CooccurrenceModel.build(self.docs, window=2, min_count=1)
+        for term in model.terms:
+            self.assertEqual(chunked.related(term), model.related(term))
+
+    def test_save_load_and_cache(self):
+        model = get_cooccurrence_model(self.docs)
+        self.assertIs(get_cooccurrence_model(self.docs), model)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "model.npz")
+            model.save(path)
+            loaded = CooccurrenceModel.load(path)
+        self.assertEqual(loaded.related("fox"), model.related("fox"))
+        self.assertEqual((loaded.stopword_filtered, loaded.stemmed), (False, False))
+
+
+if __name__ == "__main__":
+    unittest.main()
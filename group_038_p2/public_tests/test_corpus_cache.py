@@ -0,0 +1,138 @@
+import copy
+import io
+import os
+import tempfile
+import unittest
+from unittest import mock
+from my_module import extract_documents
+from test_wrapper import remove_stopwords_by_list
+from corpus_cache import file_hash, text_hash, corpus_fingerprint, save_corpus, load_corpus, cached_analysis
+from batch import build_parser, run_batch
+from cli import load_analyzed_collection
+
+BOOK = "".join(f"STORY {i}\n\nThe foxes number {i} were running to the river.\n\n\n\n\n" for i in range(30))
+
+
+class TestCorpusCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = os.path.join(self.tmp.name, "cache")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_fingerprint(self):
+        source = text_hash(BOOK)
+        self.assertEqual(source, text_hash(BOOK.encode("utf-8")))
+        book = os.path.join(self.tmp.name, "book.txt")
+        with open(book, "w", encoding="utf-8") as f:
+            f.write(BOOK)
+        self.assertEqual(file_hash(book), source)
+        # A text that happens to name an existing file is hashed as text
+        self.assertNotEqual(text_hash(book), source)
+        base = corpus_fingerprint(source, 0, 100)
+        self.assertEqual(base, corpus_fingerprint(source, 0, 100))
+        self.assertNotEqual(base, corpus_fingerprint(source, 1, 100))
+        self.assertNotEqual(base, corpus_fingerprint(source, 0, 100, analysis="list:abc"))
+        self.assertNotEqual(base, corpus_fingerprint(text_hash(BOOK + "x"), 0, 100))
+
+    def test_round_trip(self):
+        docs = extract_documents(BOOK, None, "Aesop", "Fables")
+        for doc in docs:
+            remove_stopwords_by_list(doc, {"the", "to"})
+        save_corpus(self.cache, "key", docs, stopword_filtered=True)
+        loaded = load_corpus(self.cache, "key")
+        self.assertEqual(len(loaded), 30)
+        for original, doc in zip(docs, loaded):
+            self.assertEqual((doc.document_id, doc.title, doc.author, doc.origin),
+                             (original.document_id, original.title, "Aesop", "Fables"))
+            self.assertEqual(doc.terms, original.terms)
+            self.assertEqual(doc.filtered_terms, original.filtered_terms)
+            self.assertEqual(doc.stemmed_terms(), original.stemmed_terms())
+            self.assertEqual(doc.filtered_stemmed_terms(), original.filtered_stemmed_terms())
+            self.assertEqual(list(doc.term_offsets), list(original.term_offsets))
+            self.assertIsNone(doc._raw_text)
+            self.assertEqual(doc.raw_text, original.raw_text)
+        # One string object per vocabulary term
+        self.assertIs(loaded[0].terms[1], loaded[1].terms[1])
+        self.assertIsNone(load_corpus(self.cache, "other"))
+
+    def test_variants_load_on_use(self):
+        docs = extract_documents(BOOK, None, "", "")
+        for doc in docs:
+            remove_stopwords_by_list(doc, {"the", "to"})
+        save_corpus(self.cache, "key", docs, stopword_filtered=True)
+        loaded = load_corpus(self.cache, "key")
+        self.assertTrue(all(doc._filtered_terms is None and doc._stemmed_terms is None for doc in loaded))
+        self.assertEqual(loaded[3].stemmed_terms(), docs[3].stemmed_terms())
+        self.assertIsNone(loaded[4]._stemmed_terms)
+        # New terms replace the cached variants
+        loaded[3].terms = ["foxes"]
+        self.assertEqual(loaded[3].stemmed_terms(), ["fox"])
+        loaded[3].filtered_terms = ["rivers"]
+        self.assertEqual(loaded[3].filtered_stemmed_terms(), ["river"])
+
+    def test_copies_do_not_share_dropped_variants(self):
+        docs = extract_documents(BOOK, None, "", "")
+        for doc in docs:
+            remove_stopwords_by_list(doc, {"the", "to"})
+        save_corpus(self.cache, "key", docs, stopword_filtered=True)
+        original = load_corpus(self.cache, "key")[0]
+        doc_copy = copy.copy(original)
+        doc_copy.filtered_terms = ["fox"]
+        doc_copy.terms = ["foxes"]
+        self.assertEqual(original.filtered_terms, docs[0].filtered_terms)
+        self.assertEqual(original.stemmed_terms(), docs[0].stemmed_terms())
+        self.assertEqual(doc_copy.filtered_stemmed_terms(), ["fox"])
+
+    def test_non_integer_ids_not_cached(self):
+        docs = extract_documents(BOOK, None, "", "")
+        docs[0].document_id = "a"
+        with self.assertRaises(ValueError):
+            save_corpus(self.cache, "key", docs)
+        analyze = mock.Mock(return_value=docs)
+        for _ in range(2):
+            documents, hit = cached_analysis(self.cache, "key", analyze)
+            self.assertFalse(hit)
+            self.assertIs(documents, docs)
+        self.assertEqual(documents[0].document_id, "a")
+
+    def test_cached_analysis(self):
+        analyze = mock.Mock(side_effect=lambda: extract_documents(BOOK, None, "", ""))
+        first, hit = cached_analysis(self.cache, "key", analyze)
+        self.assertFalse(hit)
+        second, hit = cached_analysis(self.cache, "key", analyze)
+        self.assertTrue(hit)
+        self.assertEqual(analyze.call_count, 1)
+        self.assertEqual([d.terms for d in first], [d.terms for d in second])
+
+    def test_doc_store_applied_on_cache_hit(self):
+        book = os.path.join(self.tmp.name, "book.txt")
+        store_path = os.path.join(self.tmp.name, "texts.store")
+        with open(book, "w") as f:
+            f.write(BOOK)
+        args = build_parser().parse_args(["--file", book, "--queries", "-", "--corpus-cache", self.cache,
+                                          "--doc-store", store_path])
+        load_analyzed_collection(args)
+        os.remove(store_path)
+        documents, filtered = load_analyzed_collection(args)
+        self.assertTrue(os.path.exists(store_path))
+        self.assertEqual(documents[3]._store.path, store_path)
+        self.assertIn("number 3", documents[3].raw_text)
+
+    def test_batch_reuses_cache(self):
+        book = os.path.join(self.tmp.name, "book.txt")
+        queries = os.path.join(self.tmp.name, "queries.txt")
+        stop = os.path.join(self.tmp.name, "stop.txt")
+        for path, content in ((book, BOOK), (queries, "fox\nriver 3\n"), (stop, "the\n")):
+            with open(path, "w") as f:
+                f.write(content)
+        argv = ["--file", book, "--queries", queries, "--stopwords", stop, "--stem", "--corpus-cache", self.cache]
+        outputs = []
+        for _ in range(2):
+            out = io.StringIO()
+            run_batch(build_parser().parse_args(argv), out, io.StringIO())
+            outputs.append(out.getvalue())
+        self.assertEqual(len([name for name in os.listdir(self.cache) if name.endswith(".npz")]), 1)
+        self.assertEqual(outputs[0], outputs[1])
+        self.assertIn("river", outputs[0])
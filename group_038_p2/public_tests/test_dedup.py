@@ -0,0 +1,76 @@
+import random
+import unittest
+from unittest import mock
+import numpy as np
+from document import Document
+from dedup import MinHasher, choose_bands, band_threshold, deduplicate, find_duplicate_clusters
+
+WORDS = [f"word{i}" for i in range(2000)]
+
+
+def story(length=200):
+    return [random.choice(WORDS) for _ in range(length)]
+
+
+def make_docs():
+    random.seed(7)
+    base = [story() for _ in range(30)]
+    texts = list(base)
+    near = list(base[3])
+    near[100] = "changed"
+    texts.append(near)                      # 30: near-duplicate of 3
+    texts.append(list(base[3]))             # 31: exact duplicate of 3
+    texts.append(base[7][:100] + story(100))  # 32: shares only half of 7
+    origins = ["First edition"] * 30 + ["Second edition"] * 3
+    return [Document(i, f"T{i}", " ".join(t), t, "Author", origin) for i, (t, origin) in enumerate(zip(texts, origins))]
+
+
+class TestMinHash(unittest.TestCase):
+    def test_similarity_estimate(self):
+        hasher = MinHasher(256)
+        a = story(400)
+        b = a[:300] + story(100)
+        sig_a, sig_b = hasher.signature(a), hasher.signature(b)
+        shingles = lambda t: {tuple(t[i:i + 5]) for i in range(len(t) - 4)}
+        jaccard = len(shingles(a) & shingles(b)) / len(shingles(a) | shingles(b))
+        self.assertAlmostEqual((sig_a == sig_b).mean(), jaccard, delta=0.1)
+        self.assertTrue((hasher.signature(a) == sig_a).all())
+
+    def test_band_choice(self):
+        bands, rows = choose_bands(128, 0.8)
+        self.assertEqual(bands * rows, 128)
+        self.assertAlmostEqual(band_threshold(bands, rows), 0.8, delta=0.1)
+
+
+class TestDeduplicate(unittest.TestCase):
+    def test_clusters(self):
+        self.assertEqual(find_duplicate_clusters(make_docs()), [[3, 30, 31]])
+
+    def test_all_bucket_pairs_verified(self):
+        # odd shares the first band with a and b but is not a near-duplicate; a and b only meet there
+        signatures = {"odd": [1, 2, 9, 9], "a": [1, 2, 3, 4], "b": [1, 2, 3, 5]}
+        docs = [Document(i, name, name, [name]) for i, name in enumerate(signatures)]
+        with mock.patch.object(MinHasher, "signature",
+                               lambda self, terms: np.array(signatures[terms[0]], dtype=np.uint64)):
+            clusters = find_duplicate_clusters(docs, threshold=0.75, num_perm=4, bands=2)
+        self.assertEqual(clusters, [[1, 2]])
+
+    def test_drop(self):
+        docs = deduplicate(make_docs(), "drop")
+        self.assertEqual(len(docs), 31)
+        self.assertNotIn(30, [doc.document_id for doc in docs])
+        self.assertEqual(docs[3].duplicates, ())
+
+    def test_merge(self):
+        docs = deduplicate(make_docs(), "merge")
+        self.assertEqual(len(docs), 31)
+        self.assertEqual(docs[3].duplicates, (30, 31))
+        self.assertEqual(docs[3].origin, "First edition; Second edition")
+
+    def test_tag(self):
+        docs = deduplicate(make_docs(), "tag")
+        self.assertEqual(len(docs), 33)
+        self.assertEqual([doc.duplicate_of for doc in docs[30:]], [3, 3, None])
+        self.assertEqual(docs[3].duplicates, (30, 31))
+        with self.assertRaises(ValueError):
+            deduplicate(docs, "keep")
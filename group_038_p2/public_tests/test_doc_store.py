@@ -0,0 +1,55 @@
+import os
+import tempfile
+import unittest
+from my_module import extract_documents
+from doc_store import write_store, DocumentStore, detach_documents
+from snippets import make_snippet
+
+BOOK = "".join(f"STORY {i}\n\nThe fox number {i} ran to the river and back.\n\n\n\n\n" for i in range(200))
+
+
+class TestDocumentStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "docs.store")
+        self.docs = extract_documents(BOOK, None, "Aesop", "Fables")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_round_trip_with_both_codecs(self):
+        for codec in ("zlib", "lzma"):
+            write_store(self.path, self.docs, codec=codec, block_size=1024)
+            with DocumentStore(self.path) as store:
+                self.assertEqual(len(store), 200)
+                self.assertGreater(len(store._blocks), 1)
+                record = store.get(123)
+                self.assertEqual(record["title"], "STORY 123")
+                self.assertEqual(record["raw_text"], self.docs[123].raw_text)
+                self.assertEqual(record["author"], "Aesop")
+
+    def test_block_cache(self):
+        write_store(self.path, self.docs, block_size=1024)
+        with DocumentStore(self.path, cache_blocks=2) as store:
+            store.get(0)
+            store.get(1)
+            self.assertEqual((store.block_reads, store.cache_hits), (1, 1))
+            store.get(199)
+            store.get(100)
+            store.get(0)
+            self.assertEqual(store.block_reads, 4)
+
+    def test_detached_documents_load_lazily(self):
+        write_store(self.path, self.docs, block_size=1024)
+        expected = [(d.title, d.raw_text) for d in self.docs]
+        with DocumentStore(self.path) as store:
+            detach_documents(self.docs, store)
+            self.assertIsNone(self.docs[5]._raw_text)
+            self.assertEqual([(d.title, d.raw_text) for d in self.docs], expected)
+            self.assertIn("**fox**", make_snippet(self.docs[5], "fox"))
+
+    def test_rejects_other_files(self):
+        with open(self.path, "wb") as f:
+            f.write(b"not a store at all")
+        with self.assertRaises(ValueError):
+            DocumentStore(self.path)
@@ -0,0 +1,85 @@
+import os
+import tempfile
+import unittest
+from my_module import extract_documents, precision_at_k, average_precision
+from experiments import (expand_grid, read_qrels, read_queries, run_grid, format_table, Configuration,
+                         prepare_artifacts, artifact_key)
+from index import cached_indexes
+
+BOOK = "".join(f"STORY {i}\n\nThe {'fox' if i % 3 == 0 else 'wolf'} was running to the river {i}.\n\n\n\n\n"
+               for i in range(12))
+
+
+class TestRankedMetrics(unittest.TestCase):
+    def test_precision_at_k(self):
+        self.assertEqual(precision_at_k([1, 2, 3], {1, 3}, 2), 0.5)
+        self.assertEqual(precision_at_k([1], {1}, 4), 0.25)
+
+    def test_average_precision(self):
+        self.assertAlmostEqual(average_precision([1, 2, 3], {1, 3}), (1 + 2 / 3) / 2)
+        self.assertAlmostEqual(average_precision([2, 1], {1, 5}), 0.25)
+        self.assertEqual(average_precision([1], set()), 0.0)
+
+
+class TestExperimentGrid(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.stopwords = os.path.join(self.tmp.name, "stop.txt")
+        with open(self.stopwords, "w") as f:
+            f.write("the\nwas\nto\n")
+        self.queries = os.path.join(self.tmp.name, "queries.tsv")
+        with open(self.queries, "w") as f:
+            f.write("q1\tfox runs\nq2\tthe wolf\n")
+        self.qrels = os.path.join(self.tmp.name, "qrels.txt")
+        with open(self.qrels, "w") as f:
+            f.write("q1 0 0 1\nq1 0 3 1\nq1 0 6 1\nq1 0 9 1\nq1 0 1 0\nq2 1\n")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_inputs(self):
+        self.assertEqual(read_queries(self.queries), [("q1", "fox runs"), ("q2", "the wolf")])
+        self.assertEqual(read_qrels(self.qrels), {"q1": {0, 3, 6, 9}, "q2": {1}})
+        grid = expand_grid({"stopwords": [None, "list:x"], "stemmed": [False, True], "mode": ["vsm"]})
+        self.assertEqual(len(grid), 4)
+        self.assertEqual(grid[0], Configuration("none", False, "vsm"))
+        with self.assertRaises(ValueError):
+            expand_grid({"mode": ["magic"]})
+
+    def test_grid_in_parallel_matches_serial(self):
+        docs = extract_documents(BOOK, None, "Aesop", "Fables")
+        grid = expand_grid({"stopwords": ["none", f"list:{self.stopwords}", "frequency:0.9:0.0"],
+                            "stemmed": [False, True], "mode": ["boolean", "vsm", "bm25"]})
+        queries, qrels = read_queries(self.queries), read_qrels(self.qrels)
+        parallel = run_grid(docs, grid, queries, qrels, workers=3)
+        serial = run_grid(docs, grid, queries, qrels, workers=1, measure_memory=False)
+        effectiveness = lambda rows: [(r["stopwords"], r["stemmed"], r["mode"], r["precision"], r["recall"],
+                                       r["p@10"], r["map"]) for r in rows]
+        self.assertEqual(effectiveness(parallel), effectiveness(serial))
+        self.assertEqual(len(parallel), 18)
+
+        by_config = {(r["stopwords"], r["stemmed"], r["mode"]): r for r in serial}
+        # "runs" only matches "running" after stemming
+        self.assertEqual(by_config[("none", False, "boolean")]["recall"], 0.5)
+        self.assertEqual(by_config[("none", True, "boolean")]["recall"], 1.0)
+        # "the" was filtered out, so the Boolean AND of "the wolf" matches nothing
+        self.assertEqual(by_config[(f"list:{self.stopwords}", True, "boolean")]["recall"], 0.5)
+        self.assertGreater(by_config[("none", False, "vsm")]["index_kib"], 0)
+        self.assertGreater(parallel[0]["peak_query_kib"], 0)
+        self.assertIn("map", format_table(serial).splitlines()[0])
+
+    def test_artifacts_survive_cache_eviction(self):
+        from index import MAX_CACHED_INDEXES
+        docs = extract_documents(BOOK, None, "Aesop", "Fables")
+        specs = ["none"] + [f"frequency:0.{i + 5}:0.0" for i in range(MAX_CACHED_INDEXES)]
+        grid = expand_grid({"stopwords": specs, "stemmed": [False], "mode": ["bm25", "lsi"]})
+        queries, qrels = read_queries(self.queries), read_qrels(self.qrels)
+        variants, artifacts = prepare_artifacts(docs, grid)
+        self.assertEqual(len(artifacts), 2 * len(specs))
+        # More indexes than the cache holds: the first one was evicted but is still handed over
+        self.assertEqual(cached_indexes(variants["none"]), [])
+        rows = run_grid(docs, grid, queries, qrels, workers=1, measure_memory=False)
+        by_config = {(r["stopwords"], r["mode"]): r for r in rows}
+        lsi = artifacts[artifact_key(Configuration("none", False, "lsi"))]
+        self.assertAlmostEqual(by_config[("none", "lsi")]["index_kib"], lsi.memory_bytes / 1024)
+        self.assertNotAlmostEqual(by_config[("none", "lsi")]["index_kib"], by_config[("none", "bm25")]["index_kib"])
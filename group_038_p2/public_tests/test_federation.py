@@ -0,0 +1,78 @@
+import unittest
+from document import Document
+from federation import (
+    CollectionRegistry,
+    federated_search,
+    normalize_scores,
+    parse_qualified_id,
+    qualified_id,
+)
+from index import get_index
+from test_wrapper import remove_stopwords_by_list
+
+
+def make_docs(texts):
+    return [Document(i, f"D{i}", text, text.split()) for i, text in enumerate(texts)]
+
+
+class TestFederation(unittest.TestCase):
+    def setUp(self):
+        self.registry = CollectionRegistry()
+        self.registry.add("aesop", make_docs(["the fox and the grapes", "the lion and the mouse", "the fox"]))
+        self.registry.add("grimm", make_docs(["the wolf ate the fox and the fox ran", "hansel and gretel",
+                                              "the frog king", "the golden goose", "fox fox fox"]))
+
+    def test_qualified_ids(self):
+        doc = self.registry.store("aesop").current().documents[0]
+        self.assertEqual(qualified_id("aesop", doc), "aesop:0")
+        self.assertEqual(parse_qualified_id("aesop:0"), ("aesop", 0))
+        self.assertIs(self.registry.document("aesop:0"), doc)
+        self.assertIsNot(self.registry.document("grimm:0"), doc)
+        with self.assertRaises(ValueError):
+            parse_qualified_id("0")
+        with self.assertRaises(ValueError):
+            self.registry.add("a:b", [])
+
+    def test_collections_are_independent(self):
+        aesop = self.registry.store("aesop").current().documents
+        grimm = self.registry.store("grimm").current().documents
+        self.assertNotEqual(get_index(aesop).idf("fox"), get_index(grimm).idf("fox"))
+        self.registry.add("aesop", make_docs(["a new fable"]))
+        self.assertEqual(len(self.registry.store("aesop").current()), 1)
+        self.assertIs(self.registry.store("grimm").current().documents, grimm)
+        self.assertEqual(self.registry.names(), ["aesop", "grimm"])
+
+    def test_normalization(self):
+        self.assertEqual(normalize_scores([4.0, 2.0, 1.0]), [1.0, 1 / 3, 0.0])
+        self.assertEqual(normalize_scores([3.0, 3.0]), [1.0, 1.0])
+        self.assertEqual(normalize_scores([1.0, 3.0], "zscore"), [-1.0, 1.0])
+        self.assertEqual(normalize_scores([1.0, 3.0], "none"), [1.0, 3.0])
+        with self.assertRaises(ValueError):
+            normalize_scores([1.0], "rank")
+
+    def test_federated_merge(self):
+        hits = federated_search(self.registry, "fox", mode="bm25", top_k=None)
+        self.assertEqual({hit.qualified_id for hit in hits}, {"aesop:0", "aesop:2", "grimm:0", "grimm:4"})
+        self.assertEqual(len({hit.qualified_id for hit in hits}), len(hits))
+        # Each collection's best hit is normalized to 1
+        self.assertEqual(sorted(hit.collection for hit in hits if hit.score == 1.0), ["aesop", "grimm"])
+        self.assertEqual([hit.score for hit in hits], sorted((hit.score for hit in hits), reverse=True))
+
+        only_grimm = federated_search(self.registry, "fox", names=["grimm"], mode="vsm")
+        self.assertEqual({hit.collection for hit in only_grimm}, {"grimm"})
+        self.assertEqual(len(federated_search(self.registry, "fox", top_k=2)), 2)
+        with self.assertRaises(KeyError):
+            federated_search(self.registry, "fox", names=["andersen"])
+
+    def test_boolean_and_stopwords(self):
+        hits = federated_search(self.registry, "the fox", mode="boolean", top_k=None)
+        self.assertEqual({hit.qualified_id for hit in hits}, {"aesop:0", "aesop:2", "grimm:0"})
+        # Only aesop has filtered terms; grimm is searched unfiltered
+        store = self.registry.store("aesop")
+        store.refilter(lambda doc, collection: remove_stopwords_by_list(doc, {"the"}))
+        hits = federated_search(self.registry, "the", mode="boolean", stopword_filtered=True, top_k=None)
+        self.assertEqual({hit.collection for hit in hits}, {"grimm"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+import mmap
+import os
+import tempfile
+import unittest
+from my_module import parse_collection
+from file_loader import LineIndex, read_line_range, load_collection_from_file
+
+
+def make_book(line_ending="\n"):
+    parts = []
+    for i in range(300):
+        parts.append(f"STORY {i}{line_ending}{line_ending}Once there was fox number {i}.{line_ending}"
+                     f"It ran away.{line_ending}{line_ending}{line_ending}{line_ending}{line_ending}")
+    return "".join(parts)
+
+
+class TestFileLoader(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, text, name="book.txt"):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            f.write(text)
+        return path
+
+    def test_line_ranges_match_splitlines(self):
+        for ending in ("\n", "\r\n"):
+            text = make_book(ending) + "last line without newline"
+            path = self.write(text)
+            lines = text.splitlines()
+            for start, end in [(0, 10), (250, 300), (255, 1030), (1000, 5000), (-20, -3), (7, 7), (0, len(lines))]:
+                self.assertEqual(read_line_range(path, start, end), "\n".join(lines[start:end]), (ending, start, end))
+
+    def test_other_line_boundaries(self):
+        text = "l0\nl1\x0cpage\nl2\nl3\n"
+        path = self.write(text)
+        self.assertEqual(read_line_range(path, 1, 3), "\n".join(text.splitlines()[1:3]))
+        self.assertEqual(read_line_range(path, 1, 3), "l1\npage")
+        text = "".join(f"line {i}{sep}" for i, sep in zip(range(2000), ["\x0c", "\u2028", "\r", "\x85", "\n"] * 400))
+        path = self.write(text, "separators.txt")
+        lines = text.splitlines()
+        for start, end in [(0, 5), (255, 700), (1500, 2100), (-9, -2)]:
+            self.assertEqual(read_line_range(path, start, end), "\n".join(lines[start:end]), (start, end))
+
+    def test_index_built_incrementally(self):
+        text = make_book()
+        with tempfile.TemporaryFile() as f:
+            f.write(text.encode("utf-8"))
+            f.flush()
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                index = LineIndex(len(text), stride=16)
+                self.assertEqual(index.offset_of(mm, 40), len("".join(t + "\n" for t in text.split("\n")[:40])))
+                self.assertEqual(len(index.checkpoints), 3)
+                self.assertFalse(index.complete)
+                self.assertEqual(index.count_lines(mm), len(text.splitlines()))
+
+    def test_same_documents_as_url_loader(self):
+        text = make_book("\r\n")
+        path = self.write(text)
+        expected = parse_collection(text, None, 1000, 1400, "Anon", "Local")
+        docs = load_collection_from_file(path, None, 1000, 1400, "Anon", "Local")
+        self.assertEqual([(d.title, d.raw_text, d.terms) for d in docs],
+                         [(d.title, d.raw_text, d.terms) for d in expected])
+        self.assertEqual(docs[0].title, "STORY 125")
@@ -0,0 +1,79 @@
+import random
+import unittest
+import numpy as np
+from document import Document
+from index import clear_index_cache
+from impact_index import ImpactIndex, accuracy_report, get_impact_index, impact_search, top_k
+from my_module import bm25_search
+
+
+def make_docs(n=200, seed=3):
+    rng = random.Random(seed)
+    words = [f"w{i}" for i in range(60)]
+    docs = []
+    for i in range(n):
+        terms = [rng.choice(words[:rng.randint(5, 60)]) for _ in range(rng.randint(5, 80))]
+        docs.append(Document(i, f"D{i}", " ".join(terms), terms))
+    return tuple(docs)
+
+
+class TestImpactIndex(unittest.TestCase):
+    def setUp(self):
+        clear_index_cache()
+        self.docs = make_docs()
+
+    def test_unquantized_bm25_matches_bm25_search(self):
+        index = ImpactIndex(self.docs, bits=None, scheme="bm25")
+        for query in ("w1 w2", "w3 w3 w40", "unknown"):
+            for (score, doc), (expected, expected_doc) in zip(index.search(query), bm25_search(query, self.docs)):
+                self.assertIs(doc, expected_doc)
+                self.assertAlmostEqual(score, expected, places=5)
+
+    def test_layout(self):
+        index = ImpactIndex(self.docs)
+        self.assertEqual(index.impacts.dtype, np.uint8)
+        self.assertEqual(index.doc_ids.dtype, np.uint32)
+        self.assertEqual(index.memory_bytes, 5 * len(index.impacts))
+        self.assertGreaterEqual(int(index.impacts.min()), 1)
+        start, end = index.spans["w1"]
+        impacts = index.impacts[start:end]
+        self.assertTrue(np.all(impacts[:-1] >= impacts[1:]))
+
+    def test_quantized_ranking_close_to_exact(self):
+        quantized = ImpactIndex(self.docs, bits=8)
+        exact = ImpactIndex(self.docs, bits=None)
+        for query in ("w1 w2", "w10 w20 w30"):
+            self.assertEqual(top_k(quantized.search(query), 3), top_k(exact.search(query), 3))
+
+    def test_early_termination(self):
+        index = ImpactIndex(self.docs)
+        complete = index.search("w1 w2")
+        partial = index.search("w1 w2", max_postings=5)
+        self.assertFalse(complete.partial)
+        self.assertTrue(partial.partial)
+        self.assertEqual(partial.reason, "max_postings")
+        self.assertEqual(partial.processed, 5)
+        self.assertEqual(sum(score > 0 for score, doc in partial), 5)
+        # The highest-impact postings come first, so the best document is found first
+        self.assertEqual(top_k(index.search("w1", max_postings=1), 1), top_k(index.search("w1"), 1))
+
+    def test_accuracy_report(self):
+        report = accuracy_report(self.docs, ["w1 w2", "w5", "w7 w8 w9"], bits=8, k=5)
+        self.assertEqual(report["queries"], 3)
+        self.assertEqual(report["overlap_vs_unquantized"], 1.0)
+        self.assertGreater(report["overlap_vs_vsm"], 0.5)
+        self.assertLess(report["memory_bytes"], report["unquantized_memory_bytes"])
+        coarse = accuracy_report(self.docs, ["w1 w2", "w7 w8 w9"], bits=1, k=5)
+        self.assertLessEqual(coarse["overlap_vs_unquantized"], report["overlap_vs_unquantized"])
+
+    def test_cached_until_index_changes(self):
+        docs = list(self.docs)
+        first = get_impact_index(docs)
+        self.assertIs(get_impact_index(docs), first)
+        docs[0].terms = ["w1"]
+        self.assertIsNot(get_impact_index(docs), first)
+        self.assertEqual(len(impact_search("w1", docs)), len(docs))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,121 @@
+import json
+import os
+import re
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from ingest import load_collection_from_manifest, load_manifest, manifest_entry, DownloadError
+
+BOOKS = {
+    "/fables.txt": "Preface\n\nTHE FOX\n\nA fox met a crow.\n\nTHE CROW\n\nThe crow sang.\n\nEnd\n",
+    "/tales.txt": "THE FROG\n\nA frog in a well.\n\nTHE WELL\n\nDeep and dark.\n",
+}
+# Served as is, not UTF-8 encoded
+RAW_BOOKS = {"/latin1.txt": "THE CAFÉ\n\nCoffee.\n".encode("latin-1")}
+PATTERN = r"([A-Z][A-Z ]+)\n\n([^\n]+)"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_GET(self):
+        with self.server.lock:
+            self.server.requests += 1
+            failures = self.server.failures.get(self.path, 0)
+            if failures:
+                self.server.failures[self.path] = failures - 1
+        if self.path == "/moved.txt":
+            self.send_response(301)
+            self.send_header("Location", "/tales.txt")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        body = BOOKS.get(self.path)
+        payload = RAW_BOOKS.get(self.path, (body or "").encode("utf-8"))
+        status = 503 if failures else (200 if body is not None or self.path in RAW_BOOKS else 404)
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestManifestIngestion(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+        self.server.lock = threading.Lock()
+        self.server.connections = 0
+        self.server.requests = 0
+        self.server.failures = {}
+        threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True).start()
+        self.base = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def entry(self, path, origin):
+        return manifest_entry({"url": self.base + path, "author": "Anon", "origin": origin,
+                               "start_line": 0, "end_line": 100, "pattern": PATTERN, "flags": []})
+
+    def test_combined_collection_has_unique_ids(self):
+        entries = [self.entry("/fables.txt", "Fables"), self.entry("/tales.txt", "Tales")]
+        docs = load_collection_from_manifest(entries, max_concurrency=2)
+        self.assertEqual([d.title for d in docs], ["THE FOX", "THE CROW", "THE FROG", "THE WELL"])
+        self.assertEqual([d.document_id for d in docs], [0, 1, 2, 3])
+        self.assertEqual([d.origin for d in docs], ["Fables", "Fables", "Tales", "Tales"])
+
+    def test_connections_are_reused(self):
+        entries = [self.entry("/fables.txt", "A"), self.entry("/tales.txt", "B"), self.entry("/moved.txt", "C")]
+        docs = load_collection_from_manifest(entries, max_concurrency=1)
+        self.assertEqual(len(docs), 6)
+        self.assertEqual(self.server.requests, 4)
+        self.assertEqual(self.server.connections, 1)
+
+    def test_retries_transient_errors(self):
+        self.server.failures["/tales.txt"] = 2
+        docs = load_collection_from_manifest([self.entry("/tales.txt", "Tales")], backoff=0.01)
+        self.assertEqual(len(docs), 2)
+        self.assertEqual(self.server.requests, 3)
+
+    def test_missing_source_fails_without_retry(self):
+        with self.assertRaises(DownloadError):
+            load_collection_from_manifest([self.entry("/missing.txt", "X")], backoff=0.01)
+        self.assertEqual(self.server.requests, 1)
+
+    def test_non_utf8_source_is_a_download_error(self):
+        with self.assertRaisesRegex(DownloadError, "latin1.txt.*not UTF-8"):
+            load_collection_from_manifest([self.entry("/latin1.txt", "X")], backoff=0.01)
+        self.assertEqual(self.server.requests, 1)
+
+    def test_load_manifest_json_lines(self):
+        record = {"url": self.base + "/fables.txt", "author": "Anon", "origin": "Fables",
+                  "start_line": 2, "end_line": 10, "pattern": "(.+)"}
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "manifest.jsonl")
+            with open(path, "w") as f:
+                f.write(json.dumps(record) + "\n")
+            entries = load_manifest(path)
+        self.assertEqual(entries[0].start_line, 2)
+        self.assertTrue(entries[0].pattern.flags & re.DOTALL)
+
+    def test_invalid_manifest_lines(self):
+        good = {"url": self.base + "/fables.txt", "start_line": 0, "end_line": 10}
+        for bad, message in [({**good, "flags": ["DOTAL"]}, "unknown regex flag"),
+                             ({**good, "pattern": "(unclosed"}, "invalid pattern"),
+                             ({"url": good["url"]}, "missing start_line, end_line")]:
+            with tempfile.TemporaryDirectory() as tmp:
+                path = os.path.join(tmp, "manifest.jsonl")
+                with open(path, "w") as f:
+                    f.write(json.dumps(good) + "\n\n" + json.dumps(bad) + "\n")
+                with self.assertRaisesRegex(ValueError, f"line 3: {message}"):
+                    load_manifest(path)
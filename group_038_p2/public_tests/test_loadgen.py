@@ -0,0 +1,139 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from document import Document
+from index import clear_index_cache
+from test_wrapper import vector_space_search
+from loadgen import (QueryRecorder, read_log, write_log, synthetic_log, run_query, replay, summarize, main,
+                     expansion_model)
+
+TEXTS = ["the fox ran to the river", "the hen and the fox", "a river in the wood", "the wood is dark",
+         "hen hen hen", "a quiet river"]
+
+
+def make_docs():
+    return [Document(i, f"D{i}", text, text.split()) for i, text in enumerate(TEXTS)]
+
+
+class TestLoadGenerator(unittest.TestCase):
+    def setUp(self):
+        clear_index_cache()
+        self.docs = make_docs()
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_record_and_read(self):
+        path = os.path.join(self.tmp.name, "queries.jsonl")
+        recorder = QueryRecorder(path)
+        recorder.record("fox", "boolean")
+        recorder.record("river wood", "bm25", False, True, k1=1.5, b=0.5, delta=0.0)
+        recorder.close()
+        entries = read_log(path)
+        self.assertEqual(recorder.count, 2)
+        self.assertEqual([(e["mode"], e["query"]) for e in entries], [("boolean", "fox"), ("bm25", "river wood")])
+        self.assertEqual(entries[1]["k1"], 1.5)
+        self.assertTrue(entries[1]["stemmed"])
+        with open(path, "a") as f:
+            f.write('{"mode": "fuzzy", "query": "fox"}\n')
+        with self.assertRaises(ValueError):
+            read_log(path)
+
+    def test_synthetic_log(self):
+        entries = synthetic_log(self.docs, 50, modes=("boolean", "vsm"), seed=3)
+        self.assertEqual(len(entries), 50)
+        self.assertEqual(entries, synthetic_log(self.docs, 50, modes=("boolean", "vsm"), seed=3))
+        vocabulary = {term for text in TEXTS for term in text.split()}
+        for entry in entries:
+            self.assertIn(entry["mode"], ("boolean", "vsm"))
+            self.assertTrue(set(entry["query"].split()) <= vocabulary)
+            if entry["mode"] == "boolean":
+                self.assertEqual(len(entry["query"].split()), 1)
+        path = os.path.join(self.tmp.name, "synthetic.jsonl")
+        write_log(path, entries)
+        self.assertEqual(read_log(path), entries)
+
+    def test_run_query(self):
+        matches = [doc.document_id for score, doc in run_query({"mode": "boolean", "query": "hen"}, self.docs)
+                   if score == 1]
+        self.assertEqual(matches, [1, 4])
+        scores = run_query({"mode": "bm25", "query": "river", "k1": 2.0}, self.docs)
+        self.assertEqual({doc.document_id for score, doc in scores if score > 0}, {0, 2, 5})
+
+    def test_recorded_expansion_model(self):
+        from unittest import mock
+        from cooccurrence import CooccurrenceModel
+        path = os.path.join(self.tmp.name, "model.npz")
+        model = CooccurrenceModel.build(self.docs, min_count=1)
+        model.save(path)
+        entry = {"mode": "vsm", "query": "hen", "expansion": path}
+        with mock.patch("cooccurrence.get_cooccurrence_model") as build:
+            results = run_query(entry, self.docs)
+            self.assertEqual(results, vector_space_search("hen", self.docs, expansion=model))
+            run_query(entry, self.docs)
+        build.assert_not_called()
+        # Loaded once, then shared by every query of the replay
+        self.assertIs(expansion_model(path), expansion_model(path))
+        self.assertIs(expansion_model(True), True)
+
+    def test_summarize(self):
+        samples = [("vsm", 0.001 * i, True) for i in range(1, 101)] + [("bm25", 0.5, False), ("bm25", 0.002, True)]
+        report = summarize(samples, 2.0, rate=100)
+        rows = {row["class"]: row for row in report["rows"]}
+        self.assertEqual([row["class"] for row in report["rows"]], ["bm25", "vsm", "all"])
+        self.assertEqual(rows["vsm"]["queries"], 100)
+        self.assertAlmostEqual(rows["vsm"]["qps"], 50)
+        self.assertAlmostEqual(rows["vsm"]["p50"], 50)
+        self.assertAlmostEqual(rows["vsm"]["p999"], 100)
+        self.assertEqual(rows["bm25"]["errors"], 1)
+        # Failed queries are counted but do not enter the percentiles
+        self.assertAlmostEqual(rows["bm25"]["p99"], 2)
+        self.assertEqual(rows["all"]["queries"], 102)
+        self.assertEqual(report["target_qps"], 100)
+
+    def test_replay_threads(self):
+        entries = synthetic_log(self.docs, 20, seed=1) + [{"mode": "vsm", "query": "fox", "class": "short"}]
+        report = replay(entries, self.docs, count=42, threads=3)
+        rows = {row["class"]: row for row in report["rows"]}
+        self.assertEqual(rows["all"]["queries"], 42)
+        self.assertEqual(rows["all"]["errors"], 0)
+        self.assertEqual(rows["short"]["queries"], 2)
+        self.assertGreaterEqual(rows["all"]["p999"], rows["all"]["p50"])
+
+    def test_replay_at_target_rate(self):
+        entries = [{"mode": "boolean", "query": "fox"}]
+        report = replay(entries, self.docs, count=10, rate=100, threads=2)
+        # Ten queries due 10 ms apart take at least the 90 ms until the last is due
+        self.assertGreaterEqual(report["seconds"], 0.09)
+        self.assertEqual(report["target_qps"], 100)
+
+    def test_replay_processes(self):
+        entries = synthetic_log(self.docs, 10, seed=2)
+        report = replay(entries, self.docs, count=30, threads=2, processes=2)
+        self.assertEqual(report["rows"][-1]["queries"], 30)
+        self.assertEqual(report["rows"][-1]["errors"], 0)
+
+    def test_cli(self):
+        book = os.path.join(self.tmp.name, "book.txt")
+        log = os.path.join(self.tmp.name, "log.jsonl")
+        with open(book, "w") as f:
+            f.write("".join(f"STORY {i}\n\n{text}\n\n\n\n\n" for i, text in enumerate(TEXTS)))
+        out = io.StringIO()
+        with redirect_stdout(out):
+            main(["--file", book, "--synthetic", "12", "--seed", "4", "--write-log", log, "--format", "json"])
+        report = json.loads(out.getvalue())
+        self.assertEqual(report["rows"][-1]["queries"], 12)
+        self.assertEqual(len(read_log(log)), 12)
+        out = io.StringIO()
+        with redirect_stdout(out):
+            main(["--file", book, "--log", log, "--count", "24", "--rate", "500", "--threads", "2"])
+        self.assertIn("24 queries", out.getvalue())
+        self.assertIn("p999", out.getvalue())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+from document import Document
+from index import get_index
+from lsi import LsiModel, get_lsi_model, lsi_search, clear_model_cache, collection_fingerprint
+
+TEXTS = [
+    "car engine wheel road",
+    "automobile engine wheel",
+    "automobile road trip",
+    "fox forest hunt",
+    "wolf forest hunt night",
+]
+
+
+def make_docs():
+    return [Document(i, f"D{i}", text, text.split()) for i, text in enumerate(TEXTS)]
+
+
+class TestLsi(unittest.TestCase):
+    def setUp(self):
+        clear_model_cache()
+        self.docs = make_docs()
+
+    def test_related_vocabulary(self):
+        scores = [score for score, doc in lsi_search("car", self.docs, rank=2)]
+        # Documents 1 and 2 never mention "car" but share its topic
+        self.assertGreater(min(scores[1], scores[2]), 0.5)
+        self.assertLess(max(scores[3], scores[4]), 0.1)
+
+    def test_full_rank_preserves_document_cosines(self):
+        model = LsiModel.build(self.docs, rank=len(self.docs))
+        index = get_index(self.docs)
+        matrix = np.zeros((len(self.docs), len(model.terms)))
+        for i, term in enumerate(model.terms):
+            for pos, tf in index.postings[term]:
+                matrix[pos, i] = tf * index.idf(term)
+        rows = matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+        expected = rows @ rows[0]
+        related = dict((doc.document_id, score) for score, doc in model.related(self.docs[0], 4))
+        for doc_id, score in related.items():
+            self.assertAlmostEqual(score, expected[doc_id])
+
+    def test_cached_until_terms_change(self):
+        model = get_lsi_model(self.docs, 2)
+        self.assertIs(get_lsi_model(self.docs, 2), model)
+        self.docs[0].terms = ["fox"]
+        self.assertIsNot(get_lsi_model(self.docs, 2), model)
+
+    def test_persistence(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "model.lsi")
+            model = get_lsi_model(self.docs, 2, path=path)
+            self.assertTrue(os.path.exists(path))
+            clear_model_cache()
+            loaded = get_lsi_model(self.docs, 2, path=path)
+            self.assertIsNot(loaded, model)
+            self.assertEqual(loaded.fingerprint, model.fingerprint)
+            np.testing.assert_allclose(loaded.doc_vectors, model.doc_vectors)
+            self.assertEqual(loaded.search("car"), model.search("car"))
+            with self.assertRaises(ValueError):
+                LsiModel.load(path, self.docs[:2])
+
+    def test_fingerprint_covers_terms(self):
+        other = [Document(i, f"D{i}", text, text.split()) for i, text in enumerate(
+            ["bus engine wheel road", "tractor engine wheel", "tractor road trip", "cat forest hunt",
+             "bear forest hunt night"])]
+        self.assertNotEqual(collection_fingerprint(get_index(other)), collection_fingerprint(get_index(self.docs)))
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "model.lsi")
+            lsi_search("car", self.docs, rank=2, path=path)
+            self.assertTrue(os.path.exists(path))
+            clear_model_cache()
+            # Same ids, lengths and vocabulary size, different text: the saved model is not reused
+            model = get_lsi_model(other, 2, path=path)
+            self.assertIn("tractor", model.term_ids)
+
+    def test_saved_model_needs_same_settings(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "model.lsi")
+            small = get_lsi_model(self.docs, 2, path=path)
+            self.assertEqual(LsiModel.load(path, self.docs).settings, small.settings)
+            clear_model_cache()
+            self.assertEqual(get_lsi_model(self.docs, 4, path=path).settings[0], 4)
+            self.assertEqual(LsiModel.load(path, self.docs).settings[0], 4)
+            # A folded-in model has no fingerprint and is not reused
+            folded = LsiModel.load(path, self.docs)
+            folded.fold_in([Document(5, "D5", "car", ["car"])])
+            folded.save(path)
+            clear_model_cache()
+            self.assertEqual(len(get_lsi_model(self.docs, 4, path=path).documents), 5)
+
+    def test_matches_dense_svd(self):
+        model = LsiModel.build(self.docs, rank=3)
+        index = get_index(self.docs)
+        matrix = np.zeros((len(self.docs), len(model.terms)))
+        for i, term in enumerate(model.terms):
+            for pos, tf in index.postings[term]:
+                matrix[pos, i] = tf * index.idf(term)
+        expected = np.linalg.svd(matrix, compute_uv=False)[:3]
+        np.testing.assert_allclose(np.linalg.norm(model.doc_vectors, axis=0), expected, rtol=1e-6)
+
+    def test_fold_in(self):
+        model = LsiModel.build(self.docs, rank=2)
+        new = Document(5, "D5", "automobile wheel unicorn", "automobile wheel unicorn".split())
+        model.fold_in([new])
+        scores = [score for score, doc in model.search("engine")]
+        self.assertGreater(scores[5], 0.5)
+        self.assertGreater(scores[5], max(scores[3], scores[4]))
+        self.assertEqual(len(model.doc_vectors), 6)
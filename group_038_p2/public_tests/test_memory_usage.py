@@ -0,0 +1,64 @@
+import unittest
+from my_module import extract_documents
+from test_wrapper import remove_stopwords_by_list, vector_space_search
+from memory_usage import memory_report, format_report, profile_pipeline, profile_stages, STRUCTURES
+
+BOOK = "".join(f"STORY {i}\n\nThe fox number {i} ran to the river and the fox came back.\n\n\n\n\n"
+               for i in range(50))
+
+
+class TestMemoryReport(unittest.TestCase):
+    def setUp(self):
+        self.docs = extract_documents(BOOK, None, "Aesop", "Fables")
+
+    def test_structures_add_up(self):
+        report = memory_report(self.docs)
+        self.assertEqual(report["documents"], 50)
+        self.assertEqual(set(report["structures"]), set(STRUCTURES))
+        self.assertEqual(report["total_bytes"], sum(report["structures"].values()))
+        self.assertEqual(report["total_bytes"], sum(size for doc_id, size in memory_report(
+            self.docs, top_documents=50)["largest_documents"]))
+        self.assertGreater(report["structures"]["raw_text"], 0)
+        self.assertEqual(report["structures"]["stemmed_terms"], 0)
+        self.assertIn("raw_text", format_report(report))
+
+    def test_shared_strings_counted_once(self):
+        before = memory_report(self.docs)
+        for doc in self.docs:
+            remove_stopwords_by_list(doc, {"the", "to", "and"})
+            doc.filtered_terms  # filtered lists are computed on first access
+        after = memory_report(self.docs)
+        # The filtered lists reuse the term strings, so they only cost their pointer arrays
+        self.assertGreater(after["structures"]["filtered_terms"], 0)
+        self.assertEqual(after["structures"]["terms"], before["structures"]["terms"])
+        fox = next(entry for entry in after["top_terms"] if entry[0] == "fox")
+        self.assertEqual(fox[2], 50 * 2 * 2)
+
+    def test_stemmed_caches_and_indexes(self):
+        docs = tuple(self.docs)
+        docs[0].stemmed_terms()
+        vector_space_search("fox", docs, False, True)
+        report = memory_report(docs)
+        self.assertGreater(report["structures"]["stemmed_terms"], 0)
+        self.assertEqual([(i["stopword_filtered"], i["stemmed"]) for i in report["indexes"]],
+                         [(False, False), (False, True)])
+        self.assertGreater(report["index_bytes"], 0)
+
+
+class TestProfiling(unittest.TestCase):
+    def test_pipeline_stages(self):
+        docs, profiles = profile_pipeline(lambda: extract_documents(BOOK, None, "Aesop", "Fables"),
+                                          lambda documents: [remove_stopwords_by_list(d, {"the"}) for d in documents],
+                                          query="fox river")
+        self.assertEqual(len(docs), 50)
+        self.assertEqual([p.stage for p in profiles],
+                         ["load", "stopword removal", "stemming", "vector_space_search"])
+        load = profiles[0]
+        self.assertGreater(load.allocated_bytes, 0)
+        self.assertGreaterEqual(load.peak_bytes, load.allocated_bytes)
+        self.assertTrue(load.top_sites)
+
+    def test_returns_last_value(self):
+        value, profiles = profile_stages([("a", lambda: 1), ("b", lambda: [0] * 1000)])
+        self.assertEqual(len(value), 1000)
+        self.assertGreater(profiles[1].peak_bytes, 8000)
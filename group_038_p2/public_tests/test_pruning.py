@@ -0,0 +1,114 @@
+import io
+import os
+import random
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from document import Document
+from index import get_index, clear_index_cache
+from my_module import bm25_search
+from pruning import (
+    term_centric_prune,
+    document_centric_prune,
+    prune,
+    num_postings,
+    save_index,
+    load_index,
+    search_index,
+    evaluate_pruning,
+    main,
+)
+
+
+def make_docs(n=120, seed=5):
+    rng = random.Random(seed)
+    words = [f"w{i}" for i in range(40)]
+    docs = []
+    for i in range(n):
+        terms = [rng.choice(words[:rng.randint(3, 40)]) for _ in range(rng.randint(5, 60))]
+        docs.append(Document(i, f"D{i}", " ".join(terms), terms))
+    return tuple(docs)
+
+
+class TestPruning(unittest.TestCase):
+    def setUp(self):
+        clear_index_cache()
+        self.docs = make_docs()
+        self.index = get_index(self.docs)
+
+    def test_term_centric(self):
+        pruned = term_centric_prune(self.index, 0.5, k=5)
+        self.assertLess(num_postings(pruned), num_postings(self.index))
+        self.assertEqual(pruned.df, self.index.df)
+        self.assertIs(pruned.doc_lengths, self.index.doc_lengths)
+        for term, plist in self.index.postings.items():
+            kept = pruned.postings[term]
+            self.assertGreaterEqual(len(kept), min(5, len(plist)))
+            self.assertTrue(set(kept) <= set(plist))
+        # epsilon 0 keeps everything
+        self.assertEqual(term_centric_prune(self.index, 0.0).postings, self.index.postings)
+
+    def test_document_centric(self):
+        pruned = document_centric_prune(self.index, 0.25)
+        per_document = {}
+        for term, plist in pruned.postings.items():
+            for pos, tf in plist:
+                per_document[pos] = per_document.get(pos, 0) + 1
+        distinct = [len(set(doc.terms)) for doc in self.docs]
+        self.assertTrue(all(0 < per_document[pos] < distinct[pos] or distinct[pos] <= 2
+                            for pos in range(len(self.docs))))
+        self.assertEqual(prune(self.index, "document", 1.0).postings.keys(), self.index.postings.keys())
+        with self.assertRaises(ValueError):
+            prune(self.index, "random", 0.5)
+
+    def test_pruned_search_keeps_top_results(self):
+        pruned = term_centric_prune(self.index, 0.2, k=10)
+        full = sorted(bm25_search("w1 w2", self.docs), key=lambda r: r[0], reverse=True)
+        partial = sorted(search_index(pruned, "w1 w2"), key=lambda r: r[0], reverse=True)
+        self.assertIs(partial[0][1], full[0][1])
+        self.assertAlmostEqual(partial[0][0], full[0][0])
+
+    def test_save_and_load(self):
+        pruned = document_centric_prune(self.index, 0.5)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "pruned.npz")
+            save_index(pruned, path)
+            loaded = load_index(path, self.docs)
+            with self.assertRaises(ValueError):
+                load_index(path, self.docs[1:])
+        self.assertEqual(loaded.postings, pruned.postings)
+        self.assertEqual(loaded.df, pruned.df)
+        self.assertEqual(search_index(loaded, "w3 w4", "vsm"), search_index(pruned, "w3 w4", "vsm"))
+
+    def test_report(self):
+        queries = [("q1", "w1 w2"), ("q2", "w7")]
+        qrels = {"q1": {0, 1, 2}, "q2": {3}}
+        rows = evaluate_pruning(self.docs, queries, qrels, "term", [0.2, 0.9], k=3)
+        self.assertEqual([row["level"] for row in rows], [None, 0.2, 0.9])
+        self.assertEqual(rows[0]["precision_delta"], 0.0)
+        self.assertGreaterEqual(rows[1]["postings"], rows[2]["postings"])
+        self.assertLess(rows[2]["index_kib"], rows[0]["index_kib"])
+        for row in rows:
+            self.assertAlmostEqual(row["recall_delta"], row["recall"] - rows[0]["recall"])
+
+    def test_cli_writes_operating_point(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = {name: os.path.join(tmp, name) for name in ("book.txt", "queries.tsv", "qrels.txt", "out.npz")}
+            with open(paths["book.txt"], "w") as f:
+                f.write("".join(f"STORY {i}\n\nthe fox {'hunts' if i % 2 else 'sleeps'} by the river\n\n\n\n\n"
+                                for i in range(8)))
+            with open(paths["queries.tsv"], "w") as f:
+                f.write("q1\tfox hunts\n")
+            with open(paths["qrels.txt"], "w") as f:
+                f.write("q1 1\nq1 3\n")
+            out = io.StringIO()
+            with redirect_stdout(out):
+                main(["--file", paths["book.txt"], "--queries", paths["queries.tsv"], "--qrels", paths["qrels.txt"],
+                      "--method", "document", "--levels", "0.5", "1.0", "--operating-point", "0.5",
+                      "--write", paths["out.npz"]])
+            self.assertTrue(os.path.exists(paths["out.npz"]))
+        self.assertIn("document", out.getvalue())
+
+
+if __name__ == "__main__":
+    unittest.main()
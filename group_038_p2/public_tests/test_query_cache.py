@@ -0,0 +1,43 @@
+import unittest
+from query_cache import QueryCache, normalize_query
+
+
+class TestQueryCache(unittest.TestCase):
+    def test_hit_on_normalized_query(self):
+        cache = QueryCache()
+        calls = []
+        compute = lambda: calls.append(1) or ["result"]
+        self.assertEqual(cache.lookup("Fox  Dog", "vsm", False, False, 0, compute), ["result"])
+        self.assertEqual(cache.lookup(" fox dog", "vsm", False, False, 0, compute), ["result"])
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(normalize_query(" Fox\tDog "), "fox dog")
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+
+    def test_options_are_part_of_key(self):
+        cache = QueryCache()
+        cache.lookup("fox", "vsm", False, False, 0, lambda: 1)
+        cache.lookup("fox", "boolean", False, False, 0, lambda: 2)
+        cache.lookup("fox", "vsm", True, False, 0, lambda: 3)
+        self.assertEqual(cache.lookup("fox", "vsm", False, True, 0, lambda: 4), 4)
+        self.assertEqual(cache.stats()["misses"], 4)
+
+    def test_lru_eviction(self):
+        cache = QueryCache(max_entries=2)
+        cache.lookup("a", "vsm", False, False, 0, lambda: "a")
+        cache.lookup("b", "vsm", False, False, 0, lambda: "b")
+        cache.lookup("a", "vsm", False, False, 0, lambda: "stale")
+        cache.lookup("c", "vsm", False, False, 0, lambda: "c")
+        self.assertEqual(cache.stats()["evictions"], 1)
+        # "b" was least recently used
+        self.assertEqual(cache.lookup("b", "vsm", False, False, 0, lambda: "new b"), "new b")
+        self.assertEqual(cache.lookup("c", "vsm", False, False, 0, lambda: "stale"), "c")
+
+    def test_generation_bump_invalidates(self):
+        cache = QueryCache()
+        cache.lookup("fox", "vsm", False, False, 0, lambda: "old")
+        self.assertEqual(cache.lookup("fox", "vsm", False, False, 1, lambda: "new"), "new")
+        stats = cache.stats()
+        self.assertEqual(stats["invalidations"], 1)
+        self.assertEqual(stats["generation"], 1)
+        self.assertEqual(stats["entries"], 1)
@@ -0,0 +1,57 @@
+import asyncio
+import json
+import unittest
+from document import Document
+from search_service import SearchService
+
+
+def make_docs():
+    return [
+        Document(0, "Fox", "the quick brown fox", ["the", "quick", "brown", "fox"], "Author", "Origin"),
+        Document(1, "Dog", "the lazy dog", ["the", "lazy", "dog"], "Author", "Origin"),
+        Document(2, "Foxes", "foxes and dogs", ["foxes", "and", "dogs"], "Author", "Origin"),
+    ]
+
+
+class TestSearchService(unittest.TestCase):
+    def exchange(self, requests, max_concurrency=2):
+        async def run():
+            service = SearchService(make_docs(), max_concurrency=max_concurrency)
+            service.warm_up()
+            server = await service.start("127.0.0.1", 0)
+            port = server.sockets[0].getsockname()[1]
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            # pipeline every request before reading any response
+            for request in requests:
+                line = request if isinstance(request, str) else json.dumps(request)
+                writer.write(line.encode("utf-8") + b"\n")
+            await writer.drain()
+            responses = [json.loads(await reader.readline()) for _ in requests]
+            writer.close()
+            server.close()
+            await server.wait_closed()
+            return responses
+        return asyncio.run(run())
+
+    def test_pipelined_responses_in_order(self):
+        responses = self.exchange([
+            {"id": 1, "op": "vsm", "query": "fox"},
+            {"id": 2, "op": "boolean", "query": "dog"},
+            {"id": 3, "op": "bm25", "query": "fox", "stemmed": True},
+            {"id": 4, "op": "stats"},
+        ])
+        self.assertEqual([r["id"] for r in responses], [1, 2, 3, 4])
+        self.assertTrue(all(r["ok"] and r["elapsed_ms"] >= 0 for r in responses))
+        self.assertEqual([r["document_id"] for r in responses[0]["results"]], [0])
+        self.assertEqual([r["document_id"] for r in responses[1]["results"]], [1])
+        self.assertEqual({r["document_id"] for r in responses[2]["results"]}, {0, 2})
+        self.assertEqual(responses[3]["documents"], 3)
+
+    def test_evaluate(self):
+        [response] = self.exchange([{"op": "evaluate", "mode": "vsm", "query": "dog", "relevant": [1, 2]}])
+        self.assertEqual((response["precision"], response["recall"]), (1.0, 0.5))
+
+    def test_bad_requests_do_not_break_the_connection(self):
+        responses = self.exchange(["not json", {"op": "nope"}, {"id": "x", "op": "vsm", "query": "lazy"}])
+        self.assertEqual([r["ok"] for r in responses], [False, False, True])
+        self.assertEqual(responses[2]["id"], "x")
@@ -0,0 +1,67 @@
+import random
+import unittest
+from document import Document
+from sharding import ShardedSearcher
+from test_wrapper import vector_space_search, bm25_search, linear_boolean_search
+
+WORDS = "fox crow lamb wolf river king queen frog gold bird tree mill".split()
+
+
+def make_collection(n=40, seed=7):
+    rng = random.Random(seed)
+    docs = []
+    for i in range(n):
+        terms = rng.choices(WORDS, k=rng.randint(3, 30))
+        docs.append(Document(i, f"Doc{i}", " ".join(terms), terms, "Author", "Origin"))
+    return docs
+
+
+def top_k(results, k):
+    ranked = sorted(results, key=lambda r: r[0], reverse=True)
+    return [(score, doc) for score, doc in ranked if score > 0][:k]
+
+
+class TestShardedSearch(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.docs = make_collection()
+        cls.searcher = ShardedSearcher(cls.docs, num_shards=3)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.searcher.close()
+
+    def assert_same_ranking(self, sharded, unsharded):
+        self.assertEqual(len(sharded), len(unsharded))
+        for (s1, d1), (s2, d2) in zip(sharded, unsharded):
+            self.assertAlmostEqual(s1, s2)
+        self.assertEqual({d.document_id for s, d in sharded}, {d.document_id for s, d in unsharded})
+
+    def test_statistics_are_global(self):
+        self.assertEqual(self.searcher.num_shards, 3)
+        self.assertEqual(self.searcher.num_docs, len(self.docs))
+
+    def test_vsm_matches_unsharded(self):
+        for query in ["fox", "gold bird", "king queen queen frog", "unknown"]:
+            self.assert_same_ranking(self.searcher.search(query, k=10), top_k(vector_space_search(query, self.docs), 10))
+
+    def test_bm25_matches_unsharded(self):
+        for query in ["fox", "gold bird mill"]:
+            self.assert_same_ranking(self.searcher.search(query, mode="bm25", k=5, k1=1.5, b=0.6),
+                                     top_k(bm25_search(query, self.docs, k1=1.5, b=0.6), 5))
+
+    def test_boolean_returns_all_matches(self):
+        hits = self.searcher.search("frog", mode="boolean", k=None)
+        self.assertEqual({d.document_id for s, d in hits}, {d.document_id for d in self.docs if "frog" in d.terms})
+
+    def test_boolean_ands_terms(self):
+        hits = self.searcher.search("frog gold", mode="boolean", k=None)
+        expected = {d.document_id for d in self.docs if "frog" in d.terms and "gold" in d.terms}
+        self.assertTrue(expected)
+        self.assertEqual({d.document_id for s, d in hits}, expected)
+        self.assertEqual(self.searcher.search("frog unknown", mode="boolean", k=None), [])
+        # Documented difference: the linear scan treats the whole query as one token
+        self.assertFalse(any(score for score, doc in linear_boolean_search("frog gold", self.docs)))
+        single = self.searcher.search("frog", mode="boolean", k=None)
+        self.assertEqual({d.document_id for s, d in single},
+                         {d.document_id for s, d in linear_boolean_search("frog", self.docs) if s == 1})
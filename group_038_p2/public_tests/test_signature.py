@@ -0,0 +1,56 @@
+import unittest
+from my_module import extract_documents, linear_boolean_search
+from signature import SignatureFile, benchmark, bits_for_rate, false_positive_rate, optimal_num_hashes
+
+BOOK = "".join(f"STORY {i}\n\nThe Fox number{i} ran to the river{i % 7} and jumped.\n\n\n\n\n" for i in range(300))
+
+
+class TestSignatureFile(unittest.TestCase):
+    def setUp(self):
+        self.docs = extract_documents(BOOK, None, "Aesop", "Fables")
+
+    def test_matches_linear_scan(self):
+        for bits in (64, 512):
+            signatures = SignatureFile(self.docs, bits)
+            for term in ("fox", "FOX", "river3", "number17", "missing"):
+                self.assertEqual(signatures.search(term), linear_boolean_search(term, self.docs))
+
+    def test_filtered_and_stemmed_variants(self):
+        for doc in self.docs:
+            doc.filtered_terms = [t for t in doc.terms if t != "the"]
+        for sf, st in ((True, False), (False, True), (True, True)):
+            signatures = SignatureFile(self.docs, 256, stopword_filtered=sf, stemmed=st)
+            for term in ("the", "jumping", "river5"):
+                self.assertEqual(signatures.search(term), linear_boolean_search(term, self.docs, sf, st))
+
+    def test_width_trades_memory_for_false_positives(self):
+        narrow = SignatureFile(self.docs, 64, num_hashes=2)
+        wide = SignatureFile(self.docs, 1024)
+        self.assertEqual(wide.memory_bytes, 16 * narrow.memory_bytes)
+        for i in range(300):
+            narrow.search(f"absent{i}")
+            wide.search(f"absent{i}")
+        self.assertGreater(narrow.false_positives, wide.false_positives)
+        self.assertEqual(narrow.search("number5")[5][0], 1)
+
+    def test_sizing(self):
+        self.assertEqual(bits_for_rate(10, 0.01) % 64, 0)
+        self.assertGreaterEqual(bits_for_rate(10, 0.01), 96)
+        self.assertEqual(optimal_num_hashes(128, 10), 9)
+        self.assertLess(false_positive_rate(1024, 7, 10), false_positive_rate(64, 2, 10))
+        signatures = SignatureFile(self.docs, target_false_positive_rate=0.001)
+        self.assertLess(signatures.expected_false_positive_rate(), 0.002)
+        self.assertEqual(len(SignatureFile([], 64).search("x")), 0)
+
+    def test_verification_does_not_materialize_stemmed_terms(self):
+        signatures = SignatureFile(self.docs, 256, stemmed=True)
+        self.assertEqual(len(signatures.search("jumping")), 300)
+        self.assertTrue(all(doc._stemmed_terms is None for doc in self.docs))
+        self.assertGreater(signatures.verification_bytes, signatures.term_ids.nbytes + signatures.offsets.nbytes)
+
+    def test_benchmark(self):
+        rows = benchmark(self.docs, ["fox", "river2", "absent"], (64, 256))
+        self.assertEqual([row["bits"] for row in rows], [None, 64, 256])
+        self.assertEqual(rows[2]["memory_bytes"], 300 * 32)
+        self.assertGreater(rows[2]["verification_bytes"], 0)
+        self.assertEqual(rows[2]["total_bytes"], rows[2]["memory_bytes"] + rows[2]["verification_bytes"])
@@ -0,0 +1,75 @@
+import os
+import tempfile
+import threading
+import unittest
+from corpus_cache import save_corpus, load_corpus
+from document import Document
+from snapshot import SnapshotStore
+from test_wrapper import remove_stopwords_by_list, linear_boolean_search, vector_space_search
+
+
+def make_docs(n=50):
+    return [Document(i, f"Doc{i}", "the fox and the crow", ["the", "fox", "and", "the", "crow"], "A", "O")
+            for i in range(n)]
+
+
+class TestSnapshotStore(unittest.TestCase):
+    def test_refilter_leaves_published_snapshot_untouched(self):
+        store = SnapshotStore(make_docs())
+        before = store.current()
+        after = store.refilter(lambda doc, collection: remove_stopwords_by_list(doc, {"the", "and"}))
+        self.assertEqual(after.generation, before.generation + 1)
+        self.assertIs(store.current(), after)
+        self.assertTrue(after.stopword_filtered)
+        self.assertEqual(before.documents[0].filtered_terms, [])
+        self.assertEqual(after.documents[0].filtered_terms, ["fox", "crow"])
+        # terms and the already stemmed copies are shared, not duplicated
+        self.assertIs(after.documents[0].terms, before.documents[0].terms)
+
+    def test_refilter_cached_corpus_keeps_old_snapshot(self):
+        docs = make_docs(5)
+        for doc in docs:
+            remove_stopwords_by_list(doc, {"the", "and"})
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = os.path.join(tmp, "cache")
+            save_corpus(cache, "key", docs, stopword_filtered=True)
+            store = SnapshotStore(load_corpus(cache, "key"), stopword_filtered=True)
+            before = store.current()
+            after = store.refilter(lambda doc, collection: remove_stopwords_by_list(doc, {"fox"}))
+            # The old snapshot still reads its filtered terms from the cache's columns
+            self.assertEqual(before.documents[0].filtered_terms, ["fox", "crow"])
+            self.assertEqual(after.documents[0].filtered_terms, ["the", "and", "the", "crow"])
+            self.assertEqual([score for score, doc in linear_boolean_search("fox", before.documents, True)], [1] * 5)
+            self.assertEqual([score for score, doc in linear_boolean_search("fox", after.documents, True)], [0] * 5)
+
+    def test_publish_replaces_collection(self):
+        store = SnapshotStore()
+        self.assertEqual(len(store.current()), 0)
+        snapshot = store.publish(make_docs(3))
+        self.assertEqual(snapshot.generation, 1)
+        self.assertIsInstance(snapshot.documents, tuple)
+
+    def test_concurrent_readers_see_consistent_snapshots(self):
+        store = SnapshotStore(make_docs())
+        errors = []
+        stop = threading.Event()
+
+        def reader():
+            while not stop.is_set():
+                snapshot = store.current()
+                hits = [score for score, doc in linear_boolean_search("the", snapshot.documents, True)]
+                # all documents are either unfiltered (no filtered terms) or filtered; never a mix
+                if len(set(hits)) != 1:
+                    errors.append(hits)
+                vector_space_search("fox", snapshot.documents, stopword_filtered=True)
+
+        threads = [threading.Thread(target=reader) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for i in range(20):
+            stopwords = {"the"} if i % 2 else {"and"}
+            store.refilter(lambda doc, collection: remove_stopwords_by_list(doc, stopwords))
+        stop.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
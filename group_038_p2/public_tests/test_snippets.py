@@ -0,0 +1,36 @@
+import unittest
+from document import Document
+from my_module import tokenize_with_offsets, extract_documents
+from snippets import make_snippet, best_window
+
+
+class TestSnippets(unittest.TestCase):
+    def test_tokenizer_records_offsets(self):
+        text = "The Fox, the crow: and the FOX!"
+        terms, offsets = tokenize_with_offsets(text)
+        self.assertEqual(terms, ["the", "fox", "the", "crow", "and", "the", "fox"])
+        self.assertEqual([text[o:o + len(t)].lower() for t, o in zip(terms, offsets)], terms)
+        self.assertEqual(offsets.itemsize, 4)
+
+    def test_loader_stores_offsets(self):
+        [doc] = extract_documents("TITLE\n\nA fox met a crow.", None, "A", "O")
+        self.assertEqual(list(doc.term_offsets), [0, 2, 6, 10, 12])
+
+    def test_best_window(self):
+        # "fox" at 0, then "fox" and "crow" close together at 50/52
+        self.assertEqual(best_window([0, 50, 52], ["fox", "fox", "crow"], 10), (50, 52))
+        self.assertIsNone(best_window([], [], 10))
+
+    def test_highlights_best_window(self):
+        filler = " ".join(["word"] * 40)
+        text = f"A fox ran. {filler} The clever fox fooled the crow. {filler}"
+        [doc] = extract_documents("TITLE\n\n" + text, None, "A", "O")
+        snippet = make_snippet(doc, "crow fox", window=8)
+        self.assertIn("The clever **fox** fooled the **crow**", snippet)
+        self.assertTrue(snippet.startswith("...") and snippet.endswith("..."))
+
+    def test_stemmed_matches_and_fallback_offsets(self):
+        doc = Document(0, "Doc", "Connected devices keep connecting", ["connected", "devices", "keep", "connecting"])
+        snippet = make_snippet(doc, "connection", stemmed=True)
+        self.assertEqual(snippet, "**Connected** devices keep **connecting**")
+        self.assertEqual(make_snippet(doc, "absent", window=2), "Connected devices...")
@@ -0,0 +1,62 @@
+import unittest
+from unittest import mock
+from collections import Counter
+from document import Document
+from index import CollectionIndex, get_index, clear_index_cache
+from my_module import expand_query, vector_space_search, linear_boolean_search
+from snippets import make_snippet
+
+
+def make_docs():
+    texts = ["the runner runs and running dogs run", "a dog ran", "connected connections connect", "fox"]
+    return [Document(i, f"D{i}", text, text.split()) for i, text in enumerate(texts)]
+
+
+class TestStemClasses(unittest.TestCase):
+    def setUp(self):
+        clear_index_cache()
+
+    def test_derived_postings_match_stemmed_tokens(self):
+        docs = make_docs()
+        index = CollectionIndex(docs, stemmed=True)
+        expected = {}
+        for pos, doc in enumerate(docs):
+            for term, tf in Counter(doc.stemmed_terms()).items():
+                expected.setdefault(term, []).append((pos, tf))
+        self.assertEqual(index.postings, expected)
+        self.assertEqual(index.df["run"], 1)
+        self.assertEqual(index.doc_lengths, [len(doc.terms) for doc in docs])
+
+    def test_shares_base_postings(self):
+        docs = make_docs()
+        base = get_index(docs)
+        stemmed = get_index(docs, stemmed=True)
+        self.assertIs(stemmed.postings["fox"], base.postings["fox"])
+        self.assertIs(stemmed.doc_lengths, base.doc_lengths)
+        self.assertEqual(stemmed.surface_forms("connect"), ["connected", "connections", "connect"])
+        # No per-document stemmed token lists are created
+        self.assertTrue(all(doc._stemmed_terms is None for doc in docs))
+
+    def test_stemmed_boolean_search_uses_memo(self):
+        import index
+        docs = make_docs()
+        self.assertEqual([doc.document_id for score, doc in linear_boolean_search("runs", docs, stemmed=True)], [0])
+        self.assertEqual([doc.document_id for score, doc in linear_boolean_search("connecting", docs, stemmed=True)],
+                         [2])
+        self.assertTrue(all(doc._stemmed_terms is None for doc in docs))
+        with mock.patch.object(index, "MAX_STEMMED_TERMS", 100):
+            for i in range(110):
+                index.stem_term(f"t{i}")
+            self.assertLessEqual(len(index._stems), 100)
+
+    def test_expand_query(self):
+        docs = make_docs()
+        self.assertEqual(expand_query("Running cats", docs),
+                         {"running": ["runs", "running", "run"], "cats": []})
+
+    def test_stemmed_search_and_snippet(self):
+        docs = make_docs()
+        ranked = sorted(vector_space_search("connecting", docs, stemmed=True), key=lambda r: r[0], reverse=True)
+        self.assertEqual(ranked[0][1].document_id, 2)
+        self.assertEqual(make_snippet(docs[2], "connecting", stemmed=True),
+                         "**connected** **connections** **connect**")
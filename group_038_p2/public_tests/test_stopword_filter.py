@@ -0,0 +1,113 @@
+import unittest
+from document import Document
+from index import CollectionIndex, get_index, clear_index_cache
+from my_module import remove_stop_words
+from stopword_filter import StopwordFilter, list_filter, frequency_filter, attach_filter
+from test_wrapper import remove_stopwords_by_list, remove_stopwords_by_frequency, vector_space_search
+
+
+def make_docs():
+    texts = ["The fox, the dog and THE cat", "a Dog ran to the river", "fox fox fox", "the the"]
+    return tuple(Document(i, f"D{i}", text, text.split()) for i, text in enumerate(texts))
+
+
+class TestStopwordFilter(unittest.TestCase):
+    def setUp(self):
+        clear_index_cache()
+
+    def test_keep_normalizes(self):
+        f = StopwordFilter({"the", "a"})
+        self.assertIsNone(f.keep("The"))
+        self.assertEqual(f.keep("fox,"), "fox")
+        self.assertEqual(f.apply(["The", "fox,", "a", "Dog"]), ["fox", "dog"])
+
+    def test_lazy_and_equal_to_eager(self):
+        stopwords = {"the", "and", "to"}
+        docs = make_docs()
+        for doc in docs:
+            remove_stopwords_by_list(doc, stopwords)
+        self.assertTrue(all(doc._filtered_terms is None for doc in docs))
+        for doc in docs:
+            self.assertEqual(doc.filtered_terms, remove_stop_words(doc.terms, stopwords))
+        # All documents share one filter
+        self.assertEqual(len({id(doc._stopword_filter) for doc in docs}), 1)
+
+    def test_frequency_filter_computed_once(self):
+        docs = make_docs()
+        first = frequency_filter(docs, 0.2, 0.0)
+        self.assertIs(frequency_filter(docs, 0.2, 0.0), first)
+        self.assertIsNot(frequency_filter(docs, 0.3, 0.0), first)
+        self.assertIn("the", first.stopwords)
+        for doc in docs:
+            remove_stopwords_by_frequency(doc, docs, common_frequency=0.2, rare_frequency=0.0)
+        self.assertIs(docs[0]._stopword_filter, first)
+        self.assertEqual(docs[0].filtered_terms, ["dog", "and", "cat"])
+
+    def test_memo_follows_content(self):
+        docs = [Document(0, "D0", "x y", ["x", "y"]), Document(1, "D1", "x z", ["x", "z"])]
+        remove_stopwords_by_frequency(docs[0], docs, common_frequency=0.4, rare_frequency=0.0)
+        self.assertEqual(docs[0].filtered_terms, ["y"])
+        # Same length, different content: the stopwords are computed again
+        docs[1] = Document(1, "D1", "y y", ["y", "y"])
+        remove_stopwords_by_frequency(docs[0], docs, common_frequency=0.4, rare_frequency=0.0)
+        self.assertEqual(docs[0].filtered_terms, ["x"])
+        stopwords = {"the"}
+        first = list_filter(stopwords)
+        self.assertIs(list_filter({"the"}), first)
+        stopwords.add("fox")
+        self.assertIn("fox", list_filter(stopwords).stopwords)
+
+    def test_refilter_computes_statistics_once(self):
+        import time
+        from unittest import mock
+        import stopword_filter
+        docs = [Document(i, f"D{i}", "", [f"t{i % 50}", "the", f"u{i}"]) for i in range(4000)]
+        with mock.patch.object(stopword_filter, "frequency_stopwords",
+                               wraps=stopword_filter.frequency_stopwords) as stopwords:
+            started = time.perf_counter()
+            for doc in docs:
+                remove_stopwords_by_frequency(doc, docs, common_frequency=0.2, rare_frequency=0.0)
+            elapsed = time.perf_counter() - started
+        self.assertEqual(stopwords.call_count, 1)
+        self.assertLess(elapsed, 1.0)
+        self.assertEqual(len({id(doc._stopword_filter) for doc in docs}), 1)
+        self.assertEqual(docs[0].filtered_terms, ["t0", "u0"])
+
+    def test_term_memo_is_bounded(self):
+        import stopword_filter
+        f = StopwordFilter({"the"})
+        for i in range(stopword_filter.MAX_MEMOIZED_TERMS + 10):
+            f.keep(f"t{i}")
+        self.assertLessEqual(len(f._kept), stopword_filter.MAX_MEMOIZED_TERMS)
+        self.assertIsNone(f.keep("The"))
+
+    def test_derived_filtered_index(self):
+        docs = make_docs()
+        attach_filter(docs, list_filter({"the", "and", "to"}))
+        derived = get_index(docs, stopword_filtered=True)
+        self.assertTrue(all(doc._filtered_terms is None for doc in docs))
+        self.assertIs(derived.postings["cat"], get_index(docs).postings["cat"])
+
+        copies = [Document(d.document_id, d.title, d.raw_text, d.terms) for d in docs]
+        for doc, copy in zip(docs, copies):
+            copy.filtered_terms = doc.filtered_terms
+        eager = CollectionIndex(copies, True)
+        self.assertEqual(derived.postings, eager.postings)
+        self.assertEqual(derived.doc_lengths, eager.doc_lengths)
+        self.assertEqual(get_index(docs, True, True).postings["fox"], [(0, 1), (2, 3)])
+
+    def test_assignment_and_new_filter_invalidate(self):
+        docs = make_docs()
+        attach_filter(docs, list_filter({"the"}))
+        self.assertTrue(any(score > 0 for score, doc in vector_space_search("dog", docs, True)))
+        before = get_index(docs, True)
+        attach_filter(docs, StopwordFilter({"dog"}))
+        self.assertIsNot(get_index(docs, True), before)
+        self.assertTrue(all(score == 0 for score, doc in vector_space_search("dog", docs, True)))
+        docs[1].filtered_terms = ["dog"]
+        self.assertIsNone(docs[1]._stopword_filter)
+        self.assertEqual(get_index(docs, True).postings["dog"], [(1, 1)])
+
+
+if __name__ == "__main__":
+    unittest.main()
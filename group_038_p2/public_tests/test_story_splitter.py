@@ -0,0 +1,64 @@
+import re
+import threading
+import unittest
+from my_module import (split_stories, extract_title_and_body, extract_stories, parse_collection,
+                       findall_with_timeout, PatternTimeoutError)
+
+BOOK = ("THE WOLF AND THE LAMB\n\nA wolf met a lamb.\nHe was hungry.\n\nThe lamb ran.\n\n\n\n\n"
+        "THE FOX AND THE CROW\n\nA crow sat in a tree.\n\n\n\n\n"
+        "THE ANT\n\nAn ant worked.\n\n\n\n\n"
+        "and after a long pause the ant rested.\n")
+
+
+class TestStorySplitter(unittest.TestCase):
+    def test_split_on_blank_line_runs(self):
+        chunks = split_stories(BOOK)
+        self.assertEqual(len(chunks), 4)
+        self.assertTrue(chunks[0].startswith("THE WOLF AND THE LAMB"))
+        self.assertTrue(chunks[0].endswith("The lamb ran."))
+
+    def test_title_heuristic(self):
+        self.assertEqual(extract_title_and_body("THE ANT\n\nAn ant worked."), ("THE ANT", "An ant worked."))
+        self.assertIsNone(extract_title_and_body("and after a long pause\nthe ant rested."))
+        self.assertIsNone(extract_title_and_body("A" * 200 + "\n\nbody"))
+
+    def test_matches_default_regex(self):
+        pattern = re.compile(r'([^\n]+)\n\n(.*?)(?=\n{5}(?=[^\n]+\n\n)|$)', re.DOTALL)
+        expected = [(t.strip(), b.strip()) for t, b in pattern.findall(BOOK)]
+        self.assertEqual(extract_stories(BOOK), expected)
+        self.assertEqual(expected[-1][1], "An ant worked.\n\n\n\n\nand after a long pause the ant rested.")
+
+    def test_parse_collection_without_pattern(self):
+        docs = parse_collection(BOOK, None, 0, 100, "Aesop", "Fables")
+        self.assertEqual([d.title for d in docs], ["THE WOLF AND THE LAMB", "THE FOX AND THE CROW", "THE ANT"])
+        self.assertEqual(docs[1].terms, ["a", "crow", "sat", "in", "a", "tree"])
+
+    def test_pattern_time_budget_in_process(self):
+        import my_module
+        my_module._shutdown_pattern_pool()
+        pattern = re.compile(r"(a+)+$")
+        with self.assertRaises(PatternTimeoutError):
+            findall_with_timeout(pattern, "a" * 40 + "b", 0.5)
+        self.assertEqual(findall_with_timeout(pattern, "aaa", 5), ["aaa"])
+        # The main thread needs no worker process
+        self.assertIsNone(my_module._pattern_pool)
+
+    def test_pattern_time_budget(self):
+        # Off the main thread the pattern runs in a worker process
+        outcome = []
+        worker = threading.Thread(target=lambda: outcome.append(self.check_worker_time_budget()))
+        worker.start()
+        worker.join()
+        self.assertEqual(outcome, [None])
+
+    def check_worker_time_budget(self):
+        pattern = re.compile(r"(a+)+$")
+        self.assertEqual(findall_with_timeout(pattern, "aaa", 5), ["aaa"])
+        with self.assertRaises(PatternTimeoutError):
+            findall_with_timeout(pattern, "a" * 40 + "b", 0.5)
+        # The worker that timed out is replaced; a healthy one is reused
+        self.assertEqual(findall_with_timeout(pattern, "aa", 5), ["aa"])
+        import my_module
+        worker = my_module._pattern_pool
+        self.assertEqual(findall_with_timeout(pattern, "a", 5), ["a"])
+        self.assertIs(my_module._pattern_pool, worker)
@@ -0,0 +1,72 @@
+"""
+LRU cache for search results.
+
+Entries are keyed by (normalized query, search mode, stopword_filtered, stemmed) and belong to
+one collection generation. The UI bumps the generation whenever documents are loaded or
+stopword filtering is reapplied; the first lookup with a newer generation drops every entry.
+Partial results of a search that ran out of time (anytime.py) are returned but not cached.
+"""
+
+from collections import OrderedDict
+
+DEFAULT_MAX_ENTRIES = 128
+
+
+def normalize_query(query):
+    """Lowercase and collapse whitespace so trivially different spellings share an entry."""
+    return " ".join(query.lower().split())
+
+
+class QueryCache:
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.generation = None
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _sync_generation(self, generation):
+        if generation != self.generation:
+            if self._entries:
+                self.invalidations += len(self._entries)
+                self._entries.clear()
+            self.generation = generation
+
+    def lookup(self, query, mode, stopword_filtered, stemmed, generation, compute):
+        """
+        Return cached results for the query, or call compute() and cache what it returns.
+        `mode` may be any hashable value, e.g. ("bm25", k1, b) to separate parameter settings.
+        """
+        self._sync_generation(generation)
+        key = (normalize_query(query), mode, stopword_filtered, stemmed)
+        if key in self._entries:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key]
+        self.misses += 1
+        results = compute()
+        if getattr(results, "partial", False):
+            return results
+        self._entries[key] = results
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        return results
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "generation": self.generation,
+        }
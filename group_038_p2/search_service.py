@@ -0,0 +1,185 @@
+"""
+Long-running asyncio search service.
+
+The collection is loaded and indexed once at startup. Clients connect over TCP and send one
+JSON request per line; each request gets one JSON response line. Requests may be pipelined:
+a client can send many lines without waiting, they are evaluated concurrently (bounded by
+max_concurrency across all connections) and the responses are written back in request order.
+
+Request fields:
+    op                "boolean", "vsm", "bm25", "evaluate" or "stats"
+    query             query string (a single term for "boolean")
+    stopword_filtered, stemmed   analyzer variant (default false)
+    k                 maximum number of results (default 10, null for all)
+    k1, b, delta      BM25 parameters
+    budget_ms         latency budget for "boolean" and "vsm": evaluation stops when it runs out
+                      and the response has "partial": true (see anytime.py)
+    mode, relevant    for "evaluate": search mode and list of relevant document ids
+    id                echoed back unchanged
+
+Every response carries "ok", "elapsed_ms" and either the result fields or "error".
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+from anytime import Budget, SearchResults, anytime_boolean_search, anytime_vector_space_search
+from index import get_index
+from snapshot import SnapshotStore
+from test_wrapper import bm25_search, precision_recall
+
+DEFAULT_PORT = 8765
+DEFAULT_MAX_CONCURRENCY = 8
+# Requests a single connection may have in flight before the server stops reading from it
+DEFAULT_MAX_PIPELINE = 64
+
+
+class RequestError(Exception):
+    pass
+
+
+class SearchService:
+    def __init__(self, documents, max_concurrency=DEFAULT_MAX_CONCURRENCY, max_pipeline=DEFAULT_MAX_PIPELINE,
+                 stopword_filtered_available=False):
+        # Requests search the snapshot current when they start; reloads publish to the store
+        self.store = SnapshotStore(documents, stopword_filtered_available)
+        self.max_concurrency = max_concurrency
+        self.max_pipeline = max_pipeline
+        self.requests_served = 0
+        self._semaphore = None
+
+    @property
+    def documents(self):
+        return self.store.current().documents
+
+    def warm_up(self):
+        """Build the index statistics for every analyzer variant before the first request."""
+        snapshot = self.store.current()
+        for stopword_filtered in ((False, True) if snapshot.stopword_filtered else (False,)):
+            for stemmed in (False, True):
+                get_index(snapshot.documents, stopword_filtered, stemmed)
+
+    def run_search(self, mode, request):
+        documents = self.documents
+        query = request.get("query", "")
+        stopword_filtered = bool(request.get("stopword_filtered", False))
+        stemmed = bool(request.get("stemmed", False))
+        budget_ms = request.get("budget_ms")
+        budget = Budget(float(budget_ms) / 1000) if budget_ms is not None else None
+        if mode == "boolean":
+            results = anytime_boolean_search(query, documents, stopword_filtered, stemmed, budget)
+            return results.derive((score, doc) for score, doc in results if score == 1)
+        if mode == "vsm":
+            results = anytime_vector_space_search(query, documents, stopword_filtered, stemmed, budget)
+        elif mode == "bm25":
+            results = bm25_search(query, documents, stopword_filtered, stemmed,
+                                  k1=float(request.get("k1", 1.2)), b=float(request.get("b", 0.75)),
+                                  delta=float(request.get("delta", 0.0)))
+        else:
+            raise RequestError(f"unknown search mode {mode!r}")
+        ranked = sorted(((score, doc) for score, doc in results if score > 0), key=lambda r: r[0], reverse=True)
+        return results.derive(ranked) if isinstance(results, SearchResults) else ranked
+
+    def handle_request(self, request):
+        """Evaluate one decoded request and return the response fields (runs in a worker thread)."""
+        op = request.get("op")
+        if op == "stats":
+            return {"documents": len(self.documents), "requests_served": self.requests_served}
+        if op == "evaluate":
+            matches = self.run_search(request.get("mode", "vsm"), request)
+            retrieved = {doc.document_id for score, doc in matches}
+            precision, recall = precision_recall(retrieved, set(request.get("relevant", [])))
+            return {"precision": precision, "recall": recall, "retrieved": len(retrieved),
+                    "partial": getattr(matches, "partial", False)}
+        matches = self.run_search(op, request)
+        partial = getattr(matches, "partial", False)
+        k = request.get("k", 10)
+        if k is not None:
+            matches = matches[:int(k)]
+        return {"results": [{"document_id": doc.document_id, "title": doc.title, "score": score}
+                            for score, doc in matches], "partial": partial}
+
+    async def _respond(self, line):
+        started = time.perf_counter()
+        request_id = None
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise RequestError("request must be a JSON object")
+            request_id = request.get("id")
+            async with self._semaphore:
+                fields = await asyncio.get_running_loop().run_in_executor(None, self.handle_request, request)
+            response = {"ok": True, **fields}
+        except Exception as e:
+            # A bad request must not take down the connection or the other pipelined requests
+            response = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+        self.requests_served += 1
+        if request_id is not None:
+            response["id"] = request_id
+        response["elapsed_ms"] = (time.perf_counter() - started) * 1000
+        return response
+
+    async def handle_connection(self, reader, writer):
+        pending = asyncio.Queue(maxsize=self.max_pipeline)
+
+        async def write_responses():
+            # Responses go out in request order even though requests finish out of order
+            while True:
+                task = await pending.get()
+                if task is None:
+                    break
+                writer.write(json.dumps(await task).encode("utf-8") + b"\n")
+                await writer.drain()
+
+        writer_task = asyncio.create_task(write_responses())
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if line.strip():
+                    await pending.put(asyncio.create_task(self._respond(line)))
+        finally:
+            await pending.put(None)
+            try:
+                await writer_task
+            except ConnectionError:
+                pass
+            writer.close()
+
+    async def start(self, host="127.0.0.1", port=DEFAULT_PORT):
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return await asyncio.start_server(self.handle_connection, host, port)
+
+    async def serve_forever(self, host="127.0.0.1", port=DEFAULT_PORT):
+        server = await self.start(host, port)
+        async with server:
+            await server.serve_forever()
+
+
+def main(argv=None):
+    from cli import add_collection_arguments, load_analyzed_collection
+
+    parser = argparse.ArgumentParser(description="Serve Boolean/VSM/BM25 search over a collection as JSON lines.")
+    add_collection_arguments(parser)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--max-concurrency", type=int, default=DEFAULT_MAX_CONCURRENCY)
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    documents, filtered = load_analyzed_collection(args)
+    service = SearchService(documents, max_concurrency=args.max_concurrency, stopword_filtered_available=filtered)
+    service.warm_up()
+    print(f"Loaded and indexed {len(documents)} documents in {time.perf_counter() - started:.2f}s; "
+          f"listening on {args.host}:{args.port}")
+    try:
+        asyncio.run(service.serve_forever(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Document-sharded search over several worker processes.
+
+The collection is split into contiguous shards, one per worker process, and every worker
+builds its own postings for its documents. The coordinator collects the shards' df and
+length statistics once, so each query is sent out together with collection-wide idf values
+(and the global average document length for BM25). Shard scores therefore equal the scores
+of the unsharded vector_space_search/bm25_search. Each shard returns its local top-k and the
+coordinator merges them.
+"""
+
+import heapq
+import itertools
+import math
+import multiprocessing
+import os
+import threading
+from collections import Counter
+
+from index import get_doc_terms, vsm_idf, bm25_idf, bm25_length_norms
+from my_module import analyze_query
+
+
+def _shard_worker(conn, entries):
+    # entries: list of (position in the full collection, terms of the chosen variant)
+    positions = [pos for pos, terms in entries]
+    doc_term_counts = [Counter(terms) for pos, terms in entries]
+    doc_lengths = [len(terms) for pos, terms in entries]
+    postings = {}
+    for local, counts in enumerate(doc_term_counts):
+        for term, tf in counts.items():
+            postings.setdefault(term, []).append((local, tf))
+    conn.send(({term: len(plist) for term, plist in postings.items()}, sum(doc_lengths), len(entries)))
+
+    norms = {}
+    while True:
+        message = conn.recv()
+        if message is None:
+            break
+        mode, weighted_terms, k, params = message
+        scores = {}
+        if mode == "vsm":
+            # Same cosine as vector_space_search: restricted to the query terms
+            query_vec = [qtf * idf for term, qtf, idf in weighted_terms]
+            query_norm = math.sqrt(sum(q * q for q in query_vec))
+            candidates = {local for term, qtf, idf in weighted_terms for local, tf in postings.get(term, ())}
+            for local in candidates:
+                counts = doc_term_counts[local]
+                doc_vec = [counts[term] * idf for term, qtf, idf in weighted_terms]
+                num = sum(d * q for d, q in zip(doc_vec, query_vec))
+                denom = math.sqrt(sum(d * d for d in doc_vec)) * query_norm
+                if denom > 0:
+                    scores[local] = num / denom
+        elif mode == "bm25":
+            k1, b, delta, avgdl = params
+            if (k1, b) not in norms:
+                norms[(k1, b)] = bm25_length_norms(doc_lengths, avgdl, k1, b)
+            norm = norms[(k1, b)]
+            for term, qtf, idf in weighted_terms:
+                for local, tf in postings.get(term, ()):
+                    scores[local] = scores.get(local, 0.0) + qtf * idf * (tf * (k1 + 1) / (tf + norm[local]) + delta)
+        else:
+            # Boolean: documents containing every query term, as in federation.search_collection
+            matches = None
+            for term, qtf, idf in weighted_terms:
+                found = {local for local, tf in postings.get(term, ())}
+                matches = found if matches is None else matches & found
+            scores = dict.fromkeys(matches or (), 1)
+        hits = ((score, positions[local]) for local, score in scores.items() if score > 0)
+        conn.send(heapq.nlargest(k, hits, key=lambda hit: (hit[0], -hit[1])) if k else list(hits))
+    conn.close()
+
+
+class ShardedSearcher:
+    """
+    Scatter-gather search over `num_shards` worker processes. Use as a context manager or call
+    close() to stop the workers.
+    """
+
+    def __init__(self, collection, num_shards=None, stopword_filtered=False, stemmed=False):
+        self.collection = list(collection)
+        self.stemmed = stemmed
+        num_shards = max(1, min(num_shards or os.cpu_count() or 1, len(self.collection) or 1))
+        shard_size = -(-len(self.collection) // num_shards)
+        self._lock = threading.Lock()
+        self._connections = []
+        self._workers = []
+        for start in range(0, max(len(self.collection), 1), shard_size or 1):
+            entries = [(pos, list(get_doc_terms(doc, stopword_filtered, stemmed)))
+                       for pos, doc in enumerate(self.collection[start:start + shard_size], start)]
+            parent_conn, child_conn = multiprocessing.Pipe()
+            worker = multiprocessing.Process(target=_shard_worker, args=(child_conn, entries), daemon=True)
+            worker.start()
+            child_conn.close()
+            self._connections.append(parent_conn)
+            self._workers.append(worker)
+
+        # Global statistics, so that idf values do not depend on the partitioning
+        self.df = Counter()
+        total_length = 0
+        self.num_docs = 0
+        for conn in self._connections:
+            shard_df, shard_length, shard_docs = conn.recv()
+            self.df.update(shard_df)
+            total_length += shard_length
+            self.num_docs += shard_docs
+        self.avg_doc_length = total_length / self.num_docs if self.num_docs else 0.0
+
+    @property
+    def num_shards(self):
+        return len(self._workers)
+
+    def search(self, query, mode="vsm", k=10, k1=1.2, b=0.75, delta=0.0):
+        """
+        Return the top-k matching documents as (score, Document), best first. `mode` is "vsm",
+        "bm25" or "boolean"; k=None returns every match.
+
+        Boolean queries match the documents containing every analyzed query term, as
+        federation.search_collection does. For single-term queries that is what
+        linear_boolean_search matches. Multi-term queries differ: linear_boolean_search compares
+        the whole query string with single tokens and so matches nothing.
+        """
+        query_counts = Counter(analyze_query(query, self.stemmed))
+        idf = bm25_idf if mode == "bm25" else vsm_idf
+        weighted_terms = [(term, qtf, idf(self.num_docs, self.df[term])) for term, qtf in query_counts.items()]
+        params = (k1, b, delta, self.avg_doc_length) if mode == "bm25" else None
+        with self._lock:
+            for conn in self._connections:
+                conn.send((mode, weighted_terms, k, params))
+            shard_hits = [conn.recv() for conn in self._connections]
+        hits = itertools.chain.from_iterable(shard_hits)
+        if k:
+            merged = heapq.nlargest(k, hits, key=lambda hit: (hit[0], -hit[1]))
+        else:
+            merged = sorted(hits, key=lambda hit: (-hit[0], hit[1]))
+        return [(score, self.collection[pos]) for score, pos in merged]
+
+    def close(self):
+        with self._lock:
+            for conn, worker in zip(self._connections, self._workers):
+                try:
+                    conn.send(None)
+                except OSError:
+                    pass
+                worker.join(timeout=5)
+                conn.close()
+            self._connections = []
+            self._workers = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
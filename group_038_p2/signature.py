@@ -0,0 +1,228 @@
+"""
+Signature-file engine for single-term Boolean queries, for when no inverted index should
+stay resident.
+
+Every document gets one fixed-width Bloom filter of its distinct terms; the signatures are
+packed into a numpy uint64 matrix of shape (documents, bits / 64). A query term sets
+`num_hashes` bits, and all documents whose signature contains those bits are found with a
+few vectorized AND/compare operations. Bloom filters have false positives but no false
+negatives, so candidates are verified before they are returned: against a compact copy of
+every document's distinct terms, built with the signatures (term ids in one sorted uint32
+array per document, numbered through a vocabulary dict), not against the term lists.
+
+That copy is a forward index: 4 bytes per distinct term of every document plus the vocabulary,
+usually more than the signatures themselves. The resident footprint is therefore
+memory_bytes (signatures) + verification_bytes, and benchmark reports both and their total.
+More bits per document mean fewer false positives (less verification work) and more memory:
+with n distinct terms, m bits and k hashes the false positive rate is about (1 - e^(-kn/m))^k.
+
+    python signature.py --file book.txt --queries terms.txt --bits 256 512 1024
+"""
+
+import argparse
+import hashlib
+import math
+import sys
+import time
+
+import numpy as np
+
+from index import get_doc_terms, stem_term
+
+DEFAULT_FALSE_POSITIVE_RATE = 0.01
+WORD_BITS = 64
+BUILD_CHUNK_ROWS = 1024
+
+
+def false_positive_rate(bits, num_hashes, distinct_terms):
+    """Expected false positive rate of a Bloom filter holding `distinct_terms` terms."""
+    if distinct_terms == 0:
+        return 0.0
+    return (1 - math.exp(-num_hashes * distinct_terms / bits)) ** num_hashes
+
+
+def optimal_num_hashes(bits, distinct_terms):
+    return max(1, round(bits / max(distinct_terms, 1) * math.log(2)))
+
+
+def bits_for_rate(distinct_terms, rate):
+    """Signature width (a multiple of 64) giving about `rate` false positives with the optimal k."""
+    bits = -max(distinct_terms, 1) * math.log(rate) / math.log(2) ** 2
+    return max(WORD_BITS, math.ceil(bits / WORD_BITS) * WORD_BITS)
+
+
+def _signature_terms(doc, stopword_filtered, stemmed):
+    # The distinct terms linear_boolean_search compares against; each distinct term is stemmed
+    # once (memoized in index.stem_term) instead of materializing the document's stemmed list
+    if stopword_filtered:
+        terms = set(get_doc_terms(doc, True, False))
+    else:
+        terms = set(doc.terms)
+    if stemmed:
+        return {stem_term(term) for term in terms}
+    return terms if stopword_filtered else {term.lower() for term in terms}
+
+
+class SignatureFile:
+    """
+    Bloom-filter signatures of a collection for one analyzer variant. Give either `bits` per
+    document or a target false positive rate, which sizes the signatures for the average number
+    of distinct terms per document (longer documents get more false positives, never misses).
+    """
+
+    def __init__(self, collection, bits=None, num_hashes=None, stopword_filtered=False, stemmed=False,
+                 target_false_positive_rate=DEFAULT_FALSE_POSITIVE_RATE):
+        self.collection = list(collection)
+        self.stopword_filtered = stopword_filtered
+        self.stemmed = stemmed
+        term_sets = [_signature_terms(doc, stopword_filtered, stemmed) for doc in self.collection]
+        self.avg_distinct_terms = sum(map(len, term_sets)) / len(term_sets) if term_sets else 0.0
+        if bits is None:
+            bits = bits_for_rate(self.avg_distinct_terms, target_false_positive_rate)
+        if bits % WORD_BITS:
+            raise ValueError(f"bits must be a multiple of {WORD_BITS}")
+        self.bits = bits
+        self.num_hashes = num_hashes or optimal_num_hashes(bits, self.avg_distinct_terms)
+        self.signatures = np.zeros((len(self.collection), bits // WORD_BITS), dtype=np.uint64)
+        self.candidates_checked = 0
+        self.false_positives = 0
+
+        # Verification data: the sorted term ids of document i are term_ids[offsets[i]:offsets[i + 1]]
+        self.vocabulary = {}
+        lengths = np.fromiter(map(len, term_sets), dtype=np.int64, count=len(term_sets))
+        self.offsets = np.concatenate(([0], np.cumsum(lengths)))
+        self.term_ids = np.empty(int(self.offsets[-1]), dtype=np.uint32)
+        for i, terms in enumerate(term_sets):
+            ids = sorted(self.vocabulary.setdefault(term, len(self.vocabulary)) for term in terms)
+            self.term_ids[self.offsets[i]:self.offsets[i + 1]] = ids
+
+        # Hash each vocabulary term once; rows are filled as a 0/1 byte matrix a chunk at a time
+        # and packed into 64-bit words
+        positions = {}
+        for first in range(0, len(term_sets), BUILD_CHUNK_ROWS):
+            chunk = term_sets[first:first + BUILD_CHUNK_ROWS]
+            rows, columns = [], []
+            for row, terms in enumerate(chunk):
+                for term in terms:
+                    term_positions = positions.get(term)
+                    if term_positions is None:
+                        term_positions = positions[term] = self.bit_positions(term)
+                    rows.extend([row] * len(term_positions))
+                    columns.extend(term_positions)
+            bit_matrix = np.zeros((len(chunk), bits), dtype=np.uint8)
+            bit_matrix[rows, columns] = 1
+            packed = np.packbits(bit_matrix, axis=1, bitorder="little")
+            self.signatures[first:first + len(chunk)] = packed.view("<u8")
+
+    def bit_positions(self, term):
+        # Double hashing: k positions from two 64-bit halves of one stable digest
+        digest = hashlib.blake2b(term.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return {(h1 + i * h2) % self.bits for i in range(self.num_hashes)}
+
+    @property
+    def memory_bytes(self):
+        """Bytes of the signatures (the verification arrays are reported by verification_bytes)."""
+        return self.signatures.nbytes
+
+    @property
+    def verification_bytes(self):
+        """Bytes of the verification arrays and their vocabulary."""
+        vocabulary = sys.getsizeof(self.vocabulary) + sum(map(sys.getsizeof, self.vocabulary))
+        return self.term_ids.nbytes + self.offsets.nbytes + vocabulary
+
+    @property
+    def total_bytes(self):
+        return self.memory_bytes + self.verification_bytes
+
+    def expected_false_positive_rate(self):
+        return false_positive_rate(self.bits, self.num_hashes, self.avg_distinct_terms)
+
+    def candidates(self, term):
+        """Positions of the documents whose signature contains every bit of `term`."""
+        query = np.zeros(self.signatures.shape[1], dtype=np.uint64)
+        for position in self.bit_positions(term):
+            query[position // WORD_BITS] |= np.uint64(1) << np.uint64(position % WORD_BITS)
+        words = np.flatnonzero(query)
+        masked = self.signatures[:, words] & query[words]
+        return np.flatnonzero((masked == query[words]).all(axis=1))
+
+    def search(self, term):
+        """Same results as linear_boolean_search(term, collection, stopword_filtered, stemmed)."""
+        query_term = stem_term(term) if self.stemmed else term.lower()
+        term_id = self.vocabulary.get(query_term)
+        matches = set()
+        candidates = self.candidates(query_term)
+        if term_id is not None:
+            for pos in candidates.tolist():
+                ids = self.term_ids[self.offsets[pos]:self.offsets[pos + 1]]
+                found = np.searchsorted(ids, term_id)
+                if found < len(ids) and ids[found] == term_id:
+                    matches.add(pos)
+        self.candidates_checked += len(candidates)
+        self.false_positives += len(candidates) - len(matches)
+        if self.stemmed:
+            # linear_boolean_search only reports matching documents in stemmed mode
+            return [(1, self.collection[pos]) for pos in sorted(matches)]
+        return [(1 if pos in matches else 0, doc) for pos, doc in enumerate(self.collection)]
+
+
+def benchmark(collection, terms, bit_widths=(256, 512, 1024, 2048), stopword_filtered=False, stemmed=False):
+    """
+    Time the linear scan and signature files of several widths on the same query terms.
+    Returns one dict per engine with build time, mean query time, memory (signatures,
+    verification data and their total) and false positives.
+    """
+    from my_module import linear_boolean_search
+
+    started = time.perf_counter()
+    expected = [linear_boolean_search(term, collection, stopword_filtered, stemmed) for term in terms]
+    linear_seconds = time.perf_counter() - started
+    rows = [{"engine": "linear", "bits": None, "build_s": 0.0, "memory_bytes": 0, "verification_bytes": 0,
+             "total_bytes": 0,
+             "query_ms": linear_seconds / max(len(terms), 1) * 1000, "false_positive_rate": 0.0}]
+    for bits in bit_widths:
+        started = time.perf_counter()
+        signatures = SignatureFile(collection, bits, stopword_filtered=stopword_filtered, stemmed=stemmed)
+        built = time.perf_counter()
+        results = [signatures.search(term) for term in terms]
+        query_seconds = time.perf_counter() - built
+        if results != expected:
+            raise AssertionError(f"signature search with {bits} bits differs from the linear scan")
+        non_matching = sum(len(collection) - sum(score for score, doc in result) for result in expected)
+        rows.append({"engine": "signature", "bits": bits, "build_s": built - started,
+                     "memory_bytes": signatures.memory_bytes,
+                     "verification_bytes": signatures.verification_bytes, "total_bytes": signatures.total_bytes,
+                     "query_ms": query_seconds / max(len(terms), 1) * 1000,
+                     "false_positive_rate": signatures.false_positives / non_matching if non_matching else 0.0,
+                     "expected_false_positive_rate": signatures.expected_false_positive_rate()})
+    return rows
+
+
+def main(argv=None):
+    from cli import add_collection_arguments, load_analyzed_collection
+
+    parser = argparse.ArgumentParser(description="Benchmark signature-file Boolean search against the linear scan.")
+    add_collection_arguments(parser)
+    parser.add_argument("--queries", required=True, help="file with one query term per line")
+    parser.add_argument("--bits", type=int, nargs="+", default=[256, 512, 1024, 2048])
+    parser.add_argument("--stem", action="store_true")
+    args = parser.parse_args(argv)
+
+    documents, filtered = load_analyzed_collection(args)
+    with open(args.queries, "r", encoding="utf-8") as f:
+        terms = [line.strip() for line in f if line.strip()]
+    print(f"{'engine':<10}{'bits':>6}{'sig. KiB':>10}{'verify KiB':>12}{'total KiB':>11}{'build s':>9}"
+          f"{'query ms':>10}{'FP rate':>9}{'expected':>10}")
+    for row in benchmark(documents, terms, args.bits, filtered, args.stem):
+        expected = row.get("expected_false_positive_rate")
+        print(f"{row['engine']:<10}{row['bits'] or '':>6}{row['memory_bytes'] / 1024:>10.1f}"
+              f"{row['verification_bytes'] / 1024:>12.1f}{row['total_bytes'] / 1024:>11.1f}{row['build_s']:>9.3f}"
+              f"{row['query_ms']:>10.3f}{row['false_positive_rate']:>9.4f}"
+              f"{'' if expected is None else format(expected, '.4f'):>10}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
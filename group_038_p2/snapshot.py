@@ -0,0 +1,61 @@
+"""
+Snapshot isolation for the loaded collection.
+
+Readers call SnapshotStore.current() once per query and search that snapshot; a snapshot's
+documents are never modified after it is published. Writers (loading, stopword re-filtering)
+prepare the next version off to the side - re-filtering works on shallow copies of the
+documents - and publish it with a single reference swap, so concurrent searches see either
+the old or the new version, never a half-filtered one.
+"""
+
+import copy
+import threading
+
+
+class CollectionSnapshot:
+    """An immutable version of the collection. `generation` increases with every publish."""
+
+    __slots__ = ("documents", "generation", "stopword_filtered")
+
+    def __init__(self, documents, generation, stopword_filtered=False):
+        self.documents = tuple(documents)
+        self.generation = generation
+        self.stopword_filtered = stopword_filtered
+
+    def __len__(self):
+        return len(self.documents)
+
+
+class SnapshotStore:
+    def __init__(self, documents=(), stopword_filtered=False):
+        self._current = CollectionSnapshot(documents, 0, stopword_filtered)
+        self._write_lock = threading.Lock()
+
+    def current(self):
+        return self._current
+
+    def publish(self, documents, stopword_filtered=False):
+        """Replace the collection, e.g. after loading new documents."""
+        with self._write_lock:
+            return self._swap(documents, stopword_filtered)
+
+    def refilter(self, filter_document):
+        """
+        Publish a copy of the current collection with new filtered terms. `filter_document(doc,
+        collection)` is called on a shallow copy of every document (as remove_stopwords_by_list or
+        remove_stopwords_by_frequency would be); `collection` is the unmodified current snapshot.
+        """
+        with self._write_lock:
+            base = self._current.documents
+            copies = []
+            for doc in base:
+                doc_copy = copy.copy(doc)
+                filter_document(doc_copy, base)
+                copies.append(doc_copy)
+            return self._swap(copies, True)
+
+    def _swap(self, documents, stopword_filtered):
+        snapshot = CollectionSnapshot(documents, self._current.generation + 1, stopword_filtered)
+        # A single attribute assignment, so readers never observe a partially built snapshot
+        self._current = snapshot
+        return snapshot
@@ -0,0 +1,105 @@
+"""
+Result snippets with highlighted query terms.
+
+Snippets are cut from raw_text using the term offsets recorded by the tokenizer, so no
+re-tokenizing or regex search is needed per hit. The window with the most distinct query
+terms (then the most matches) wins; with stemming, every surface form whose stem matches a
+query stem is highlighted. Only the document's vocabulary is stemmed for that, not every token.
+"""
+
+from index import stem_term
+from my_module import analyze_query, tokenize_with_offsets
+
+SNIPPET_TOKENS = 24
+HIGHLIGHT = ("**", "**")
+
+
+def _offsets_and_terms(doc):
+    if doc.term_offsets is not None:
+        return doc.term_offsets, doc.terms
+    # Documents built by hand have no offsets; derive them if they line up with the terms
+    terms, offsets = tokenize_with_offsets(doc.raw_text)
+    if offsets is None or terms != [t.lower() for t in doc.terms]:
+        return None, None
+    if terms == doc.terms:
+        doc.term_offsets = offsets
+    return offsets, terms
+
+
+def _positions(terms, term):
+    # list.index scans in C, which is much faster than a Python loop over every token
+    positions = []
+    position = -1
+    try:
+        while True:
+            position = terms.index(term, position + 1)
+            positions.append(position)
+    except ValueError:
+        return positions
+
+
+def best_window(match_positions, match_terms, window):
+    """
+    Return (first, last) token positions of the window of at most `window` tokens that covers
+    the most distinct query terms, ties broken by the number of matches. Two pointers, O(matches).
+    """
+    best = None
+    counts = {}
+    left = 0
+    for right, position in enumerate(match_positions):
+        counts[match_terms[right]] = counts.get(match_terms[right], 0) + 1
+        while position - match_positions[left] >= window:
+            term = match_terms[left]
+            counts[term] -= 1
+            if not counts[term]:
+                del counts[term]
+            left += 1
+        score = (len(counts), right - left + 1)
+        if best is None or score > best[0]:
+            best = (score, match_positions[left], position)
+    return (best[1], best[2]) if best else None
+
+
+def make_snippet(doc, query, stemmed=False, window=SNIPPET_TOKENS, highlight=HIGHLIGHT):
+    """Return a snippet of `doc` around the best cluster of query terms, with the terms highlighted."""
+    offsets, terms = _offsets_and_terms(doc)
+    if offsets is None or not terms:
+        return doc.raw_text[:window * 6]
+    query_terms = set(analyze_query(query, stemmed))
+    if stemmed:
+        # Surface form -> query stem it matches; a window is scored by distinct stems
+        surface_forms = {term: stem_term(term) for term in set(terms) if stem_term(term) in query_terms}
+    else:
+        surface_forms = {term: term for term in query_terms}
+    matches = sorted((position, stem) for term, stem in surface_forms.items()
+                     for position in _positions(terms, term))
+    match_positions = [position for position, term in matches]
+    match_terms = [term for position, term in matches]
+
+    span = best_window(match_positions, match_terms, window)
+    if span is None:
+        first, last = 0, min(window, len(terms)) - 1
+    else:
+        # Center the matches inside the window
+        first, last = span
+        slack = window - (last - first + 1)
+        first = max(0, first - slack // 2)
+        last = min(len(terms) - 1, first + window - 1)
+        first = max(0, last - window + 1)
+
+    raw = doc.raw_text
+    start = offsets[first]
+    end = offsets[last] + len(doc.terms[last])
+    pieces = ["..." if first > 0 else ""]
+    cursor = start
+    matched = set(match_positions)
+    for position in range(first, last + 1):
+        if position in matched:
+            token_start = offsets[position]
+            token_end = token_start + len(doc.terms[position])
+            pieces.append(raw[cursor:token_start])
+            pieces.append(highlight[0] + raw[token_start:token_end] + highlight[1])
+            cursor = token_end
+    pieces.append(raw[cursor:end])
+    pieces.append("..." if last < len(terms) - 1 else "")
+    return "".join(pieces)
@@ -0,0 +1,117 @@
+"""
+Online stopword filtering.
+
+A StopwordFilter is configured once for a collection and attached to every document; a
+document's filtered_terms are computed from its terms on first access (see document.py).
+Attaching is O(1) per document, so applying a new stopword list to a large collection is
+immediate, and documents that are never searched in filtered mode are never filtered.
+The filtered index does not need the lists at all: it is derived from the unfiltered
+postings (see index.py).
+
+Filtering lowercases terms and strips punctuation before comparing them with the stopwords,
+as remove_stop_words always did. The per-term decision is memoized (up to MAX_MEMOIZED_TERMS
+terms, then the memo starts over), so every vocabulary term is normalized once per filter.
+"""
+
+import string
+import threading
+from collections import Counter, OrderedDict
+
+from document import Document
+
+_PUNCTUATION = str.maketrans('', '', string.punctuation)
+MAX_CACHED_FILTERS = 4
+MAX_MEMOIZED_TERMS = 1 << 18
+# Marks removed terms in the memo (None would be ambiguous with a missing entry)
+_REMOVED = object()
+
+
+def normalize_term(term):
+    return term.lower().translate(_PUNCTUATION)
+
+
+class StopwordFilter:
+    def __init__(self, stopwords, description=""):
+        self.stopwords = frozenset(stopwords)
+        self.description = description
+        self._kept = {}
+
+    def keep(self, term):
+        """The normalized form of `term`, or None if it is a stopword."""
+        kept = self._kept.get(term)
+        if kept is None:
+            if len(self._kept) >= MAX_MEMOIZED_TERMS:
+                self._kept.clear()
+            normalized = normalize_term(term)
+            kept = self._kept[term] = _REMOVED if normalized in self.stopwords else normalized
+        return None if kept is _REMOVED else kept
+
+    def apply(self, terms):
+        """The filtered list for `terms`."""
+        kept = (self.keep(term) for term in terms)
+        return [term for term in kept if term is not None]
+
+
+def frequency_stopwords(collection, common_frequency, rare_frequency):
+    """Terms whose share of all tokens in `collection` is >= common_frequency or <= rare_frequency."""
+    counts = Counter()
+    for doc in collection:
+        counts.update(doc.terms)
+    normalized_counts = Counter()
+    for term, count in counts.items():
+        normalized_counts[normalize_term(term)] += count
+    total = sum(normalized_counts.values())
+    if not total:
+        return set()
+    return {term for term, count in normalized_counts.items()
+            if count / total >= common_frequency or count / total <= rare_frequency}
+
+
+# Filters are memoized so that the per-document remove_stopwords_by_* calls of one pass over a
+# collection share one filter object (which also lets the index derive the filtered postings).
+# An entry is reused only while what it was computed from is unchanged: the stopword set, or
+# the collection object, its length and the term lists of all documents (Document.terms_generation).
+# The check is O(1), so the per-document calls of a pass over N documents cost O(N) in total.
+_filters = OrderedDict()
+_filters_lock = threading.Lock()
+
+
+def _memoized(key, sources, build):
+    with _filters_lock:
+        entry = _filters.get(key)
+        if entry is not None and entry[0] == sources:
+            _filters.move_to_end(key)
+            return entry[1]
+    stopword_filter = build()
+    with _filters_lock:
+        _filters[key] = (sources, stopword_filter)
+        while len(_filters) > MAX_CACHED_FILTERS:
+            _filters.popitem(last=False)
+    return stopword_filter
+
+
+def list_filter(stopwords):
+    """The filter for a stopword set. Repeated calls with equal sets return the same filter."""
+    frozen = frozenset(stopwords)
+    return _memoized(("list", frozen), (), lambda: StopwordFilter(frozen, f"list of {len(frozen)} stopwords"))
+
+
+def frequency_filter(collection, common_frequency, rare_frequency):
+    """
+    The frequency-based filter for a collection. Collection statistics are computed once per
+    collection and thresholds (not once per document); resizing the collection, adding a new
+    document to it or assigning any document's term list computes them again.
+    """
+    key = ("frequency", id(collection), common_frequency, rare_frequency)
+    # The entry holds the collection, so its id is not reused while the entry exists; tuple
+    # comparison checks the collection by identity before equality
+    sources = (collection, len(collection), Document.terms_generation)
+    return _memoized(key, sources, lambda: StopwordFilter(
+        frequency_stopwords(collection, common_frequency, rare_frequency),
+        f"frequency cutoffs {common_frequency}/{rare_frequency}"))
+
+
+def attach_filter(collection, stopword_filter):
+    """Configure `stopword_filter` for every document of the collection; nothing is filtered yet."""
+    for doc in collection:
+        doc.set_stopword_filter(stopword_filter)
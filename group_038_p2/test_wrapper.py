@@ -30,9 +30,10 @@ def remove_stopwords_by_list(doc: Document, stopwords: set[str]):
         stopwords: The stop words to remove
     """
 
-    # The following code is an example. It can be replaced to see it how you see fit:
-    from my_module import remove_stop_words
-    doc.filtered_terms = remove_stop_words(doc.terms, stopwords)
+    # Online filtering: the filter is shared by all documents filtered with the same set and
+    # doc.filtered_terms is computed on first access
+    from stopword_filter import list_filter
+    doc.set_stopword_filter(list_filter(stopwords))
 
 
 def remove_stopwords_by_frequency(doc, collection: list[Document], common_frequency: float, rare_frequency: float):
@@ -56,12 +57,13 @@ def remove_stopwords_by_frequency(doc, collection: list[Document], common_freque
     # from my_module import remove_stopwords
     # remove_stopwords_by_frequency(doc, collection, common_frequency, rare_frequency)
 
-    from my_module import remove_stop_words_by_frequency
-    doc.filtered_terms = remove_stop_words_by_frequency(doc.terms, collection, low_freq=rare_frequency, high_freq=common_frequency)
+    # Collection frequencies are computed once per collection, not once per document
+    from stopword_filter import frequency_filter
+    doc.set_stopword_filter(frequency_filter(collection, common_frequency, rare_frequency))
 
 
 def load_documents_from_url(url: str, author: str, origin: str, start_line: int, end_line: int,
-                            search_pattern: Pattern[str]) -> list[Document]:
+                            search_pattern: Pattern[str], pattern_timeout: float = None) -> list[Document]:
     """
     Download a text from the given URL, extract stories/chapters and return them as Document objects.
 
@@ -78,6 +80,8 @@ def load_documents_from_url(url: str, author: str, origin: str, start_line: int,
         start_line: Line number from where to start searching
         end_line: Line number until which to search
         search_pattern: RE pattern where the 1st capture group contains the title and the 2nd the text of the document
+                        (None uses the built-in line-based story splitter)
+        pattern_timeout: Seconds the pattern may run before PatternTimeoutError is raised (None: no limit)
 
 
     Returns:
@@ -86,18 +90,37 @@ def load_documents_from_url(url: str, author: str, origin: str, start_line: int,
 
     # The following code is an example. You may replace it how you see fit:
     from my_module import load_collection_from_url
-    return load_collection_from_url(url, search_pattern, start_line, end_line, author, origin)
+    return load_collection_from_url(url, search_pattern, start_line, end_line, author, origin, pattern_timeout)
 
 
 
+def load_documents_from_file(path: str, author: str, origin: str, start_line: int, end_line: int,
+                             search_pattern: Pattern[str], pattern_timeout: float = None) -> list[Document]:
+    """
+    Same as load_documents_from_url, but for a text file on local disk. The file is memory-mapped
+    and only the lines start_line..end_line are read and decoded.
+    """
+    from file_loader import load_collection_from_file
+    return load_collection_from_file(path, search_pattern, start_line, end_line, author, origin,
+                                     pattern_timeout=pattern_timeout)
+
+
 # PR03 Implementation
 def linear_boolean_search(term, collection, stopword_filtered=False, stemmed=False):
     from my_module import linear_boolean_search
     return linear_boolean_search(term, collection, stopword_filtered, stemmed)
 
-def vector_space_search(query, collection, stopword_filtered=False, stemmed=False):
+def vector_space_search(query, collection, stopword_filtered=False, stemmed=False, expansion=None):
     from my_module import vector_space_search
-    return vector_space_search(query, collection, stopword_filtered, stemmed)
+    return vector_space_search(query, collection, stopword_filtered, stemmed, expansion=expansion)
+
+def bm25_search(query, collection, stopword_filtered=False, stemmed=False, k1=1.2, b=0.75, delta=0.0):
+    from my_module import bm25_search
+    return bm25_search(query, collection, stopword_filtered, stemmed, k1, b, delta)
+
+def lsi_search(query, collection, stopword_filtered=False, stemmed=False, rank=100, path=None):
+    from lsi import lsi_search
+    return lsi_search(query, collection, stopword_filtered, stemmed, rank, path)
 
 stemmer = PorterStemmer()
 def stem_term(term):
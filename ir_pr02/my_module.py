@@ -23,18 +23,19 @@ def slice_text_lines(text: str, start: int, end: int) -> str:
     return "\n".join(selected)
 
 
-## Not gonna use it. Will be handled by regex.
 def split_stories(text: str, separator: str) -> list[str]:
     """Split the full text into individual story chunks using a separator string"""
-    # TODO: split text based on separator
-    raise NotImplementedError("split_stories is not yet implemented")
+    # str.split is a single linear scan, unlike a lazy DOTALL pattern with lookaheads
+    return [chunk.strip() for chunk in text.split(separator) if chunk.strip()]
 
 
-## Not gonna use it. Will be handled by regex.
 def extract_title_and_body(story: str, pattern: re.Pattern) -> tuple[str, str]:
     """Use regex pattern to extract (title, body) from a story chunk"""
-    # TODO: apply pattern to story and return groups
-    raise NotImplementedError("extract_title_and_body is not yet implemented")
+    # the pattern only sees one chunk, so backtracking is bounded by the story length
+    match = pattern.search(story)
+    if match is None:
+        raise ValueError("story chunk does not match the title/body pattern")
+    return match.group(1).strip(), match.group(2).strip()
 
 
 def tokenize(text: str) -> list[str]: